@@ -7,21 +7,26 @@ import os
 # 添加项目根目录到系统路径，以便能够正确导入tool和Model模块
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from langchain.agents import create_tool_calling_agent,AgentExecutor
-from Tool.word_tool import WORD_TOOLS
-
-from Tool.documentRead_tool import read_text_auto, save_to_docx
 from Tool.excel_reader_tool import read_filtered_excel_tables
 from Tool.word_Imagetool import insert_images_to_docx
-from Model.mychat_doubao import MyChatModel
-from langchain_core.prompts import ChatPromptTemplate,MessagesPlaceholder
-import pandas as pd
-def create_agent():
+from pipeline.report_run import ReportRun
+from pipeline.job_context import current_job
+
+def build_agent_executor():
+    # 智能体相关依赖（langchain agents、大模型客户端、全部工具）只在需要智能体时导入，--no-llm 路径不加载
+    from langchain.agents import create_tool_calling_agent,AgentExecutor
+    from langchain_core.prompts import ChatPromptTemplate,MessagesPlaceholder
+    from Tool.word_tool import WORD_TOOLS
+    from Tool.narrative_tool import NARRATIVE_TOOLS
+    from Tool.template_digest import TEMPLATE_DIGEST_TOOLS
+    from Tool.documentRead_tool import read_text_auto, save_to_docx
+    from Model.mychat_doubao import MyChatModel
+    from Agent.scratchpad import ScratchpadManager
     #1 创建大模型 (大脑)
     chat = MyChatModel()
-    llm = chat.get_langchain_llm()  
+    llm = chat.get_langchain_llm(task="agent")  
     #2 创建工具
-    tools = WORD_TOOLS + [read_text_auto, save_to_docx, read_filtered_excel_tables, insert_images_to_docx]
+    tools = WORD_TOOLS + NARRATIVE_TOOLS + TEMPLATE_DIGEST_TOOLS + [read_text_auto, save_to_docx, read_filtered_excel_tables, insert_images_to_docx]
     #3 提示词
     prompt = ChatPromptTemplate.from_messages(
         [ 
@@ -36,8 +41,8 @@ def create_agent():
             3）read_text_auto(file_path)
             【用途】读取缺陷统计文件或模板文本用于预览/辅助解析（非最终表体来源）。
             【注意】file_path 会自动使用 .env 中的 RAW_REPORT_PATH 或 TEMPLATE_REPORT_PATH，不需要你传入路径。
-            4）documentRead_tool(path)
-            【用途】读取 txt 或 docx 作为辅助文本或模板结构预览（非最终表体来源）。
+            4）read_template_digest(path)
+            【用途】读取模板结构摘要（全部占位符、章节标题层级及各节占位符、表格结构），据此确定 data 需要填充的字段；无需读取模板原文。
             【注意】TEMPLATE_REPORT_PATH 已由工具从 .env 自动读取，不需要你传路径。
             5）create_complete_report(output_path, data, template_path)
             【用途】生成最终 docx 报告。
@@ -45,6 +50,8 @@ def create_agent():
             6）read_filtered_excel_tables(file_path)
             【用途】读取 .env 的 REFER_FILE_OUT_PATH，自动生成两类筛选结果：table31（包含“#梁/#墩”）、table32（包含“#防落梁块/#垫石/#支座板/#支座”），每行格式为“桥墩,构件,部位,缺陷类型,现场照片”。
             【强制】必须调用此工具获取 3.1/3.2 的表格内容；不得自行解析 Excel；不得使用 read_text_auto 读取 Excel。
+            7）build_defect_narrative(table31, table32, project_name)
+            【用途】按缺陷五列表与优先级规则直接生成 defect_summary、defect_list、defect_causes、suggestions 等叙述字段（不消耗大模型调用）；可在其结果上做语言润色，但不得改变其中任何数量。
             【工具参数要求】所有工具调用参数必须是严格的 JSON，仅允许字符串、数字、布尔、对象、数组；禁止在 JSON 中使用任何代码表达式或变量（如 format、split、列表推导、lambda、未定义变量名）；不得在工具参数中拼接代码。
             【Excel筛选与占位符替换规则（必须执行）】
             - 数据源：使用 .env 的 REFER_FILE_OUT_PATH
@@ -64,7 +71,8 @@ def create_agent():
             - 严格不得改变任何数值：禁止增减、合并会改变统计值的操作，所有数量来源于读取工具的去重统计。
             3. **占位符填充准备**：
             - 按模板要求构建 `data` 字典，字段必须包含并填充下列占位符（**所有字段不得省略**，无数据时使用指定的替代文本，不得仅写“未提供”）：
-                - project_name, bridge_name, bridge_code, main_findings, defect_summary, pier_info, pier_naming_rule,
+                - project_name, bridge_name, bridge_code, main_findings, defect_summary（另附 beam_pier_summary / support_summary，
+                分别填入汇总表“检查结果”的梁体与支座系统两栏）, pier_info, pier_naming_rule,
                 excel_filtered_table（两处：用于 3.1 和 3.2）， defect_list, defect_causes, suggestions,
                 component_status, defect_distribution_and_solutions, id_file_mapping, appendix（含四子项完整内容）, inspection_result, project_name 等。
             - 每个占位符的内容必须严格按模板里“占位符说明”要求格式化（包含数量标注、去重合并、构件分类顺序等）。
@@ -197,7 +205,14 @@ def create_agent():
     #4 创建智能体
     agent = create_tool_calling_agent(llm=llm,tools=tools,prompt=prompt)
     #5 创建智能体执行器
-    agent_executor =AgentExecutor(agent=agent,tools=tools,verbose=True,handle_parsing_errors=True)
+    # 每轮迭代前压缩 agent_scratchpad：限制单个工具输出的 token 数，早期输出只保留摘要
+    agent_executor =AgentExecutor(agent=agent,tools=tools,verbose=True,handle_parsing_errors=True,
+                                  trim_intermediate_steps=ScratchpadManager.from_env())
+    return agent_executor
+
+def create_agent(agent_executor=None):
+    # 常驻服务传入已构建的执行器，避免每次重建大模型客户端与提示词
+    agent_executor = agent_executor or build_agent_executor()
     #6 提问
     # 添加所有必需的变量参数，避免KeyError错误
     input_data = {
@@ -230,8 +245,11 @@ def create_agent():
     except Exception as e:
         print(f"模型调用失败: {str(e)}")
         try:
-            refer_out = os.getenv("REFER_FILE_OUT_PATH") or os.getenv("REFER_FILE_PATH") or os.getenv("RAW_REPORT_PATH")
+            job = current_job()
+            refer_out = job.excel_path or job.raw_excel_path
             data = dict(input_data)
+            # 模型不可用：叙述字段全部改用规则生成（input_data 中仅为占位说明）
+            data["narrative_mode"] = "rule"
             try:
                 tables = read_filtered_excel_tables.invoke({"file_path": refer_out})
                 t31_lines = tables.get("table31", [])
@@ -243,9 +261,9 @@ def create_agent():
                 data["excel_filtered_table"] = ""
                 data["table31"] = []
                 data["table32"] = []
-            template_path = os.getenv("TEMPLATE_REPORT_PATH")
+            template_path = job.template_path
             from Tool.word_tool import create_complete_report
-            output_file = "桥梁支座检查报告.docx"
+            output_file = job.output_path("桥梁支座检查报告.docx")
             result = create_complete_report(output_file, data, template_path=template_path)
             print(f"报告已成功生成: {result}")
             try:
@@ -256,7 +274,7 @@ def create_agent():
                 if deny:
                     print("图片插入已跳过")
                 else:
-                    static_dir = os.environ.get("STATIC_DIR") or "static"
+                    static_dir = current_job().static_dir
                     inserted_out = os.path.abspath(os.path.splitext(output_file)[0] + "_插图.docx")
                     final_path = insert_images_to_docx.invoke({
                         "template_path": result,
@@ -268,7 +286,7 @@ def create_agent():
                 print(f"图片插入失败: {str(e3)}")
         except Exception as e2:
             from Tool.word_tool import generate_bridge_report
-            output_file = "桥梁支座检查报告.docx"
+            output_file = current_job().output_path("桥梁支座检查报告.docx")
             data = dict(input_data)
             data["excel_filtered_table"] = ""
             data["table31"] = []
@@ -283,7 +301,7 @@ def create_agent():
                 if deny:
                     print("图片插入已跳过")
                 else:
-                    static_dir = os.environ.get("STATIC_DIR") or "static"
+                    static_dir = current_job().static_dir
                     inserted_out = os.path.abspath(os.path.splitext(output_file)[0] + "_插图.docx")
                     final_path = insert_images_to_docx.invoke({
                         "template_path": result,
@@ -294,9 +312,80 @@ def create_agent():
             except Exception as e3:
                 print(f"图片插入失败: {str(e3)}")
 
+def create_report_without_llm(output_file="桥梁支座检查报告.docx", insert_images=True):
+    """零大模型快速路径：表格与叙述字段全部由规则生成，直接生成 docx"""
+    from Tool.word_tool import create_complete_report
+    job = current_job()
+    data = {
+        "project_name": "厦门轨道后溪站-车辆段",
+        "bridge_name": "厦门轨道交通各区间桥梁支座",
+        "bridge_code": "后溪站-车辆段",
+        "pier_naming_rule": "未提供，暂按模板默认规则：沿东向西里程方向，桥墩、构件编号从0开始，如'0#墩'",
+        "id_file_mapping": "照片命名为'桥墩编号-部位-缺陷类型.jpg'，按'区段-桥墩'文件夹存储",
+        "narrative_mode": "rule",
+    }
+    result = create_complete_report.invoke({
+        "output_path": output_file,
+        "data": data,
+        "template_path": job.template_path,
+    })
+    print(f"报告已成功生成: {result}")
+    if insert_images:
+        static_dir = job.static_dir
+        inserted_out = os.path.abspath(os.path.splitext(output_file)[0] + "_插图.docx")
+        final_path = insert_images_to_docx.invoke({
+            "template_path": result,
+            "output_path": inserted_out,
+            "static_dir": static_dir
+        })
+        print(f"图片已插入: {final_path}")
+    return result
+
+def run_report_pipeline(resume=False, use_llm=True, insert_images=True, run_dir=None, agent_executor=None):
+    """
+    带检查点的报告流水线：ingest → narrative → report → images。
+    各阶段产物保存在运行目录（REPORT_RUNS_DIR，默认 ./runs/<时间戳>），resume=True 时从最近一次运行的第一个未完成阶段继续。
+    run_dir 指定时直接使用该运行目录；agent_executor 为常驻服务中预先构建的智能体执行器。
+    """
+    from Tool.word_tool import create_complete_report
+    job = current_job()
+    run = ReportRun(run_dir) if run_dir else (ReportRun.latest() if resume else None)
+    if run is None:
+        run = ReportRun.create()
+    print(f"运行目录: {run.run_dir}，起始阶段: {run.first_incomplete() or '全部已完成'}")
+
+    with run.activate():
+        if not run.is_done("ingest"):
+            tables = read_filtered_excel_tables.invoke({"file_path": job.excel_path})
+            run.save_json("ingest", tables)
+
+        if not run.is_done("report"):
+            if run.is_done("narrative"):
+                # 叙述字段已生成（可能来自大模型），只需重新生成 docx
+                create_complete_report.invoke({
+                    "output_path": run.path("report"),
+                    "data": run.load_json("narrative"),
+                    "template_path": job.template_path,
+                })
+            elif use_llm:
+                create_agent(agent_executor)
+            if not run.is_done("report"):
+                # 不调用大模型，或智能体未生成报告：规则生成
+                create_report_without_llm(run.path("report"), insert_images=False)
+
+        if insert_images and not run.is_done("images"):
+            insert_images_to_docx.invoke({
+                "template_path": run.path("report"),
+                "output_path": run.path("images"),
+                "static_dir": job.static_dir
+            })
+    final = run.path("images") if insert_images else run.path("report")
+    print(f"最终报告: {final}")
+    return final
+
 if __name__ == '__main__':
     start = time.time()
-    #创建智能体
-    create_agent()
+    # --no-llm：不调用大模型，规则生成完整报告；--resume：从最近一次运行的未完成阶段继续
+    run_report_pipeline(resume="--resume" in sys.argv, use_llm="--no-llm" not in sys.argv)
     end = time.time()
     print("耗时:",end-start)
@@ -6,11 +6,13 @@ from langchain.agents import create_tool_calling_agent, AgentExecutor
 from Tool.word_Imagetool import insert_images_to_docx
 from Tool.documentRead_tool import read_text_auto, save_to_docx
 from Model.mychat_doubao import MyChatModel
+from Agent.scratchpad import ScratchpadManager
+from pipeline.job_context import current_job
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 def create_agent():
     chat = MyChatModel()
-    llm = chat.get_langchain_llm()
+    llm = chat.get_langchain_llm(task="tool")
     tools = [insert_images_to_docx, read_text_auto, save_to_docx]
     prompt = ChatPromptTemplate.from_messages([
         ("system", "可使用以下工具：1) read_text_auto 读取/预览模板；2) save_to_docx 保存文本；3) insert_images_to_docx 执行图片插入。必须调用 insert_images_to_docx，并使用参数 template_path={template_path}，output_path={output_path}，static_dir={static_dir}。不要生成其它描述性文本。"),
@@ -18,11 +20,13 @@ def create_agent():
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
     agent = create_tool_calling_agent(llm=llm, tools=tools, prompt=prompt)
-    executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
-    tpl = os.environ.get("TEMPLATE_REPORT_PATH") or "报告模板.docx"
+    executor = AgentExecutor(agent=agent, tools=tools, verbose=True,
+                             trim_intermediate_steps=ScratchpadManager.from_env())
+    job = current_job()
+    tpl = job.template_path or "报告模板.docx"
     ts = time.strftime("%Y%m%d_%H%M%S")
-    out = os.path.abspath(f"模板_插图_{ts}.docx")
-    static_dir = os.environ.get("STATIC_DIR") or "static"
+    out = job.output_path(f"模板_插图_{ts}.docx")
+    static_dir = job.static_dir
     data = {
         "template_path": tpl,
         "output_path": out,
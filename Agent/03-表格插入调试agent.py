@@ -7,15 +7,17 @@ from Tool.word_tool import create_complete_report
 from Tool.documentRead_tool import read_text_auto, save_to_docx
 from Tool.word_Imagetool import insert_images_to_docx
 from Tool.excel_reader_tool import read_filtered_excel_tables
+from pipeline.job_context import current_job
 import pandas as pd
 
 def run():
-    raw = os.environ.get("REFER_FILE_PATH") or os.environ.get("RAW_REPORT_PATH")
-    tpl = os.environ.get("TEMPLATE_REPORT_PATH")
+    job = current_job()
+    raw = job.raw_excel_path
+    tpl = job.template_path
     ts = time.strftime("%Y%m%d_%H%M%S")
-    out = os.path.abspath(f"表格插入测试_{ts}.docx")
-    imgs_out = os.path.abspath(f"表格插入测试_插图_{ts}.docx")
-    static_dir = os.environ.get("STATIC_DIR") or "static"
+    out = job.output_path(f"表格插入测试_{ts}.docx")
+    imgs_out = job.output_path(f"表格插入测试_插图_{ts}.docx")
+    static_dir = job.static_dir
     if not raw or not os.path.exists(raw):
         print("缺陷汇总路径未配置或不存在")
         return
@@ -24,7 +26,7 @@ def run():
         return
     try:
         defects = read_and_format_defects.invoke({"input_file": raw})
-        tables = read_filtered_excel_tables.invoke({"file_path": os.environ.get("REFER_FILE_OUT_PATH")})
+        tables = read_filtered_excel_tables.invoke({"file_path": job.excel_path})
         t31 = tables.get("table31", [])
         t32 = tables.get("table32", [])
         lines = list(t31) + list(t32)
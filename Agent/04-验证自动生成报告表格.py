@@ -1,25 +1,27 @@
 import os
-from docx import Document
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Tool.docx_stream import iter_docx_tables
 
 def main():
     path = os.path.abspath('厦门轨道交通桥梁支座检查报告_自动生成.docx')
     print('Doc:', path, os.path.exists(path))
     if not os.path.exists(path):
         return
-    doc = Document(path)
-    tables = doc.tables
-    def is_5col_header(t):
-        if not t.rows:
+    # 直接遍历 w:tr/w:tc 读取表格，不加载 python-docx 文档对象；
+    # fill_merged=True：纵向合并的桥墩/构件列在每行都给出值，与原 t.cell(1, i) 的结果一致
+    def is_5col_header(rows):
+        if not rows:
             return False
-        hdr = [c.text.strip() for c in t.rows[0].cells[:5]]
+        hdr = [c.strip() for c in rows[0][:5]]
         return hdr == ['桥墩','构件','部位','缺陷类型','现场照片']
-    t5 = [t for t in tables if is_5col_header(t)]
-    for idx, t in enumerate(t5):
-        rows = len(t.rows)
-        sample = [t.cell(1, i).text for i in range(5)] if rows > 1 else []
+    t5 = [rows for rows in iter_docx_tables(path, fill_merged=True) if is_5col_header(rows)]
+    for idx, rows in enumerate(t5):
+        sample = rows[1][:5] if len(rows) > 1 else []
         flag = sample[1] if sample else ''
         tag = '3.1(#梁/#墩)' if ('#梁' in flag or '#墩' in flag) else '3.2(支座系统)'
-        print(f'Table{idx} [{tag}] rows: {rows} sample: {sample}')
+        print(f'Table{idx} [{tag}] rows: {len(rows)} sample: {sample}')
 
 if __name__ == '__main__':
     main()
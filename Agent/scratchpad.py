@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+from Model.tokens import estimate_tokens
+
+# 观察结果被截断时，针对特定工具给模型的补充提示
+TOOL_HINTS = {
+    "read_filtered_excel_tables": "生成报告时 excel_filtered_table 可传空字符串，create_complete_report 会自动读取完整表格",
+    "read_and_format_defects": "生成报告时 create_complete_report 会自动读取完整缺陷表",
+}
+
+
+def _to_text(observation) -> str:
+    """与 langchain 生成 ToolMessage 时的序列化方式保持一致"""
+    if isinstance(observation, str):
+        return observation
+    try:
+        return json.dumps(observation, ensure_ascii=False)
+    except Exception:
+        return str(observation)
+
+
+def _describe(observation, text: str) -> str:
+    """生成一行结构摘要：dict/list 给出字段与条数，文本给出首行"""
+    if isinstance(observation, dict):
+        parts = []
+        for k, v in list(observation.items())[:8]:
+            parts.append(f"{k}: {len(v)} 项" if isinstance(v, (list, dict)) else f"{k}: {str(v)[:20]}")
+        return "；".join(parts)
+    if isinstance(observation, list):
+        return f"列表 {len(observation)} 项"
+    first = text.strip().split("\n", 1)[0]
+    return first[:60]
+
+
+class ScratchpadManager:
+    """
+    agent_scratchpad 压缩器（作为 AgentExecutor 的 trim_intermediate_steps 使用）。
+
+    - 最近 keep_recent 步的工具输出最多保留 max_observation_tokens（超出部分截断）；
+    - 更早的工具输出压缩为一行摘要（不超过 summary_tokens）；
+    - 所有步骤的工具输出合计超过 max_total_tokens 时，从最早的步骤起只保留引用标记；
+    - 被截断/省略的完整输出保存在本地（内存，及可选的 store_dir 目录），可按引用取回。
+    AgentExecutor 保留原始 intermediate_steps，本类每轮返回新的列表，不修改原数据。
+    """
+
+    def __init__(self, max_observation_tokens: int = 2000, keep_recent: int = 2,
+                 summary_tokens: int = 80, max_total_tokens: int = 6000, store_dir: str = None):
+        self.max_observation_tokens = max_observation_tokens
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.max_total_tokens = max_total_tokens
+        self.store_dir = store_dir
+        self.full_observations = {}  # 引用 -> 完整文本
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """AGENT_OBS_MAX_TOKENS / AGENT_OBS_KEEP_RECENT / AGENT_SCRATCHPAD_MAX_TOKENS / AGENT_SCRATCHPAD_DIR"""
+        return cls(
+            max_observation_tokens=int(os.getenv("AGENT_OBS_MAX_TOKENS", "2000")),
+            keep_recent=int(os.getenv("AGENT_OBS_KEEP_RECENT", "2")),
+            summary_tokens=int(os.getenv("AGENT_OBS_SUMMARY_TOKENS", "80")),
+            max_total_tokens=int(os.getenv("AGENT_SCRATCHPAD_MAX_TOKENS", "6000")),
+            store_dir=os.getenv("AGENT_SCRATCHPAD_DIR") or None,
+        )
+
+    def reset(self):
+        """清空内存中保存的完整输出（常驻服务中每个任务开始与结束时调用，避免跨任务累积与串用）"""
+        self.full_observations = {}
+
+    def get_full(self, ref: str) -> str:
+        """按引用取回被截断的完整工具输出"""
+        if ref in self.full_observations:
+            return self.full_observations[ref]
+        if self.store_dir:
+            path = os.path.join(self.store_dir, f"{ref}.txt")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return f.read()
+        raise KeyError(ref)
+
+    def _stash(self, tool_name: str, text: str) -> str:
+        ref = f"{tool_name}-{hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]}"
+        if ref not in self.full_observations:
+            self.full_observations[ref] = text
+            if self.store_dir:
+                with open(os.path.join(self.store_dir, f"{ref}.txt"), "w", encoding="utf-8") as f:
+                    f.write(text)
+        return ref
+
+    @staticmethod
+    def _truncate(text: str, budget: int) -> str:
+        """按 token 预算截断，保留头部 80% 与尾部 20%"""
+        total = estimate_tokens(text)
+        keep_chars = int(len(text) * budget / max(total, 1))
+        head = int(keep_chars * 0.8)
+        tail = keep_chars - head
+        return text[:head] + "\n……\n" + (text[-tail:] if tail > 0 else "")
+
+    def _compact(self, action, observation, text: str, budget: int) -> str:
+        tool_name = getattr(action, "tool", "tool")
+        ref = self._stash(tool_name, text)
+        hint = TOOL_HINTS.get(tool_name)
+        note = f"[工具 {tool_name} 输出约 {estimate_tokens(text)} tokens，已压缩；完整内容已保存在本地，引用 {ref}"
+        note += f"；{hint}]" if hint else "]"
+        if budget <= self.summary_tokens:
+            return f"{note} 摘要：{_describe(observation, text)}"
+        return f"{self._truncate(text, budget)}\n{note}"
+
+    def __call__(self, intermediate_steps):
+        steps = list(intermediate_steps)
+        n = len(steps)
+        compacted = []
+        for i, (action, observation) in enumerate(steps):
+            text = _to_text(observation)
+            budget = self.max_observation_tokens if i >= n - self.keep_recent else self.summary_tokens
+            if estimate_tokens(text) <= budget:
+                compacted.append((action, observation))
+            else:
+                compacted.append((action, self._compact(action, observation, text, budget)))
+
+        # 总量仍超预算时，从最早的步骤起只保留引用标记
+        total = sum(estimate_tokens(_to_text(obs)) for _, obs in compacted)
+        for i in range(max(0, n - self.keep_recent)):
+            if total <= self.max_total_tokens:
+                break
+            action, observation = compacted[i]
+            text = _to_text(observation)
+            ref = self._stash(getattr(action, "tool", "tool"), _to_text(steps[i][1]))
+            marker = f"[已省略早期工具输出，引用 {ref}]"
+            total -= estimate_tokens(text) - estimate_tokens(marker)
+            compacted[i] = (action, marker)
+        return compacted
@@ -0,0 +1,301 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class CallTimeoutError(TimeoutError):
+    """单次尝试超过截止时间仍未返回"""
+
+
+class AttemptSuperseded(Exception):
+    """对冲请求中已有其他尝试胜出，本次尝试作废"""
+
+
+# 可重试的HTTP状态码：请求超时、冲突、限流、服务端错误
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# 可重试的异常类名（避免在此处强依赖 openai / httpx）
+RETRYABLE_ERROR_NAMES = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    "ConnectTimeout", "ReadTimeout", "RemoteProtocolError", "ConnectError",
+}
+# 不重试的异常类名：RateLimitTimeout 表示已等待配额 max_wait 仍未放行，重试只会再排队一轮
+NON_RETRYABLE_ERROR_NAMES = {"RateLimitTimeout"}
+
+_EMPTY = object()
+# 本轮已放弃（超时或出错返回）时登记为胜者，之后到达首个分片的流式尝试无法再胜出，会自行关闭
+_ABANDONED = object()
+# 存在尚在排队等待配额的对冲副本时，主循环的轮询间隔（副本获得配额后才开始计算其截止时间）
+_ADMIT_POLL = 0.05
+
+
+class _Race:
+    """同一轮请求（含对冲副本）的胜者登记，先提交结果者胜出"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.winner = None
+
+    def claim(self, attempt) -> bool:
+        with self._lock:
+            if self.winner is None:
+                self.winner = attempt
+            return self.winner is attempt
+
+
+class CallAttempt:
+    """
+    单次尝试的句柄，传给实际发起请求的函数。
+    流式调用在拿到首个分片时调用 claim()，返回 False 说明已被其他副本抢先，应立即放弃。
+    """
+
+    def __init__(self, index: int, race: _Race, hedged: bool = False, admitted: bool = True):
+        self.index = index
+        self.hedged = hedged
+        self.admitted = admitted  # False：仍在等待限流配额，尚未开始计时
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        self._race = race
+
+    def claim(self) -> bool:
+        return self._race.claim(self)
+
+    def reset_clock(self):
+        """获得发送配额后从此刻开始计时（排队等待限流配额的时间不计入截止时间）"""
+        self.started = time.monotonic()
+        self.admitted = True
+
+    def check(self):
+        """长循环中调用：尝试已被取消（超时或对冲落败）时抛出 AttemptSuperseded"""
+        if self.cancelled.is_set():
+            raise AttemptSuperseded()
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    try:
+        return float(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+
+class CallPolicy:
+    """
+    大模型调用策略：单次尝试截止时间 + 指数退避重试 + 可选对冲请求。
+
+    - timeout：单次尝试在“提交结果”前允许的最长时间（非流式为完整响应，流式为首个分片）；
+    - max_retries：可重试错误（超时、限流、5xx、连接错误）的最大重试次数；
+    - hedge：开启后，若当前尝试耗时超过历史延迟的 hedge_percentile 分位数，
+      则额外发起一个副本请求，先返回者胜出，另一个被取消。
+    """
+
+    def __init__(
+        self,
+        timeout: float = 60.0,
+        max_retries: int = 2,
+        backoff_base: float = 1.0,
+        backoff_max: float = 20.0,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 10,
+        hedge_delay: float = None,
+        history_size: int = 200,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_delay = hedge_delay  # 样本不足时使用的初始对冲延迟（None 表示样本不足时不对冲）
+        self._latencies = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0}
+
+    @classmethod
+    def from_env(cls):
+        """从环境变量读取策略配置（LLM_TIMEOUT / LLM_MAX_RETRIES / LLM_HEDGE 等）"""
+        hedge_delay = os.getenv("LLM_HEDGE_DELAY")
+        return cls(
+            timeout=_env_float("LLM_TIMEOUT", 60.0),
+            max_retries=int(_env_float("LLM_MAX_RETRIES", 2)),
+            backoff_base=_env_float("LLM_BACKOFF_BASE", 1.0),
+            backoff_max=_env_float("LLM_BACKOFF_MAX", 20.0),
+            hedge=str(os.getenv("LLM_HEDGE", "0")).strip().lower() in ("1", "true", "yes", "on"),
+            hedge_percentile=_env_float("LLM_HEDGE_PERCENTILE", 0.95),
+            hedge_min_samples=int(_env_float("LLM_HEDGE_MIN_SAMPLES", 10)),
+            hedge_delay=float(hedge_delay) if hedge_delay else None,
+        )
+
+    # ---------------------
+    # 错误分类与退避
+    # ---------------------
+    def is_retryable(self, exc: Exception) -> bool:
+        if type(exc).__name__ in NON_RETRYABLE_ERROR_NAMES:
+            return False
+        if isinstance(exc, (CallTimeoutError, TimeoutError, ConnectionError)):
+            return True
+        status = getattr(exc, "status_code", None)
+        if status is None:
+            status = getattr(getattr(exc, "response", None), "status_code", None)
+        if status is not None:
+            return int(status) in RETRYABLE_STATUS
+        return type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+    def backoff(self, retry: int, exc: Exception = None) -> float:
+        """第 retry 次重试前的等待秒数；服务端给出 Retry-After 时优先使用"""
+        headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after", ""))
+            return min(retry_after, self.backoff_max)
+        except (TypeError, ValueError):
+            pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (retry - 1)))
+        return delay * (0.5 + random.random() / 2)  # 抖动，避免并发任务同时重试
+
+    def _current_hedge_delay(self):
+        if not self.hedge:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.hedge_min_samples:
+            return self.hedge_delay
+        idx = min(len(samples) - 1, int(len(samples) * self.hedge_percentile))
+        return samples[idx]
+
+    def _count(self, key: str):
+        # 同一 CallPolicy 由多个线程共用（worker 任务、润色线程池），计数需加锁
+        with self._lock:
+            self.stats[key] += 1
+
+    def _record(self, attempt: CallAttempt):
+        with self._lock:
+            self._latencies.append(time.monotonic() - attempt.started)
+            if attempt.hedged:
+                self.stats["hedge_wins"] += 1
+
+    # ---------------------
+    # 执行
+    # ---------------------
+    def execute(self, fn, admit=None):
+        """
+        按策略执行 fn(attempt)，返回首个成功尝试的结果。
+        不可重试的错误直接抛出；重试耗尽后抛出最后一次错误。
+        admit(attempt)：发送前等待配额（如限流器 acquire）。每轮尝试在调用方线程先获得配额再开始计时，
+        排队时间不计入截止时间，对冲也从获得配额后才开始计算；对冲副本在自己的线程中排队，
+        获得配额后若已被取消则抛出 AttemptSuperseded，不再发送。
+        """
+        self._count("calls")
+        last_exc = None
+        for retry in range(self.max_retries + 1):
+            if retry:
+                self._count("retries")
+                time.sleep(self.backoff(retry, last_exc))
+            try:
+                if admit is not None:
+                    admit(None)
+                return self._run_once(fn, admit)
+            except Exception as e:
+                last_exc = e
+                if not self.is_retryable(e) or retry == self.max_retries:
+                    raise
+                print(f"[CallPolicy] 第{retry + 1}次尝试失败（{type(e).__name__}: {e}），准备重试")
+
+    def execute_stream(self, open_stream, admit=None):
+        """
+        流式版本：open_stream(attempt) 返回分片迭代器（admit 同 execute）。
+        截止时间、重试与对冲作用于“首个分片到达”之前；之后由调用方线程直接消费剩余分片。
+        """
+        def _first_chunk(attempt):
+            it = iter(open_stream(attempt))
+            try:
+                first = next(it)
+            except StopIteration:
+                first = _EMPTY
+            # 已超时/落败（cancelled）或本轮已放弃时关闭分片流，避免连接与 token 继续消耗
+            if attempt.cancelled.is_set() or not attempt.claim():
+                close = getattr(it, "close", None)
+                if close:
+                    close()
+                raise AttemptSuperseded()
+            return first, it
+
+        first, it = self.execute(_first_chunk, admit)
+        if first is not _EMPTY:
+            yield first
+            yield from it
+
+    def _run_once(self, fn, admit=None):
+        race = _Race()
+        hedge_delay = self._current_hedge_delay()
+        executor = ThreadPoolExecutor(max_workers=2 if hedge_delay is not None else 1)
+        futures = {}
+
+        def admitted(attempt):
+            admit(attempt)
+            attempt.check()  # 排队期间已有结果或已超时：不再发送
+            attempt.reset_clock()
+            return fn(attempt)
+
+        def launch(hedged=False):
+            # 首个尝试的配额已由 execute 取得；对冲副本在线程中排队，获得配额后才开始计时
+            queued = hedged and admit is not None
+            attempt = CallAttempt(len(futures), race, hedged=hedged, admitted=not queued)
+            self._count("attempts")
+            future = executor.submit(admitted if queued else fn, attempt)
+            futures[future] = attempt
+            return future
+
+        first = futures[launch()]
+        can_hedge = hedge_delay is not None
+        pending = set(futures)
+        errors = []
+        try:
+            while pending:
+                now = time.monotonic()
+                # 对冲副本获得配额时 started 会被推后，因此每轮重新计算截止与对冲时刻
+                hedge_at = first.started + hedge_delay if can_hedge else None
+                events = [futures[f].started + self.timeout - now for f in pending if futures[f].admitted]
+                if hedge_at is not None:
+                    events.append(hedge_at - now)
+                if len(events) < len(pending) + (hedge_at is not None):
+                    events.append(_ADMIT_POLL)
+                next_event = min(events)
+                done, pending = wait(pending, timeout=max(next_event, 0), return_when=FIRST_COMPLETED)
+                for f in done:
+                    attempt = futures[f]
+                    exc = f.exception()
+                    if exc is None and race.claim(attempt):
+                        self._record(attempt)
+                        return f.result()
+                    if exc is not None and not isinstance(exc, AttemptSuperseded):
+                        errors.append(exc)
+                now = time.monotonic()
+                for f in list(pending):
+                    attempt = futures[f]
+                    if race.winner is None and attempt.admitted and now >= attempt.started + self.timeout:
+                        attempt.cancelled.set()
+                        pending.discard(f)
+                        self._count("timeouts")
+                if hedge_at is not None and now >= hedge_at and pending and race.winner is None:
+                    can_hedge = False
+                    self._count("hedges")
+                    pending.add(launch(hedged=True))
+            if not race.claim(_ABANDONED):
+                # 流式尝试在判定超时后才登记胜出：其线程已拿到首个分片并即将返回，采用该结果以免分片流无人关闭
+                for f, attempt in futures.items():
+                    if race.winner is attempt:
+                        self._record(attempt)
+                        return f.result()
+            if errors:
+                raise errors[-1]
+            raise CallTimeoutError(f"大模型调用超过 {self.timeout:g}s 未返回")
+        finally:
+            race.claim(_ABANDONED)
+            for attempt in futures.values():
+                if race.winner is not attempt:
+                    attempt.cancelled.set()
+            executor.shutdown(wait=False)
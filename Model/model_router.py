@@ -0,0 +1,101 @@
+import os
+import threading
+from typing import NamedTuple
+
+from Model.tokens import estimate_tokens
+
+# 推理强度由低到高（方舟 reasoning_effort 取值）
+EFFORT_LEVELS = ["minimal", "low", "medium", "high"]
+
+# 任务类型 -> (模型档位, 推理强度)
+# extract/format 只做字段抽取与格式整理，用小模型、最低推理强度即可；
+# analysis（缺陷成因分析）和 report（整篇报告）才需要大模型与较高推理强度；
+# report 保持原 generate_bridge_report 的 high，未经基准验证前不降低整篇报告的推理强度。
+DEFAULT_ROUTES = {
+    "extract": ("small", "minimal"),
+    "format": ("small", "minimal"),
+    "tool": ("small", "low"),
+    "summary": ("small", "low"),
+    "agent": ("large", "medium"),
+    "report": ("large", "high"),
+    "analysis": ("large", "high"),
+}
+
+
+class Route(NamedTuple):
+    task: str
+    tier: str
+    model: str
+    reasoning_effort: str
+    input_tokens: int
+
+
+def _parse_routes(spec: str) -> dict:
+    """解析 MODEL_ROUTES，如 "extract=small:minimal,analysis=large:high" """
+    routes = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        task, value = item.split("=", 1)
+        tier, _, effort = value.partition(":")
+        routes[task.strip()] = (tier.strip() or "large", effort.strip() or "medium")
+    return routes
+
+
+class ModelRouter:
+    """
+    按任务类型与输入规模为每次调用选择模型和推理强度。
+
+    - 任务类型决定基础档位（见 DEFAULT_ROUTES，可用 MODEL_ROUTES 覆盖）；
+    - 输入超过 small_max_tokens 时小模型任务升级到大模型（长上下文下小模型容易漏数）；
+    - 输入超过 large_input_tokens 时推理强度再提高一级；
+    - 未配置 MODEL_NAME_SMALL / MODEL_NAME_LARGE 时均回落到 MODEL_NAME，行为与原来一致。
+    """
+
+    def __init__(self, small_model: str = None, large_model: str = None, routes: dict = None,
+                 small_max_tokens: int = 8000, large_input_tokens: int = 30000, default_task: str = "report"):
+        default_model = os.getenv("MODEL_NAME")
+        self.models = {
+            "small": small_model or default_model,
+            "large": large_model or default_model,
+        }
+        self.routes = dict(DEFAULT_ROUTES)
+        self.routes.update(routes or {})
+        self.small_max_tokens = small_max_tokens
+        self.large_input_tokens = large_input_tokens
+        self.default_task = default_task
+        self._lock = threading.Lock()
+        self.stats = {}  # "task/model/effort" -> 调用次数
+
+    @classmethod
+    def from_env(cls):
+        """MODEL_NAME_SMALL / MODEL_NAME_LARGE / MODEL_ROUTES / MODEL_ROUTE_SMALL_MAX_TOKENS / MODEL_ROUTE_LARGE_INPUT_TOKENS"""
+        return cls(
+            small_model=os.getenv("MODEL_NAME_SMALL") or None,
+            large_model=os.getenv("MODEL_NAME_LARGE") or None,
+            routes=_parse_routes(os.getenv("MODEL_ROUTES")),
+            small_max_tokens=int(os.getenv("MODEL_ROUTE_SMALL_MAX_TOKENS", "8000")),
+            large_input_tokens=int(os.getenv("MODEL_ROUTE_LARGE_INPUT_TOKENS", "30000")),
+        )
+
+    def route(self, task: str = None, messages=None, input_tokens: int = None) -> Route:
+        """
+        选择本次调用的模型与推理强度
+        参数: task 任务类型；messages 输入消息（用于估算规模）；input_tokens 已知的输入 token 数
+        返回: Route
+        """
+        task = task or self.default_task
+        tier, effort = self.routes.get(task, self.routes[self.default_task])
+        if input_tokens is None:
+            input_tokens = estimate_tokens(messages) if messages is not None else 0
+
+        if tier == "small" and input_tokens > self.small_max_tokens:
+            tier = "large"
+        if input_tokens > self.large_input_tokens and effort in EFFORT_LEVELS:
+            effort = EFFORT_LEVELS[min(EFFORT_LEVELS.index(effort) + 1, len(EFFORT_LEVELS) - 1)]
+
+        route = Route(task, tier, self.models.get(tier) or self.models["large"], effort, input_tokens)
+        with self._lock:
+            key = f"{route.task}/{route.model}/{route.reasoning_effort}"
+            self.stats[key] = self.stats.get(key, 0) + 1
+        return route
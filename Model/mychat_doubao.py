@@ -1,31 +1,137 @@
+from typing import Any
 from langchain_openai import ChatOpenAI
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
 import chardet
 from docx import Document
+from Model.call_policy import CallPolicy
+from Model.model_router import ModelRouter
+from Model.prefix_cache import prefix_cache_from_env
+from Model.rate_limiter import TokenBucketLimiter
+from Model.tokens import estimate_tokens
+from Tool.documentRead_tool import DocumentHandler
+from pipeline.job_context import current_job
+from Tool.template_digest import load_template_digest, format_template_digest
 
 # 加载环境变量
 load_dotenv()
 
+
+# 限流时预估的输出 token 数（请求完成后按实际 usage 修正）
+OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "1024"))
+
+
+def _admission(rate_limiter, messages):
+    """
+    返回 (本次估算的 token 数, admit 回调)。admit(attempt) 由 CallPolicy 在尝试开始计时前调用，
+    排队时间不计入截止时间；对冲副本排队期间已被取消时退回预估 token，不再发送
+    """
+    estimated = estimate_tokens(messages) + OUTPUT_TOKEN_ESTIMATE
+
+    def admit(attempt=None):
+        if rate_limiter is None:
+            return
+        rate_limiter.acquire(estimated)
+        if attempt is not None and attempt.cancelled.is_set():
+            rate_limiter.settle(estimated, 0)
+            attempt.check()
+
+    return estimated, admit
+
+
+def _settle_stream(chunks, rate_limiter, estimated, usage_of):
+    """透传流式分片，结束后按最后一个携带 usage 的分片修正 token 桶（未返回 usage 时保留预估值）"""
+    actual = None
+    try:
+        for chunk in chunks:
+            actual = usage_of(chunk) or actual
+            yield chunk
+    finally:
+        if rate_limiter is not None:
+            rate_limiter.settle(estimated, actual)
+
+
+def _langchain_chunk_usage(chunk):
+    usage = getattr(chunk.message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+def _openai_chunk_usage(chunk):
+    return getattr(getattr(chunk, "usage", None), "total_tokens", None)
+
+
+class PolicyChatOpenAI(ChatOpenAI):
+    """按 CallPolicy 执行的 ChatOpenAI：agent 的流式与非流式调用共用同一套超时/重试/对冲策略"""
+    call_policy: Any = None
+    rate_limiter: Any = None
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimated, admit = _admission(self.rate_limiter, messages)
+
+        def _attempt(attempt=None):
+            result = ChatOpenAI._generate(self, messages, stop=stop, run_manager=run_manager, **kwargs)
+            if self.rate_limiter is not None:
+                usage = (result.llm_output or {}).get("token_usage") or {}
+                self.rate_limiter.settle(estimated, usage.get("total_tokens"))
+            return result
+
+        if self.call_policy is None:
+            admit()
+            return _attempt()
+        return self.call_policy.execute(_attempt, admit=admit)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        estimated, admit = _admission(self.rate_limiter, messages)
+
+        def _open(attempt=None):
+            return ChatOpenAI._stream(self, messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        if self.call_policy is None:
+            admit()
+            chunks = _open()
+        else:
+            chunks = self.call_policy.execute_stream(_open, admit=admit)
+        # stream_usage=True 时最后一个分片携带 usage_metadata
+        yield from _settle_stream(chunks, self.rate_limiter, estimated, _langchain_chunk_usage)
+
+
 # 聊天模型主类
 class MyChatModel:
-    def __init__(self):
+    def __init__(self, call_policy: CallPolicy = None, rate_limiter: TokenBucketLimiter = None,
+                 router: ModelRouter = None, prefix_cache=None):
         # 基础配置
         self.model_name = os.getenv("MODEL_NAME")
         
         # 豆包API配置
         self.api_key = os.getenv("ARK_API_KEY")
         self.base_url = os.getenv("ARK_API_BASE")
-        self.raw_report_path = os.getenv("RAW_REPORT_PATH")
-        self.template_report_path = os.getenv("TEMPLATE_REPORT_PATH")
-        
+        self.doc_handler = DocumentHandler()
+        # 调用策略：超时/重试/对冲（未传入时从环境变量读取）
+        self.call_policy = call_policy or CallPolicy.from_env()
+        # 跨进程限流器：设置 ARK_RPM / ARK_TPM 后启用，发送前等待配额
+        self.rate_limiter = rate_limiter or TokenBucketLimiter.from_env()
+        # 模型路由：按任务类型与输入规模选择模型和推理强度
+        self.router = router or ModelRouter.from_env()
+        # 静态前缀缓存（系统提示词 + 模板）：LLM_PREFIX_CACHE=ark|local 启用，首次调用时登记
+        self._prefix_cache = prefix_cache
+        self._prefix_cache_loaded = prefix_cache is not None
         
         # 懒加载实例
-        self._llm = None  # langchain的ChatOpenAI实例
+        self._llms = {}  # (模型, 推理强度) -> langchain的ChatOpenAI实例
         self._openai_client = None  # 原生OpenAI客户端实例
         self._prompt_system = self._load_system_prompt()
 
+    @property
+    def raw_report_path(self):
+        """统计报告路径：取自当前任务（未激活任务时取自环境变量）"""
+        return current_job().raw_report_path
+
+    @property
+    def template_report_path(self):
+        """模板路径：取自当前任务（未激活任务时取自环境变量）"""
+        return current_job().template_path
+
     def _load_system_prompt(self):
         """加载桥梁检测报告生成的系统提示词"""
         return """
@@ -38,58 +144,97 @@ class MyChatModel:
         if not self._openai_client:
             if not self.api_key:
                 raise ValueError("未找到有效的API密钥，请设置ARK_API_KEY")
+            # 重试由 call_policy 统一处理，客户端自身不再重试；timeout 兼作流式分片间的读超时
             self._openai_client = OpenAI(
                 base_url=self.base_url,
-                api_key=self.api_key
+                api_key=self.api_key,
+                timeout=self.call_policy.timeout,
+                max_retries=0
             )
         return self._openai_client
 
-    def get_langchain_llm(self):
-        """获取langchain的ChatOpenAI实例（配置豆包API）"""
-        if not self._llm:
+    @property
+    def prefix_cache(self):
+        """懒加载前缀缓存（未启用时为 None）"""
+        if not self._prefix_cache_loaded:
+            self._prefix_cache = prefix_cache_from_env(self.openai_client)
+            self._prefix_cache_loaded = True
+        return self._prefix_cache
+
+    def get_langchain_llm(self, task: str = "agent"):
+        """获取langchain的ChatOpenAI实例（配置豆包API），模型与推理强度按 task 路由"""
+        route = self.router.route(task)
+        key = (route.model, route.reasoning_effort)
+        if key not in self._llms:
             # 验证配置是否存在
             if not self.api_key:
                 raise ValueError("未找到有效的API密钥，请设置ARK_API_KEY环境变量")
             if not self.base_url:
                 raise ValueError("未找到有效的API基座地址，请设置ARK_API_BASE环境变量")
             # 实例化ChatOpenAI并传递豆包API配置
-            self._llm = ChatOpenAI(
-                model_name=self.model_name,
+            self._llms[key] = PolicyChatOpenAI(
+                model_name=route.model,
+                reasoning_effort=route.reasoning_effort,
                 api_key=self.api_key,
                 base_url=self.base_url,
+                call_policy=self.call_policy,
+                rate_limiter=self.rate_limiter,
+                timeout=self.call_policy.timeout,
+                max_retries=0,
+                stream_usage=True,  # 流式结束时返回 usage，用于修正限流器的 token 预估
                 # 可选配置：根据需求调整
                 temperature=0.2,  # 控制生成的随机性（0-1，越小越严谨）
                 # max_tokens=   # 最大生成 tokens 数
             )
-        return self._llm
+            # agent 每轮迭代都重发相同的系统提示词：经前缀缓存只登记一次
+            if self.prefix_cache is not None:
+                self._llms[key].client = self.prefix_cache.wrap(self._llms[key].client)
+        return self._llms[key]
+
+    def metrics(self) -> dict:
+        """调用策略与限流器的运行指标（重试/对冲次数、排队深度、等待时长等）"""
+        return {
+            "call_policy": dict(self.call_policy.stats),
+            "rate_limiter": self.rate_limiter.metrics() if self.rate_limiter else None,
+            "routes": dict(self.router.stats),
+            "prefix_cache": self._prefix_cache.metrics() if self._prefix_cache else None,
+        }
+
+    def chat(self, messages, task: str = "report", stream_callback=None, timeout: float = None):
+        """
+        按路由结果流式调用模型
+        参数: messages 消息列表；task 任务类型（extract/format/summary/analysis/report 等）；
+              timeout 本次请求的 HTTP 超时（秒），未指定时使用客户端默认值（截止时间预算下传入剩余时间）
+        返回: {"full_content", "reasoning", "model", "reasoning_effort"}
+        """
+        route = self.router.route(task, messages)
+        completions = self.openai_client.chat.completions
+        if self.prefix_cache is not None:
+            completions = self.prefix_cache.wrap(completions)
+
+        # 流式调用（首个分片到达前受 call_policy 的截止时间/重试/对冲约束；限流排队在计时开始之前）
+        estimated, admit = _admission(self.rate_limiter, messages)
+
+        options = {"timeout": timeout} if timeout is not None else {}
+
+        def _open(attempt):
+            return completions.create(
+                **options,
+                model=route.model,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                reasoning_effort=route.reasoning_effort
+            )
+
+        stream = _settle_stream(self.call_policy.execute_stream(_open, admit=admit),
+                                self.rate_limiter, estimated, _openai_chunk_usage)
 
-    def generate_bridge_report(self, stream_callback=None):
-        """生成桥梁检测报告（流式处理）"""
-        # 通过文档处理器读取输入数据
-        raw_report = self.doc_handler.read_text_auto(self.raw_report_path)
-        template = self.doc_handler.read_text_auto(self.template_report_path)
-        
-        # 构建消息
-        messages = [
-            {"role": "system", "content": self._prompt_system},
-            {"role": "user", "content": (
-                "请根据以下数据，生成完整的桥梁支座检测报告：\n\n"
-                f"【统计报告】\n{raw_report}\n\n"
-                f"【报告模板】\n{template}"
-            )}
-        ]
-        
-        # 流式调用
-        stream = self.openai_client.chat.completions.create(
-            model=self.model_name,
-            messages=messages,
-            stream=True,
-            reasoning_effort="high"
-        )
-        
         content = ""
         reasoning_content = ""
         for chunk in stream:
+            if not chunk.choices:
+                continue
             delta = chunk.choices[0].delta
             if getattr(delta, "reasoning_content", None):
                 reasoning_content += delta.reasoning_content
@@ -99,12 +244,32 @@ class MyChatModel:
                 content += delta.content
                 if stream_callback:
                     stream_callback("content", delta.content)
-        
+
         return {
             "full_content": content,
-            "reasoning": reasoning_content
+            "reasoning": reasoning_content,
+            "model": route.model,
+            "reasoning_effort": route.reasoning_effort,
         }
 
+    def generate_bridge_report(self, stream_callback=None):
+        """生成桥梁检测报告（流式处理）"""
+        # 通过文档处理器读取统计报告；模板只发送结构摘要（占位符、章节标题、表格结构）
+        raw_report = self.doc_handler.read_text_auto(self.raw_report_path)
+        template = format_template_digest(load_template_digest(self.template_report_path))
+        
+        # 构建消息：系统提示词与模板在各次调用间不变，放在开头作为可缓存的静态前缀
+        messages = [
+            {"role": "system", "content": self._prompt_system},
+            {"role": "system", "content": f"【报告模板】\n{template}"},
+            {"role": "user", "content": (
+                "请根据以下统计报告与上述模板，生成完整的桥梁支座检测报告：\n\n"
+                f"【统计报告】\n{raw_report}"
+            )}
+        ]
+        
+        return self.chat(messages, task="report", stream_callback=stream_callback)
+
 if __name__ == '__main__':
     model = MyChatModel()
     # 测试报告生成
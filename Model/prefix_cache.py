@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+
+from Model.tokens import estimate_tokens
+
+
+def _split_prefix(messages):
+    """静态前缀 = 开头连续的 system 消息（系统提示词、模板摘要等），其余为本次调用的动态部分"""
+    n = 0
+    for m in messages:
+        role = m.get("role") if isinstance(m, dict) else getattr(m, "type", None)
+        if role not in ("system", "developer"):
+            break
+        n += 1
+    return list(messages[:n]), list(messages[n:])
+
+
+def _usage_of(response):
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if usage is None:
+        return None, None
+    get = usage.get if isinstance(usage, dict) else lambda k, d=None: getattr(usage, k, d)
+    details = get("prompt_tokens_details") or {}
+    cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    return get("prompt_tokens"), cached
+
+
+class _CachedCompletions:
+    """包装 client.chat.completions，create() 经前缀缓存发送；其余属性透传"""
+
+    def __init__(self, completions, cache):
+        self._completions = completions
+        self._cache = cache
+
+    def create(self, **payload):
+        return self._cache.create(self._completions, **payload)
+
+    @property
+    def with_raw_response(self):
+        """ChatOpenAI 非流式调用走 with_raw_response.create(...).parse()"""
+        return _RawResponseAdapter(self)
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class _RawResponseAdapter:
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, **payload):
+        return _ParsedResponse(self._completions.create(**payload))
+
+
+class _ParsedResponse:
+    headers = {}
+
+    def __init__(self, response):
+        self._response = response
+
+    def parse(self):
+        return self._response
+
+
+class _PrefixCacheBase(ABC):
+    """
+    前缀缓存公共逻辑：拆分静态前缀、登记缓存、统计命中率。
+
+    同一模型 + 同一静态前缀只登记一次；之后的调用引用已登记的前缀，只发送动态部分。
+    登记请求在锁外发出：同一前缀并发首次调用时只有一个线程登记，其余等待其结果，不同前缀互不阻塞。
+    前缀估算不足 min_prefix_tokens 时不走缓存（登记开销大于收益）。
+    """
+
+    def __init__(self, ttl: int = 3600, min_prefix_tokens: int = 256):
+        self.ttl = ttl
+        self.min_prefix_tokens = min_prefix_tokens
+        self._entries = {}  # key -> (句柄, 过期时间)
+        self._pending = {}  # key -> 正在登记的 Future
+        self._unsupported = set()  # 服务端拒绝缓存调用的 key，之后直接走普通调用
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "cacheable": 0, "hits": 0, "misses": 0, "fallbacks": 0,
+                      "prompt_tokens": 0, "cached_tokens": 0}
+
+    @staticmethod
+    def key(model: str, prefix) -> str:
+        raw = json.dumps([model, prefix], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def wrap(self, completions):
+        """包装 OpenAI 客户端的 chat.completions（含 ChatOpenAI.client），对调用方透明"""
+        return _CachedCompletions(completions, self)
+
+    def register(self, model: str, prefix) -> object:
+        """登记静态前缀（已登记且未过期时直接返回句柄），返回句柄"""
+        return self._lookup(model, prefix)[0]
+
+    def _lookup(self, model, prefix):
+        """返回 (句柄, 是否命中)"""
+        k = self.key(model, prefix)
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry and entry[1] > time.time():
+                self.stats["hits"] += 1
+                self._entries[k] = (entry[0], time.time() + self.ttl)  # 每次使用刷新有效期
+                return entry[0], True
+            pending = self._pending.get(k)
+            owner = pending is None
+            if owner:
+                pending = self._pending[k] = Future()
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+        if not owner:
+            # 同一前缀正由其他线程登记：等待其结果（登记失败时抛出同一异常）
+            return pending.result(), True
+        try:
+            handle = self._register(model, prefix)
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(k, None)
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            self._entries[k] = (handle, time.time() + self.ttl)
+            self._pending.pop(k, None)
+        pending.set_result(handle)
+        return handle, False
+
+    def invalidate(self, model: str, prefix):
+        with self._lock:
+            self._entries.pop(self.key(model, prefix), None)
+
+    def create(self, completions, **payload):
+        """与 chat.completions.create 参数一致；前缀可缓存时引用缓存发送"""
+        self.stats["requests"] += 1
+        model = payload.get("model")
+        prefix, rest = _split_prefix(payload.get("messages") or [])
+        k = self.key(model, prefix)
+        if not prefix or not rest or k in self._unsupported or estimate_tokens(prefix) < self.min_prefix_tokens:
+            return completions.create(**payload)
+
+        self.stats["cacheable"] += 1
+        try:
+            handle, hit = self._lookup(model, prefix)
+            response = self._send(completions, handle, hit, prefix, rest, payload)
+        except Exception as e:
+            if not self._is_rejected(e):
+                raise
+            # 服务端不支持该调用形式（如携带 tools）：记住后回落为普通调用
+            self._unsupported.add(k)
+            self.stats["fallbacks"] += 1
+            print(f"[PrefixCache] 前缀缓存调用被拒绝，改为普通调用：{e}")
+            return completions.create(**payload)
+        self._account(response)
+        return response
+
+    def _account(self, response):
+        prompt_tokens, cached_tokens = _usage_of(response)
+        if prompt_tokens:
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["cached_tokens"] += cached_tokens or 0
+
+    def metrics(self) -> dict:
+        stats = dict(self.stats)
+        stats["hit_rate"] = stats["hits"] / stats["cacheable"] if stats["cacheable"] else 0.0
+        stats["token_hit_rate"] = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+        stats["entries"] = len(self._entries)
+        return stats
+
+    # 子类实现
+    @abstractmethod
+    def _register(self, model, prefix):
+        """登记静态前缀，返回句柄（在锁外调用，可发起网络请求）"""
+
+    @abstractmethod
+    def _send(self, completions, handle, hit, prefix, rest, payload):
+        """引用已登记的前缀发送本次调用"""
+
+    def _is_rejected(self, exc) -> bool:
+        return False
+
+
+class ArkContextCache(_PrefixCacheBase):
+    """
+    方舟上下文缓存（common_prefix 模式）：
+    POST /context/create 登记前缀得到 context_id，之后经 /context/chat/completions 只发送动态消息。
+    """
+
+    def __init__(self, client, ttl: int = 3600, min_prefix_tokens: int = 256, mode: str = "common_prefix"):
+        super().__init__(ttl=ttl, min_prefix_tokens=min_prefix_tokens)
+        self.client = client  # openai.OpenAI，base_url 指向方舟
+        self.mode = mode
+
+    def _register(self, model, prefix):
+        result = self.client.post(
+            "/context/create",
+            body={"model": model, "mode": self.mode, "messages": prefix, "ttl": self.ttl},
+            cast_to=object,
+        )
+        return result["id"]
+
+    def _send(self, completions, handle, hit, prefix, rest, payload):
+        from openai import Stream
+        from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+        body = dict(payload, messages=rest, context_id=handle)
+        stream = bool(body.get("stream"))
+        # 单次请求的超时是客户端选项，不属于请求体
+        options = {"timeout": body.pop("timeout")} if "timeout" in body else {}
+
+        def _post(context_id):
+            body["context_id"] = context_id
+            return self.client.post("/context/chat/completions", body=body, cast_to=ChatCompletion, options=options,
+                                    stream=stream, stream_cls=Stream[ChatCompletionChunk])
+
+        try:
+            return _post(handle)
+        except Exception as e:
+            message = str(e).lower()
+            expired = "context" in message and any(w in message for w in ("expired", "not found", "not exist"))
+            if getattr(e, "status_code", None) != 404 and not expired:
+                raise
+            # 上下文已过期或被清理：重新登记一次
+            self.invalidate(payload.get("model"), prefix)
+            return _post(self.register(payload.get("model"), prefix))
+
+    def _is_rejected(self, exc) -> bool:
+        return getattr(exc, "status_code", None) in (400, 404, 405)
+
+
+class LocalPrefixCache(_PrefixCacheBase):
+    """
+    本地替身：不依赖服务端缓存，仍发送完整消息，只在本地登记前缀并统计命中。
+    用于测试及不支持上下文缓存的接入点；命中时按前缀估算 token 数计入 cached_tokens。
+    """
+
+    def _register(self, model, prefix):
+        return {"prefix_tokens": estimate_tokens(prefix)}
+
+    def _send(self, completions, handle, hit, prefix, rest, payload):
+        response = completions.create(**payload)
+        self.stats["prompt_tokens"] += handle["prefix_tokens"] + estimate_tokens(rest)
+        if hit:
+            self.stats["cached_tokens"] += handle["prefix_tokens"]
+        return response
+
+    def _account(self, response):
+        pass
+
+
+def prefix_cache_from_env(client):
+    """LLM_PREFIX_CACHE=ark|local 启用前缀缓存（默认关闭）；LLM_PREFIX_CACHE_TTL / LLM_PREFIX_CACHE_MIN_TOKENS"""
+    kind = (os.getenv("LLM_PREFIX_CACHE") or "").strip().lower()
+    ttl = int(os.getenv("LLM_PREFIX_CACHE_TTL", "3600"))
+    min_tokens = int(os.getenv("LLM_PREFIX_CACHE_MIN_TOKENS", "256"))
+    if kind == "ark":
+        return ArkContextCache(client, ttl=ttl, min_prefix_tokens=min_tokens)
+    if kind == "local":
+        return LocalPrefixCache(ttl=ttl, min_prefix_tokens=min_tokens)
+    return None
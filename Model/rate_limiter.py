@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class RateLimitTimeout(TimeoutError):
+    """等待配额超过 max_wait 仍未获得放行"""
+
+
+class _FileLock:
+    """跨进程文件锁（POSIX 使用 flock，Windows 使用 msvcrt.locking）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self._fh.seek(0)
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fh.close()
+            self._fh = None
+
+
+class TokenBucketLimiter:
+    """
+    跨进程共享的令牌桶限流器（请求数 RPM + 估算 token 数 TPM 双桶）。
+
+    桶状态保存在本地 JSON 文件中，同一台机器上并发运行的报告任务共享同一份配额；
+    调用方在发送请求前 acquire()，配额不足时阻塞等待而不是发出后吃 429。
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, state_path: str = None,
+                 max_wait: float = 300.0, poll_interval: float = 0.05):
+        if not rpm and not tpm:
+            raise ValueError("rpm 与 tpm 至少需要设置一个")
+        self.rpm = float(rpm) if rpm else None
+        self.tpm = float(tpm) if tpm else None
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.state_path = state_path or os.path.join(tempfile.gettempdir(), "ark_rate_limiter.json")
+        self._lock_path = self.state_path + ".lock"
+        # 本进程内的等待统计（队列深度取自共享状态，反映所有进程）
+        self._stats_lock = threading.Lock()
+        self._stats = {"acquired": 0, "waited": 0, "wait_time_total": 0.0, "wait_time_max": 0.0,
+                       "tokens_requested": 0, "tokens_settled": 0}
+
+    @classmethod
+    def from_env(cls):
+        """ARK_RPM / ARK_TPM 均未设置时返回 None（不限流）"""
+        rpm = os.getenv("ARK_RPM")
+        tpm = os.getenv("ARK_TPM")
+        if not rpm and not tpm:
+            return None
+        state_path = os.getenv("ARK_RATE_STATE")
+        if not state_path:
+            # 按账号区分状态文件，不同 API Key 的配额互不影响
+            key = hashlib.sha1((os.getenv("ARK_API_KEY") or "").encode("utf-8")).hexdigest()[:12]
+            state_path = os.path.join(tempfile.gettempdir(), f"ark_rate_{key}.json")
+        return cls(rpm=float(rpm) if rpm else None, tpm=float(tpm) if tpm else None,
+                   state_path=state_path, max_wait=float(os.getenv("ARK_RATE_MAX_WAIT", 300)))
+
+    # ---------------------
+    # 共享状态读写（调用方需持有文件锁）
+    # ---------------------
+    def _load(self, now: float) -> dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        if "ts" not in state:
+            state = {"req": self.rpm or 0.0, "tok": self.tpm or 0.0, "ts": now, "waiters": {}}
+        # 按流逝时间补充令牌
+        elapsed = max(0.0, now - state["ts"])
+        if self.rpm:
+            state["req"] = min(self.rpm, state["req"] + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            state["tok"] = min(self.tpm, state["tok"] + elapsed * self.tpm / 60.0)
+        state["ts"] = now
+        # 清理异常退出进程遗留的等待登记
+        stale = now - self.max_wait - 60
+        state["waiters"] = {k: v for k, v in state.get("waiters", {}).items() if v > stale}
+        return state
+
+    def _save(self, state: dict):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def _try_take(self, tokens: float, waiter_id: str, waiting: bool):
+        """尝试扣减配额；成功返回 0，否则返回建议等待秒数"""
+        now = time.time()
+        with _FileLock(self._lock_path):
+            state = self._load(now)
+            need_req = 0.0 if not self.rpm or state["req"] >= 1 else (1 - state["req"]) * 60.0 / self.rpm
+            need_tok = 0.0 if not self.tpm or state["tok"] >= tokens else (tokens - state["tok"]) * 60.0 / self.tpm
+            wait = max(need_req, need_tok)
+            if wait <= 0:
+                if self.rpm:
+                    state["req"] -= 1
+                if self.tpm:
+                    state["tok"] -= tokens
+                state["waiters"].pop(waiter_id, None)
+            elif not waiting:
+                state["waiters"][waiter_id] = now
+            self._save(state)
+        return wait
+
+    # ---------------------
+    # 对外接口
+    # ---------------------
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        阻塞直到获得 1 次请求和 tokens 个 token 的配额
+        参数: tokens 本次请求估算的 token 数（输入 + 预计输出）
+        返回: 实际等待秒数
+        """
+        tokens = float(min(tokens, self.tpm)) if self.tpm else 0.0
+        waiter_id = f"{os.getpid()}:{threading.get_ident()}:{time.monotonic_ns()}"
+        start = time.monotonic()
+        waiting = False
+        while True:
+            wait = self._try_take(tokens, waiter_id, waiting)
+            if wait <= 0:
+                break
+            waiting = True
+            if time.monotonic() - start + wait > self.max_wait:
+                self._leave(waiter_id)
+                raise RateLimitTimeout(f"等待方舟配额超过 {self.max_wait:g}s（RPM={self.rpm}, TPM={self.tpm}）")
+            time.sleep(max(self.poll_interval, min(wait, 1.0)))
+        waited = time.monotonic() - start
+        with self._stats_lock:
+            self._stats["acquired"] += 1
+            self._stats["tokens_requested"] += tokens
+            if waiting:
+                self._stats["waited"] += 1
+                self._stats["wait_time_total"] += waited
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+        return waited
+
+    def settle(self, estimated: int, actual: int):
+        """请求完成后按实际用量（usage.total_tokens）修正 token 桶，多退少补"""
+        if not self.tpm or actual is None:
+            return
+        delta = float(min(estimated, self.tpm)) - float(actual)
+        with _FileLock(self._lock_path):
+            state = self._load(time.time())
+            state["tok"] = min(self.tpm, state["tok"] + delta)
+            self._save(state)
+        with self._stats_lock:
+            self._stats["tokens_settled"] += actual
+
+    def _leave(self, waiter_id: str):
+        with _FileLock(self._lock_path):
+            state = self._load(time.time())
+            state["waiters"].pop(waiter_id, None)
+            self._save(state)
+
+    def metrics(self) -> dict:
+        """限流指标：共享队列深度、本进程等待次数与等待时长、当前剩余配额"""
+        with _FileLock(self._lock_path):
+            state = self._load(time.time())
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = len(state["waiters"])
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["waited"] if stats["waited"] else 0.0
+        stats["available_requests"] = state["req"] if self.rpm else None
+        stats["available_tokens"] = state["tok"] if self.tpm else None
+        return stats
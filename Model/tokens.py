@@ -0,0 +1,37 @@
+import re
+
+# 中日韩统一表意文字及全角标点：按 1 字符≈1 token 粗略估算（偏保守）
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+
+def _text_of(message) -> str:
+    """提取消息文本：支持 str、OpenAI 格式 dict、langchain 消息对象及多模态 content 列表"""
+    if message is None:
+        return ""
+    if isinstance(message, str):
+        return message
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", message)
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, dict):
+                parts.append(str(part.get("text", "")))
+            else:
+                parts.append(str(part))
+        return "".join(parts)
+    return str(content or "")
+
+
+def estimate_tokens(value) -> int:
+    """
+    估算文本或消息列表的 token 数（不依赖分词器，用于限流与预算控制）
+    参数: 字符串、单条消息或消息列表
+    返回: 估算的 token 数
+    """
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_tokens(v) for v in value)
+    text = _text_of(value)
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
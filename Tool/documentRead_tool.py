@@ -1,35 +1,16 @@
 import os
-import chardet
 from docx import Document
 from docx.document import Document as DocObject
-from docx.oxml.ns import qn
 from langchain.tools import tool
+from Tool.template_digest import load_template_digest, format_template_digest
+from Tool.docx_stream import docx_to_text, rows_to_markdown, table_rows
+from Tool.text_reader import read_text_file
+from Tool.markdown_docx import build_docx
+from Tool.env_config import load_env
+from pipeline.job_context import current_job
 
-def load_env_file():
-    """手动加载.env文件"""
-    env_path = os.path.join(os.getcwd(), ".env")
-    if not os.path.exists(env_path):
-        # 尝试项目根目录
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        env_path = os.path.join(project_root, ".env")
-    
-    if os.path.exists(env_path):
-        print(f"加载环境变量文件: {env_path}")
-        with open(env_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        # 移除引号
-                        if value.startswith(('"', "'")) and value.endswith(('"', "'")):
-                            value = value[1:-1]
-                        os.environ[key.strip()] = value.strip()
-    else:
-        print("未找到.env文件，将使用系统环境变量")
-
-# 加载环境变量
-load_env_file()
+# 加载环境变量（各模块共用，进程内只解析一次）
+load_env()
 
 def _parse_docx_tables_to_markdown(table) -> str:
     """
@@ -37,28 +18,8 @@ def _parse_docx_tables_to_markdown(table) -> str:
     参数: docx表格对象
     返回: markdown格式的表格字符串
     """
-    markdown_table = []
-    # 遍历表格的每一行
-    for row_idx, row in enumerate(table.rows):
-        row_cells = []
-        # 遍历行中的每个单元格
-        for cell in row.cells:
-            # 保留单元格内的换行符（用\n替换），避免内容丢失
-            cell_text = cell.text.replace('\r', '').replace('\n', '<br/>')  # 用<br/>保留换行结构
-            row_cells.append(cell_text.strip() if cell_text.strip() else "")
-        
-        # 拼接当前行的markdown格式（|单元格1|单元格2|...|）
-        markdown_row = f"|{'|'.join(row_cells)}|"
-        markdown_table.append(markdown_row)
-        
-        # 第一行后添加分隔线（|---|---|...|）
-        if row_idx == 0:
-            separator = f"|{'|'.join(['---' for _ in row_cells])}|"
-            markdown_table.append(separator)
-    
-    # 表格前后加空行，确保格式清晰，最后加注释保留标记
-    newline = '\n'
-    return f"{newline}{newline.join(markdown_table)}{newline}"
+    # 直接遍历 w:tr/w:tc（不经 row.cells 逐行重算网格），合并单元格只输出一次；格式与流式读取一致
+    return rows_to_markdown(table_rows(table._tbl))
 
 def _extract_docx_modules(doc: DocObject) -> dict:
     """
@@ -164,19 +125,20 @@ def read_text_auto(
     自动读取txt或docx文件内容（新增模板预览模式，保留表格/空行/注释）
     
     参数:
-        path: 文件路径（支持.txt和.docx格式）。如果未提供或文件不存在，将尝试使用环境变量中的TEMPLATE_REPORT_PATH（模板路径）
-        is_template_preview: 是否输出“模板原文预览”（结构化分模块，保留完整格式）
+        path: 文件路径（支持.txt和.docx格式）。如果未提供或文件不存在，使用当前任务的模板路径（默认取环境变量TEMPLATE_REPORT_PATH）
+        is_template_preview: 是否输出模板预览（docx 模板默认返回结构摘要：占位符、章节标题、表格结构；
+            设置环境变量 TEMPLATE_PREVIEW_FULL=1 时返回分模块的模板原文预览）
     
     返回:
-        文件内容字符串（普通模式：纯文本；预览模式：分模块结构化预览）
+        文件内容字符串（普通模式：纯文本；预览模式：模板摘要或分模块结构化预览）
     """
-    # 路径处理：优先使用模板路径（TEMPLATE_REPORT_PATH）
+    # 路径处理：优先使用当前任务的模板路径，其次是统计报告路径（未激活任务时取自 .env）
     if not path or not os.path.exists(path):
-        # 区分“原始报告”和“模板报告”的环境变量
-        env_path = os.getenv("TEMPLATE_REPORT_PATH") or os.getenv("RAW_REPORT_PATH")
-        if env_path and os.path.exists(env_path):
-            print(f"使用环境变量中的路径: {env_path}")
-            path = env_path
+        job = current_job()
+        job_path = job.template_path or job.raw_report_path
+        if job_path and os.path.exists(job_path):
+            print(f"使用当前任务中的路径: {job_path}")
+            path = job_path
         else:
             raise FileNotFoundError(
                 f"文件不存在！请检查：1. 输入路径是否正确 2. 环境变量TEMPLATE_REPORT_PATH是否设置（模板路径）"
@@ -184,39 +146,19 @@ def read_text_auto(
     
     # 1. 处理docx文件（核心：支持表格读取和模板预览）
     if path.lower().endswith(".docx"):
-        doc = Document(path)
-        # 修复docx中文乱码问题（设置默认字体）
-        for para in doc.paragraphs:
-            for run in para.runs:
-                run.font.name = 'Times New Roman'
-                run.element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
-        
+        # 模板预览默认只给结构摘要（按模板哈希缓存），不再把整篇模板原文送入提示词
+        if is_template_preview and os.getenv("TEMPLATE_PREVIEW_FULL", "0").lower() not in ("1", "true", "yes"):
+            return format_template_digest(load_template_digest(path))
+        # 只读取文本：不再逐个 run 设置字体（那只会改写内存中的 XML，对提取文本没有作用）
         if is_template_preview:
             # 模板预览模式：分模块提取并格式化
-            modules = _extract_docx_modules(doc)
+            modules = _extract_docx_modules(Document(path))
             return _format_template_preview(modules)
-        else:
-            # 普通模式：合并表格和段落（保留基础格式）
-            full_content = []
-            # 先加表格
-            for table_idx, table in enumerate(doc.tables):
-                full_content.append(_parse_docx_tables_to_markdown(table))
-            # 再加段落
-            for para in doc.paragraphs:
-                full_content.append(para.text)
-            return "\n".join(full_content)
-    
-    # 2. 处理txt文件（自动检测编码，保留原始格式）
-    with open(path, "rb") as file:
-        raw_data = file.read()
+        # 普通模式：流式解析 document.xml，按正文顺序输出段落与 markdown 表格
+        return docx_to_text(path)
     
-    # 检测文件编码（兼容GBK、UTF-8等）
-    detected_encoding = chardet.detect(raw_data)["encoding"] or "utf-8"
-    try:
-        content = raw_data.decode(detected_encoding)
-    except UnicodeDecodeError:
-        content = raw_data.decode("utf-8", errors="ignore")
-        print(f"警告：使用UTF-8容错模式解码，可能丢失部分特殊字符（原始编码：{detected_encoding}）")
+    # 2. 处理txt文件（自动检测编码，保留原始格式；只对前缀做编码检测，大文件经 mmap 读取）
+    content = read_text_file(path)
     
     if is_template_preview:
         # 对txt模板也按“开头表格（若有）、目录、正文”分模块预览
@@ -239,78 +181,26 @@ def save_to_docx(content: str, output_path: str) -> str:
     返回:
         输出文件路径
     """
-    doc = Document()
-    # 设置默认字体（避免中文乱码）
-    style = doc.styles["Normal"]
-    style.font.name = "Times New Roman"
-    style.font.element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
-    
-    # 拆分内容为段落块（按空行拆分，保留大段结构）
-    content_blocks = content.split("\n\n")
-    for block in content_blocks:
-        block = block.strip()
-        if not block:
-            doc.add_paragraph("")  # 保留空行
-            continue
-        
-        # 检测是否为markdown表格（含"|"和"---"）
-        if "|" in block and "---" in block:
-            # 解析markdown表格为docx表格
-            table_rows = [row.strip() for row in block.split("\n") if row.strip()]
-            if len(table_rows) >= 2:  # 至少有表头+分隔线
-                # 获取列数（从表头行提取）
-                header_cells = [cell.strip() for cell in table_rows[0].strip("|").split("|")]
-                col_count = len(header_cells)
-                # 创建docx表格
-                table = doc.add_table(rows=1, cols=col_count)
-                table.style = "Table Grid"  # 带边框的表格样式（还原模板表格外观）
-                
-                # 填充表头
-                header_cells = table.rows[0].cells
-                for idx, cell_text in enumerate(header_cells):
-                    if idx < len(header_cells):
-                        # 还原<br/>为换行符
-                        cell_text = cell_text.replace("<br/>", "\n")
-                        header_cells[idx].text = cell_text
-                
-                # 填充表格内容（跳过分隔线行）
-                for row_idx, row in enumerate(table_rows[1:]):
-                    if "---" in row:
-                        continue  # 跳过分隔线
-                    row_cells = [cell.strip() for cell in row.strip("|").split("|")]
-                    row_cells = row_cells + [""] * (col_count - len(row_cells))  # 补全空单元格
-                    table_row = table.add_row().cells
-                    for idx, cell_text in enumerate(row_cells):
-                        cell_text = cell_text.replace("<br/>", "\n")
-                        table_row[idx].text = cell_text
-                # 表格后加空行
-                doc.add_paragraph("")
-                continue
-        
-        # 普通文本段落（还原<br/>为换行）
-        para_text = block.replace("<br/>", "\n")
-        para = doc.add_paragraph(para_text)
-        # 还原目录/章节的缩进（根据文本前缀判断）
-        if para_text.startswith(("1.", "2.", "3.")):  # 一级/二级章节标题
-            para.paragraph_format.left_indent = 0  # 无缩进
-            para.runs[0].font.bold = True  # 章节标题加粗（还原模板格式）
-        elif para_text.startswith(("（*", "注：")):  # 注释文本
-            para.paragraph_format.left_indent = 20  # 缩进2字符（突出注释）
-    
+    # 整篇解析一次、批量构建段落与表格 XML（耗时随行数线性增长）
+    doc = build_docx(content)
     doc.save(output_path)
     return f"文件已保存至：{output_path}\n提示：表格已保留边框样式，章节标题已加粗，注释已缩进"
 
 # 保留类形式以便向后兼容（同步更新read_text_auto方法）
 class DocumentHandler:
-    def __init__(self):
-        # 从环境变量获取路径（优先模板路径）
-        self.raw_report_path = os.getenv("RAW_REPORT_PATH")
-        self.template_report_path = os.getenv("TEMPLATE_REPORT_PATH")  # 新增：模板路径
+    # 路径取自当前任务（未激活任务时取自环境变量）
+    @property
+    def raw_report_path(self):
+        return current_job().raw_report_path
+
+    @property
+    def template_report_path(self):
+        return current_job().template_path
     
     @staticmethod
     def read_text_auto(path=None, is_template_preview=False):
-        return read_text_auto(path=path, is_template_preview=is_template_preview)
+        return read_text_auto.invoke({"path": path, "is_template_preview": is_template_preview})
     
     @staticmethod
     def save_to_docx(content, output_path):
-        return save_to_docx(content, output_path)
\ No newline at end of file
+        return save_to_docx.invoke({"content": content, "output_path": output_path})
\ No newline at end of file
@@ -0,0 +1,141 @@
+import zipfile
+import xml.etree.ElementTree as ET
+
+# 只读场景下直接流式解析 word/document.xml，不构建 python-docx 对象树、不修改任何 XML：
+# 按正文顺序产出段落与表格，处理完一个顶层块就释放其子树，内存占用与单个块大小相关而非整篇文档。
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W = "{%s}" % W_NS
+BODY, P, TBL, TR, TC, SDT, SDT_CONTENT = (_W + t for t in ("body", "p", "tbl", "tr", "tc", "sdt", "sdtContent"))
+_T, _TAB, _BR, _CR = (_W + t for t in ("t", "tab", "br", "cr"))
+_VAL = _W + "val"
+_TBL_GRID, _GRID_COL, _TR_PR, _GRID_BEFORE = (_W + t for t in ("tblGrid", "gridCol", "trPr", "gridBefore"))
+_TC_PR, _GRID_SPAN, _V_MERGE = (_W + t for t in ("tcPr", "gridSpan", "vMerge"))
+
+
+def paragraph_text(p) -> str:
+    """与 python-docx 的 Paragraph.text 一致：w:t 文本，w:tab 为制表符，w:br / w:cr 为换行"""
+    parts = []
+    for el in p.iter():
+        tag = el.tag
+        if tag == _T:
+            parts.append(el.text or "")
+        elif tag == _TAB:
+            parts.append("\t")
+        elif tag in (_BR, _CR):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _int_val(parent, tag, default):
+    el = parent.find(tag) if parent is not None else None
+    try:
+        return int(el.get(_VAL)) if el is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _row_cells(tr):
+    """行内的 w:tc（含包在内容控件 w:sdt 中的单元格）"""
+    for child in tr:
+        if child.tag == TC:
+            yield child
+        elif child.tag == SDT:
+            content = child.find(SDT_CONTENT)
+            if content is not None:
+                yield from _row_cells(content)
+
+
+def table_rows(tbl, fill_merged: bool = False) -> list:
+    """
+    直接遍历 w:tr / w:tc 提取表格，返回按网格列对齐的单元格文本 [[str, ...], ...]
+    （单元格文本为其直属段落按换行拼接，与 python-docx 的 cell.text 一致）。
+    合并单元格只输出一次：gridSpan 横向合并的后续列、vMerge 纵向合并的后续行均为空字符串；
+    fill_merged=True 时改为重复合并单元格的文本（与 python-docx 的 row.cells 结果一致）。
+    tbl 可以是 ElementTree 元素，也可以是 python-docx 表格的 table._tbl（lxml 元素）。
+    """
+    rows = []
+    vertical = {}  # 网格列 -> 纵向合并起始单元格的文本
+    for tr in tbl.findall(TR):
+        col = _int_val(tr.find(_TR_PR), _GRID_BEFORE, 0)
+        row = [""] * col
+        for tc in _row_cells(tr):
+            tc_pr = tc.find(_TC_PR)
+            span = max(1, _int_val(tc_pr, _GRID_SPAN, 1))
+            v_merge = tc_pr.find(_V_MERGE) if tc_pr is not None else None
+            if v_merge is not None and v_merge.get(_VAL, "continue") == "continue":
+                text = vertical.get(col, "") if fill_merged else ""
+            else:
+                text = "\n".join(paragraph_text(p) for p in tc.findall(P))
+                if v_merge is not None:
+                    vertical[col] = text
+                else:
+                    vertical.pop(col, None)
+            row.append(text)
+            row.extend([text if fill_merged else ""] * (span - 1))
+            col += span
+        rows.append(row)
+    grid = tbl.find(_TBL_GRID)
+    width = max([len(grid.findall(_GRID_COL)) if grid is not None else 0] + [len(r) for r in rows])
+    for row in rows:
+        row.extend([""] * (width - len(row)))
+    return rows
+
+
+def rows_to_markdown(rows) -> str:
+    """单元格文本矩阵 -> markdown 表格（单元格内换行写作 <br/>，第一行后加分隔线），前后各留一个换行"""
+    lines = []
+    for row_idx, row in enumerate(rows):
+        cells = [cell.replace("\r", "").replace("\n", "<br/>").strip() for cell in row]
+        lines.append(f"|{'|'.join(cells)}|")
+        if row_idx == 0:
+            lines.append(f"|{'|'.join('---' for _ in cells)}|")
+    return "\n" + "\n".join(lines) + "\n"
+
+
+def _blocks(elem, fill_merged):
+    """顶层块 -> ("paragraph", 文本) / ("table", 行)；内容控件（w:sdt，如目录）展开为其中的块"""
+    if elem.tag == P:
+        yield "paragraph", paragraph_text(elem)
+    elif elem.tag == TBL:
+        yield "table", table_rows(elem, fill_merged)
+    elif elem.tag == SDT:
+        content = elem.find(SDT_CONTENT)
+        for child in (content if content is not None else []):
+            yield from _blocks(child, fill_merged)
+
+
+def iter_docx_blocks(path: str, fill_merged: bool = False):
+    """
+    按正文顺序流式产出 docx 的块：("paragraph", 文本) 或 ("table", [[单元格文本, ...], ...])
+    只解析 word/document.xml，每处理完一个顶层块即从树中移除
+    """
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as xml:
+        depth = 0
+        body = None
+        for event, elem in ET.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2 and elem.tag == BODY:
+                    body = elem
+                continue
+            depth -= 1
+            # depth == 2：刚结束的是 w:body 的直接子元素（document > body > 块）
+            if body is not None and depth == 2:
+                yield from _blocks(elem, fill_merged)
+                body.remove(elem)
+
+
+def iter_docx_tables(path: str, fill_merged: bool = False):
+    """按正文顺序流式产出 docx 中各顶层表格的行（见 table_rows）"""
+    for kind, value in iter_docx_blocks(path, fill_merged=fill_merged):
+        if kind == "table":
+            yield value
+
+
+def docx_to_text(path: str) -> str:
+    """按正文顺序输出段落文本与 markdown 表格（read_text_auto 普通模式）"""
+    parts = []
+    for kind, value in iter_docx_blocks(path):
+        parts.append(value if kind == "paragraph" else rows_to_markdown(value))
+    return "\n".join(parts)
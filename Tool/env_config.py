@@ -0,0 +1,67 @@
+import os
+import threading
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (.env 绝对路径, mtime_ns) -> 解析结果；同一文件未改动时只加载一次
+_loaded = {}
+_lock = threading.Lock()
+
+
+def find_env_file() -> str:
+    """优先当前工作目录的 .env，其次项目根目录；都不存在时返回 None"""
+    for base in (os.getcwd(), _PROJECT_ROOT):
+        path = os.path.join(base, ".env")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def parse_env_file(path: str) -> dict:
+    """解析 .env：忽略空行与 # 注释，支持 export 前缀，去掉值两侧的引号"""
+    values = {}
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            key = key.strip()
+            if key.startswith("export "):
+                key = key[len("export "):].strip()
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'):
+                value = value[1:-1]
+            values[key] = value
+    return values
+
+
+def load_env(path: str = None, override: bool = True) -> dict:
+    """
+    加载 .env 到 os.environ（各工具模块共用，不打印日志）
+    参数:
+        path: .env 路径；未提供时按 find_env_file() 查找
+        override: True 时 .env 覆盖已有环境变量（与原各模块的 load_env_file 行为一致）
+    返回: 解析出的键值；文件不存在时返回空字典
+    """
+    path = path or find_env_file()
+    if not path:
+        return {}
+    path = os.path.abspath(path)
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return {}
+    with _lock:
+        values = _loaded.get(key)
+        if values is None:
+            try:
+                values = parse_env_file(path)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"[WARN] 加载 .env 失败: {e}")
+                values = {}
+            for k, v in values.items():
+                if override or k not in os.environ:
+                    os.environ[k] = v
+            _loaded[key] = values
+    return values
@@ -2,10 +2,12 @@ from langchain.tools import tool
 import os
 from openpyxl import load_workbook
 
+from pipeline.job_context import current_job
+
 @tool
 def read_filtered_excel_tables(file_path: str = None):
     """
-    强制从 .env 的 REFER_FILE_OUT_PATH 读取 Excel，
+    读取缺陷五列表 Excel（file_path 未提供或不存在时使用当前任务的 REFER_FILE_OUT_PATH），
     自动生成两个筛选表（表3.1 和 表3.2）：
 
     返回：
@@ -18,16 +20,24 @@ def read_filtered_excel_tables(file_path: str = None):
     }
     """
 
-    # --- 1. 永远使用 .env 的 REFER_FILE_OUT_PATH ---
-    env_path = os.getenv("REFER_FILE_OUT_PATH")
-    if not env_path:
-        raise ValueError("ERROR: .env 中未设置 REFER_FILE_OUT_PATH，请检查 .env 文件。")
-
-    excel_path = env_path  # 强制覆盖参数
+    # --- 1. 优先使用参数路径，其次当前任务（默认来自 .env）的 REFER_FILE_OUT_PATH ---
+    excel_path = file_path
+    if not excel_path or not os.path.exists(excel_path):
+        excel_path = current_job().excel_path
+    if not excel_path:
+        raise ValueError("ERROR: 未提供 file_path，且 .env 中未设置 REFER_FILE_OUT_PATH，请检查 .env 文件。")
 
     if not os.path.exists(excel_path):
         raise FileNotFoundError(f"ERROR: REFER_FILE_OUT_PATH 指向的文件不存在：{excel_path}")
 
+    return read_filtered_tables(excel_path)
+
+
+def read_filtered_tables(excel_path: str) -> dict:
+    """
+    从指定 Excel 读取并生成表3.1 / 表3.2 两个筛选表（不依赖环境变量）
+    返回: {"table31": [...], "table32": [...]}
+    """
     # --- 2. 使用 openpyxl 读取 XLSX ---
     try:
         wb = load_workbook(excel_path, data_only=True)
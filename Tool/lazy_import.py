@@ -0,0 +1,62 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    延迟导入的模块代理：首次访问属性时才真正 import。
+
+    用于 cv2、pandas 等导入耗时的依赖，使工具模块本身的导入保持轻量。
+    bool(模块) 表示依赖是否可用（会触发导入），代替原先 “导入失败时置为 None” 的写法：
+        cv2 = lazy_import("cv2")
+        if not cv2: raise RuntimeError("依赖缺失")
+    """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_error"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is not None:
+            return module
+        with self.__dict__["_lock"]:
+            if self.__dict__["_module"] is None:
+                if self.__dict__["_error"] is not None:
+                    raise self.__dict__["_error"]
+                try:
+                    self.__dict__["_module"] = importlib.import_module(self._name)
+                except Exception as e:
+                    # 缓存失败结果，避免每次访问都重新尝试导入
+                    self.__dict__["_error"] = ImportError(f"无法导入 {self._name}: {e}")
+                    raise self.__dict__["_error"] from e
+            return self.__dict__["_module"]
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __bool__(self) -> bool:
+        try:
+            self._load()
+            return True
+        except ImportError:
+            return False
+
+    @property
+    def loaded(self) -> bool:
+        """是否已经导入（不会触发导入）"""
+        return self.__dict__["_module"] is not None
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """返回模块 name 的延迟导入代理"""
+    return LazyModule(name)
@@ -0,0 +1,136 @@
+import re
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+# markdown 文本 -> docx：整篇只解析一次，段落与表格先拼成一段 WordprocessingML，再一次性解析并挂到正文，
+# 避免 python-docx 逐段 add_paragraph / 逐行 add_row().cells / 逐格 .text 带来的重复查找（耗时随行数超线性增长）。
+# 生成的 XML 与原 save_to_docx 经 python-docx 生成的结构一致。
+
+HEADING_PREFIXES = ("1.", "2.", "3.")
+NOTE_PREFIXES = ("（*", "注：")
+TABLE_STYLE = "Table Grid"
+
+# XML 1.0 不允许的控制字符（大模型输出中偶尔出现），写入前去掉
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_TEXT_SPLIT = re.compile(r"(\n|\t)")
+
+
+def parse_markdown(content: str) -> list:
+    """
+    按空行切分为块：("empty",) 空行、("table", [[单元格, ...], ...]) markdown 表格（已去掉分隔线，按表头列数补齐/截断）、
+    ("paragraph", 文本)；<br/> 还原为换行
+    """
+    blocks = []
+    for block in content.split("\n\n"):
+        block = block.strip()
+        if not block:
+            blocks.append(("empty",))
+            continue
+        # markdown 表格（含"|"和"---"，至少有表头+分隔线）
+        if "|" in block and "---" in block:
+            lines = [line.strip() for line in block.split("\n") if line.strip()]
+            if len(lines) >= 2:
+                header = [cell.strip() for cell in lines[0].strip("|").split("|")]
+                col_count = len(header)
+                rows = [header]
+                for line in lines[1:]:
+                    if "---" in line:
+                        continue  # 跳过分隔线
+                    cells = [cell.strip() for cell in line.strip("|").split("|")]
+                    rows.append((cells + [""] * col_count)[:col_count])
+                blocks.append(("table", [[cell.replace("<br/>", "\n") for cell in row] for row in rows]))
+                continue
+        blocks.append(("paragraph", block.replace("<br/>", "\n")))
+    return blocks
+
+
+def _run_xml(text: str, bold: bool = False) -> str:
+    """一个 w:r：换行写作 w:br，制表符写作 w:tab（与 python-docx 的 run.text 赋值一致）"""
+    parts = ["<w:r>", "<w:rPr><w:b/></w:rPr>" if bold else ""]
+    for piece in _TEXT_SPLIT.split(_INVALID_XML.sub("", text)):
+        if piece == "\n":
+            parts.append("<w:br/>")
+        elif piece == "\t":
+            parts.append("<w:tab/>")
+        elif piece:
+            # 首尾有空白时才需要 xml:space="preserve"（与 python-docx 一致）
+            space = ' xml:space="preserve"' if piece != piece.strip() else ""
+            parts.append(f"<w:t{space}>{escape(piece)}</w:t>")
+    parts.append("</w:r>")
+    return "".join(parts)
+
+
+def _paragraph_xml(text: str) -> str:
+    if not text:
+        return "<w:p/>"
+    if text.startswith(HEADING_PREFIXES):
+        # 章节标题：无缩进、加粗（还原模板格式）
+        return f'<w:p><w:pPr><w:ind w:left="0"/></w:pPr>{_run_xml(text, bold=True)}</w:p>'
+    if text.startswith(NOTE_PREFIXES):
+        # 注释文本：原实现 left_indent=20（EMU）折算为 0 twips，保持一致
+        return f'<w:p><w:pPr><w:ind w:left="0"/></w:pPr>{_run_xml(text)}</w:p>'
+    return f"<w:p>{_run_xml(text)}</w:p>"
+
+
+def _table_xml(rows: list, block_width: int, style_id: str) -> str:
+    """与 doc.add_table(rows=1, cols=n) + table.style + add_row() 生成的结构一致：列宽均分正文宽度"""
+    col_count = len(rows[0])
+    col_width = int(block_width // col_count / 635)  # EMU -> twips
+    tc_pr = f'<w:tcPr><w:tcW w:type="dxa" w:w="{col_width}"/></w:tcPr>'
+    parts = [
+        "<w:tbl><w:tblPr>",
+        f'<w:tblStyle w:val="{style_id}"/>' if style_id else "",
+        '<w:tblW w:type="auto" w:w="0"/>',
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+        'w:noHBand="0" w:noVBand="1" w:val="04A0"/>',
+        "</w:tblPr><w:tblGrid>",
+        f'<w:gridCol w:w="{col_width}"/>' * col_count,
+        "</w:tblGrid>",
+    ]
+    for row in rows:
+        parts.append("<w:tr>")
+        for cell in row:
+            parts.append(f"<w:tc>{tc_pr}<w:p>{_run_xml(cell)}</w:p></w:tc>")
+        parts.append("</w:tr>")
+    parts.append("</w:tbl>")
+    return "".join(parts)
+
+
+def build_docx(content: str):
+    """
+    将 markdown 文本写入新建的 docx 文档对象并返回（正文字体 Times New Roman / 宋体）
+    表格使用“Table Grid”边框样式，表格后加空行；章节标题加粗，注释与标题无缩进
+    """
+    doc = Document()
+    # 设置默认字体（避免中文乱码）
+    style = doc.styles["Normal"]
+    style.font.name = "Times New Roman"
+    style.font.element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
+    try:
+        style_id = doc.styles[TABLE_STYLE].style_id
+    except KeyError:
+        style_id = None
+    section = doc.sections[-1]
+    block_width = section.page_width - section.left_margin - section.right_margin
+
+    parts = []
+    for block in parse_markdown(content):
+        if block[0] == "empty":
+            parts.append("<w:p/>")  # 保留空行
+        elif block[0] == "table":
+            parts.append(_table_xml(block[1], block_width, style_id))
+            parts.append("<w:p/>")  # 表格后加空行
+        else:
+            parts.append(_paragraph_xml(block[1]))
+
+    # 新文档的 w:body 只有 sectPr：把它移入新解析的 body 后整体替换。
+    # 不逐个 addprevious 子元素——跨文档移动子树时 lxml 逐节点整理命名空间，大表格下耗时随行数平方增长
+    body = parse_xml(f"<w:body {nsdecls('w')}>{''.join(parts)}</w:body>")
+    old_body = doc.element.body
+    for child in list(old_body):
+        body.append(child)
+    doc.element.replace(old_body, body)
+    return doc
@@ -0,0 +1,330 @@
+import re
+from collections import OrderedDict
+
+from pipeline.job_context import current_job
+
+try:
+    from langchain.tools import tool
+except Exception:
+    def tool(*args, **kwargs):
+        def _wrap(f):
+            return f
+        return _wrap
+
+
+# -------------------------- 规则配置 --------------------------
+# 构件分类顺序与模板一致：3.1 墩台→梁体→桥墩；3.2 防落梁块→垫石→支座板→球形支座
+BEAM_PIER_COMPONENTS = ["墩台", "梁体", "桥墩"]
+SUPPORT_COMPONENTS = ["防落梁块", "垫石", "支座板", "球形支座"]
+# 构件状态分析的输出顺序
+STATUS_ORDER = ["梁体", "桥墩", "墩台", "垫石", "防落梁块", "支座板", "球形支座"]
+
+# 缺陷优先级（按关键字匹配，未命中者为中优先级）
+HIGH_PRIORITY_KEYWORDS = ["螺栓松脱", "螺栓松动", "螺栓缺失", "顶死", "间距不足", "垫石裂缝"]
+LOW_PRIORITY_KEYWORDS = ["垃圾", "异物", "防尘围挡", "刻度模糊"]
+
+# 推测性成因（按关键字归类，顺序即匹配优先级）
+CAUSE_RULES = [
+    (("松脱", "松动", "缺失"), "螺栓连接件类缺陷", "与安装不牢固、防松措施不足及运营振动有关"),
+    (("顶死", "间距不足", "错开"), "限位装置类缺陷", "可能与安装偏差及梁体纵横向位移有关"),
+    (("锈蚀",), "锈蚀类缺陷", "主要由环境腐蚀及防护涂层失效引起"),
+    (("涂装漆",), "涂装防护类缺陷", "主要受环境风化、紫外线照射或腐蚀影响"),
+    (("裂缝",), "裂缝类缺陷", "可能与温度变化、混凝土收缩及长期荷载作用有关"),
+    (("麻面",), "混凝土表观类缺陷", "可能因施工时混凝土振捣不密实导致"),
+    (("垃圾", "异物"), "残留异物类缺陷", "为施工残留或外部堆积导致"),
+    (("防尘围挡",), "防尘围挡类缺陷", "可能受风雨侵蚀及材料老化影响"),
+    (("刻度", "指针"), "刻度指示类缺陷", "可能与环境污染、部件老化或支座位移有关"),
+    (("破损", "缺棱", "断角", "掉角"), "构件破损类缺陷", "多由外力碰撞、施工操作不当或长期荷载磨损造成"),
+]
+DEFAULT_CAUSE = ("其他缺陷", "成因需结合补充数据进一步核实")
+
+CAUSE_PREFIX = "基于桥梁养护常规经验的推测（如环境腐蚀、运营损耗、施工残留等），非本次检测统计结论，最终成因需以补充数据为准。"
+
+# 本生成器可产出的全部叙述字段
+NARRATIVE_FIELDS = [
+    "defect_summary", "beam_pier_summary", "support_summary", "inspection_result", "main_findings", "pier_info",
+    "defect_list", "beam_pier_defect_list", "support_defect_list", "total_defect_list", "component_status",
+    "defect_causes", "suggestions", "defect_distribution_and_solutions",
+]
+
+
+# -------------------------- 数据归一化 --------------------------
+def _normalize_rows(rows):
+    """将 "桥墩,构件,部位,缺陷类型,现场照片" 文本行或 dict 行统一为五元组"""
+    result = []
+    for item in rows or []:
+        if isinstance(item, dict):
+            vals = [item.get(k, item.get(cn, "")) for k, cn in
+                    (("pier", "桥墩"), ("component", "构件"), ("position", "部位"),
+                     ("defect_type", "缺陷类型"), ("photo", "现场照片"))]
+        elif isinstance(item, str):
+            vals = [s.strip() for s in item.replace("，", ",").split(",")]
+        else:
+            vals = list(item)
+        vals = [str(v).strip() for v in vals] + [""] * (5 - len(vals))
+        if vals[1] and vals[3]:
+            result.append(vals[:5])
+    return result
+
+
+def _defect_name(defect_type: str) -> str:
+    """去掉照片序号后缀，如“梁块螺栓锈蚀2”→“梁块螺栓锈蚀”、“刻度读数1.”→“刻度读数”"""
+    return re.sub(r"[\d.．、\s]+$", "", defect_type.strip()) or defect_type.strip()
+
+
+def _component_category(component: str, defect: str) -> str:
+    if "#梁" in component:
+        return "梁体"
+    if "#墩" in component:
+        return "桥墩" if "桥墩" in defect else "墩台"
+    if "#防落梁块" in component:
+        return "防落梁块"
+    if "#垫石" in component:
+        return "垫石"
+    if "#支座板" in component:
+        return "支座板"
+    if "#支座" in component:
+        return "球形支座"
+    return "其他构件"
+
+
+def classify_priority(defect: str) -> str:
+    """缺陷优先级：high / medium / low"""
+    if any(k in defect for k in HIGH_PRIORITY_KEYWORDS):
+        return "high"
+    if any(k in defect for k in LOW_PRIORITY_KEYWORDS):
+        return "low"
+    return "medium"
+
+
+def _cause_group(defect: str):
+    for keywords, group, cause in CAUSE_RULES:
+        if any(k in defect for k in keywords):
+            return group, cause
+    return DEFAULT_CAUSE
+
+
+def count_defects(table31, table32) -> "OrderedDict":
+    """
+    按构件大类统计缺陷处数（相同桥墩+部位+缺陷类型视为同一处）
+    返回: {构件大类: {缺陷名称: 处数}}，构件顺序与模板一致
+    """
+    counts = OrderedDict((c, OrderedDict()) for c in BEAM_PIER_COMPONENTS + SUPPORT_COMPONENTS)
+    seen = set()
+    for pier, comp, pos, dtype, _ in _normalize_rows(list(table31 or []) + list(table32 or [])):
+        defect = _defect_name(dtype)
+        key = (pier, pos, defect)  # 按去掉照片序号后的缺陷名称去重
+        if key in seen:
+            continue
+        seen.add(key)
+        category = _component_category(comp, defect)
+        bucket = counts.setdefault(category, OrderedDict())
+        bucket[defect] = bucket.get(defect, 0) + 1
+    return counts
+
+
+# -------------------------- 文本渲染 --------------------------
+def _fmt(items) -> str:
+    """[(缺陷, 处数)] → “缺陷1（X处）、缺陷2（X处）”"""
+    return "、".join(f"{name}（{n}处）" for name, n in items)
+
+
+def _sorted_items(bucket: dict):
+    return sorted(bucket.items(), key=lambda kv: -kv[1])
+
+
+def _category_list(counts, categories, numbered=True) -> str:
+    parts = []
+    for i, cat in enumerate(categories, start=1):
+        bucket = counts.get(cat) or {}
+        body = _fmt(_sorted_items(bucket)) if bucket else "无明显缺陷"
+        parts.append(f"（{i}）{cat}：{body}" if numbered else f"{cat}：{body}")
+    return "；".join(parts) + "。"
+
+
+def _by_priority(counts):
+    merged = OrderedDict()
+    for bucket in counts.values():
+        for name, n in bucket.items():
+            merged[name] = merged.get(name, 0) + n
+    groups = {"high": OrderedDict(), "medium": OrderedDict(), "low": OrderedDict()}
+    for name, n in merged.items():
+        groups[classify_priority(name)][name] = n
+    return merged, groups
+
+
+def _natural_key(text: str):
+    """按数字大小排序：HC-2 < HC-10"""
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", text) if part]
+
+
+def _pier_range(table31, table32):
+    """涉及的桥墩（去重，按编号自然排序）"""
+    piers = {row[0] for row in _normalize_rows(list(table31 or []) + list(table32 or [])) if row[0]}
+    return sorted(piers, key=_natural_key)
+
+
+def build_narrative(table31, table32, project_name: str = None) -> dict:
+    """
+    根据缺陷五列表和优先级规则确定性地生成报告叙述字段（不调用大模型）
+    参数:
+        table31: 表3.1（#梁/#墩）行，文本行或 dict 行
+        table32: 表3.2（支座系统）行
+        project_name: 工程名称（用于 pier_info）
+    返回:
+        字段字典，键见 NARRATIVE_FIELDS
+    """
+    counts = count_defects(table31, table32)
+    merged, groups = _by_priority(counts)
+    total = sum(merged.values())
+    beam_total = sum(sum(counts[c].values()) for c in BEAM_PIER_COMPONENTS)
+    support_total = sum(sum(counts[c].values()) for c in SUPPORT_COMPONENTS)
+    n_high, n_mid, n_low = (sum(groups[k].values()) for k in ("high", "medium", "low"))
+    source = "（数据来源于配套Excel统计）"
+
+    beam_list = _category_list(counts, BEAM_PIER_COMPONENTS)
+    support_list = _category_list(counts, SUPPORT_COMPONENTS)
+    # 汇总表“检查结果”分梁体/支座系统两栏，各填本类缺陷
+    beam_summary = _category_list(counts, BEAM_PIER_COMPONENTS, numbered=False)
+    support_summary = _category_list(counts, SUPPORT_COMPONENTS, numbered=False)
+    inspection_result = f"梁体、桥墩、墩台：{beam_summary[:-1]}；支座系统：{support_summary}"
+
+    def top(group, k=6):
+        return _fmt(_sorted_items(groups[group])[:k]) or "无"
+
+    main_findings = (
+        f"本次检测共发现缺陷{total}处{source}，其中高优先级缺陷{n_high}处（{top('high')}），需立即处置；"
+        f"中优先级缺陷{n_mid}处，需定期巡检；低优先级缺陷{n_low}处，需定期清理。"
+    )
+
+    def pct(n):
+        return f"{n * 100.0 / total:.1f}%" if total else "0.0%"
+
+    def heaviest(categories):
+        ranked = sorted(((c, sum(counts[c].values())) for c in categories), key=lambda kv: -kv[1])
+        return "、".join(f"{c}（{n}处）" for c, n in ranked if n) or "无"
+
+    total_defect_list = (
+        f"本次检测共发现缺陷{total}处{source}，缺陷分布呈现明显优先级特征：高优先级缺陷{n_high}处，主要为{top('high')}，直接影响结构安全；"
+        f"中优先级缺陷{n_mid}处，主要为{top('medium')}，需定期维修；低优先级缺陷{n_low}处，以{top('low')}为主，影响外观及耐久性。"
+        f"从构件分布来看，支座系统缺陷{support_total}处，占比{pct(support_total)}，主要集中在{heaviest(SUPPORT_COMPONENTS)}；"
+        f"梁体、桥墩、墩台缺陷{beam_total}处，占比{pct(beam_total)}，分布为{heaviest(BEAM_PIER_COMPONENTS)}。"
+    )
+
+    status_parts = []
+    for cat in STATUS_ORDER:
+        bucket = counts.get(cat) or {}
+        if bucket:
+            status_parts.append(f"{cat}（发现{len(bucket)}类缺陷，共{sum(bucket.values())}处）")
+        else:
+            status_parts.append(f"{cat}：未发现缺陷")
+    component_status = "、".join(status_parts) + "。"
+
+    # 成因：按成因类别归并缺陷并关联数量
+    cause_groups = OrderedDict()
+    for name, n in _sorted_items(merged):
+        group, cause = _cause_group(name)
+        cause_groups.setdefault((group, cause), []).append((name, n))
+    cause_parts = [
+        f"{group}（共{sum(n for _, n in items)}处，含{_fmt(items[:5])}）{cause}"
+        for (group, cause), items in cause_groups.items()
+    ]
+    defect_causes = CAUSE_PREFIX + ("其中：" + "；".join(cause_parts) + "。" if cause_parts else "")
+
+    suggestions = (
+        f"（1）高优先级：立即维修{top('high', 10)}，更换缺失螺栓，紧固松脱螺栓，调整防滑块间距至规范要求；"
+        f"（2）中优先级：定期巡检并计划维修{top('medium', 10)}，修补破损区域，对锈蚀部位除锈并恢复防护涂装；"
+        f"（3）低优先级：定期清理和维护{top('low', 10)}，确保美观与排水通畅。"
+    )
+
+    def where(group):
+        cats = OrderedDict()
+        for cat, bucket in counts.items():
+            n = sum(v for name, v in bucket.items() if classify_priority(name) == group)
+            if n:
+                cats[cat] = n
+        return "、".join(f"{c}（{n}处）" for c, n in sorted(cats.items(), key=lambda kv: -kv[1])) or "无"
+
+    distribution = (
+        f"高优先级缺陷主要集中在{where('high')}，需立即处置；"
+        f"中优先级缺陷分布在{where('medium')}，需定期维修；"
+        f"低优先级缺陷分布在{where('low')}，需定期清理维护。"
+    )
+
+    piers = _pier_range(table31, table32)
+    name = project_name or "本工程"
+    if piers:
+        pier_span = f"{piers[0]} 至 {piers[-1]} 共 {len(piers)} 座桥墩" if len(piers) > 1 else f"{piers[0]} 共 1 座桥墩"
+    else:
+        pier_span = "桥墩数量详见配套Excel统计Sheet"
+    pier_info = f"{name}桥梁为城市轨道交通配套桥梁，承担轨道列车日常运行功能。本次检测涉及 {pier_span}（桥墩数量来源于配套Excel统计）。"
+
+    return {
+        "defect_summary": inspection_result,
+        "beam_pier_summary": beam_summary,
+        "support_summary": support_summary,
+        "inspection_result": inspection_result,
+        "main_findings": main_findings,
+        "pier_info": pier_info,
+        "defect_list": f"梁体、桥墩、墩台类：{beam_list[:-1]}；支座系统类：{support_list}",
+        "beam_pier_defect_list": beam_list,
+        "support_defect_list": support_list,
+        "total_defect_list": total_defect_list,
+        "component_status": component_status,
+        "defect_causes": defect_causes,
+        "suggestions": suggestions,
+        "defect_distribution_and_solutions": distribution,
+    }
+
+
+def counts_preserved(reference: str, text: str) -> bool:
+    """润色结果中的“N处”数量与规则文本完全一致（用于校验大模型输出未改动统计数字）"""
+    pattern = re.compile(r"(\d+)\s*处")
+    return sorted(pattern.findall(reference or "")) == sorted(pattern.findall(text or ""))
+
+
+def fill_narrative(data: dict, mode: str = None) -> dict:
+    """
+    用规则生成的叙述补全 data（原地修改并返回）
+    参数:
+        data: 报告数据字典，需含 table31/table32（文本行或 dict 行）
+        mode: "fill"（默认，仅补全缺失或空字段）/ "rule"（规则结果覆盖全部叙述字段）/ "off"
+    """
+    mode = (mode or data.get("narrative_mode") or current_job().narrative_mode or "fill").lower()
+    if mode == "off":
+        return data
+    table31 = data.get("table31") or data.get("beam_pier_defects")
+    table32 = data.get("table32") or data.get("support_system_defects")
+    if not table31 and not table32:
+        return data
+    narrative = build_narrative(table31, table32, data.get("project_name"))
+    for key, value in narrative.items():
+        current = data.get(key)
+        if mode == "rule" or not (isinstance(current, str) and current.strip()):
+            data[key] = value
+    return data
+
+
+@tool
+def build_defect_narrative(table31: list = None, table32: list = None, project_name: str = None) -> dict:
+    """
+    规则生成报告叙述字段（毫秒级、不调用大模型）：defect_summary、beam_pier_summary、support_summary、inspection_result、main_findings、
+    beam_pier_defect_list、support_defect_list、total_defect_list、defect_list、component_status、
+    defect_causes、suggestions、defect_distribution_and_solutions、pier_info。
+
+    参数:
+        table31: read_filtered_excel_tables 返回的 table31；未提供时自动读取
+        table32: read_filtered_excel_tables 返回的 table32；未提供时自动读取
+        project_name: 工程名称
+
+    返回:
+        字段字典，可直接并入 create_complete_report 的 data，或在此基础上做语言润色
+    """
+    if table31 is None and table32 is None:
+        from Tool.excel_reader_tool import read_filtered_excel_tables
+        tables = read_filtered_excel_tables.invoke({"file_path": current_job().excel_path})
+        table31, table32 = tables.get("table31", []), tables.get("table32", [])
+    return build_narrative(table31, table32, project_name)
+
+
+NARRATIVE_TOOLS = [build_defect_narrative]
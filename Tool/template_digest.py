@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from langchain.tools import tool
+
+from Tool.docx_stream import table_rows
+from pipeline.job_context import current_job
+
+# 摘要结构变更时递增，使旧的磁盘缓存失效
+DIGEST_VERSION = 2
+
+PLACEHOLDER_RE = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+# 模板中章节标题均为正文样式，按编号识别：“1 概况”“3.3.1 梁体、桥墩、墩台”“附录 1”
+HEADING_RE = re.compile(r"^(\d+(?:\.\d+)*)\s*[^\d\s.].{0,30}$")
+APPENDIX_RE = re.compile(r"^附录\s*\d*$")
+CAPTION_RE = re.compile(r"^表\s*\d+(?:\.\d+)+")
+
+_memory_cache = {}
+
+
+def _cache_dir() -> str:
+    return os.getenv("TEMPLATE_DIGEST_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "wukong_template_digest")
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+
+def _heading_level(text: str):
+    """返回章节层级（1/2/3…），非标题返回 None"""
+    if APPENDIX_RE.match(text):
+        return 1
+    m = HEADING_RE.match(text)
+    if m and "：" not in text and "。" not in text:
+        return m.group(1).count(".") + 1
+    return None
+
+
+def _table_schema(table: Table, index: int, section: str) -> dict:
+    """表格结构：行列数、首行表头、每行首列标签及该行出现的占位符"""
+    # 与文档读取共用 table_rows：合并单元格只输出一次（后续网格位置为空字符串），不按文本去重
+    grid = table_rows(table._tbl)
+    rows = []
+    for texts in grid:
+        label = texts[0].strip() if texts else ""
+        rows.append({"label": label, "placeholders": _unique(PLACEHOLDER_RE.findall(" ".join(texts[1:])))})
+    return {
+        "index": index,
+        "section": section,
+        "size": [len(grid), len(grid[0]) if grid else 0],
+        "header": [t.strip() for t in grid[0] if t.strip()] if grid else [],
+        "rows": rows,
+    }
+
+
+def build_template_digest(path: str) -> dict:
+    """
+    提取模板的占位符、章节标题与表格结构（不含正文说明文字）
+    参数: path 模板 docx 路径
+    返回: 摘要字典 {name, sha256, placeholders, sections, tables}
+    """
+    doc = Document(path)
+    sections = [{"heading": "开头", "level": 0, "placeholders": [], "captions": []}]
+    tables = []
+    placeholders = []
+    table_index = 0
+
+    # 按正文顺序遍历段落与表格，使表格能归入所在章节
+    for child in doc.element.body.iterchildren():
+        tag = child.tag.rsplit("}", 1)[-1]
+        current = sections[-1]
+        if tag == "p":
+            text = Paragraph(child, doc).text.strip()
+            if not text:
+                continue
+            level = _heading_level(text)
+            if level:
+                sections.append({"heading": text, "level": level, "placeholders": [], "captions": []})
+                continue
+            if CAPTION_RE.match(text):
+                current["captions"].append(text)
+            keys = PLACEHOLDER_RE.findall(text)
+            current["placeholders"] = _unique(current["placeholders"] + keys)
+            placeholders.extend(keys)
+        elif tag == "tbl":
+            schema = _table_schema(Table(child, doc), table_index, current["heading"])
+            tables.append(schema)
+            for row in schema["rows"]:
+                placeholders.extend(row["placeholders"])
+            table_index += 1
+
+    return {
+        "version": DIGEST_VERSION,
+        "name": os.path.basename(path),
+        "sha256": _file_sha256(path),
+        "placeholders": _unique(placeholders),
+        "sections": [s for s in sections if s["level"] or s["placeholders"] or s["captions"]],
+        "tables": tables,
+    }
+
+
+def load_template_digest(path: str) -> dict:
+    """按模板文件哈希缓存摘要（进程内存 + 磁盘 JSON），模板未变时不重复解析"""
+    sha = _file_sha256(path)
+    key = f"{sha}-v{DIGEST_VERSION}"
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    cache_file = os.path.join(_cache_dir(), f"{key}.json")
+    digest = None
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                digest = json.load(f)
+        except (OSError, ValueError):
+            digest = None
+    if digest is None:
+        digest = build_template_digest(path)
+        try:
+            os.makedirs(_cache_dir(), exist_ok=True)
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump(digest, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"[WARN] 模板摘要缓存写入失败: {e}")
+    digest["name"] = os.path.basename(path)
+    _memory_cache[key] = digest
+    return digest
+
+
+def format_template_digest(digest: dict) -> str:
+    """将摘要渲染为紧凑文本（用于提示词）"""
+    lines = [
+        f"【模板摘要】{digest['name']}（sha256:{digest['sha256'][:12]}，占位符 {len(digest['placeholders'])} 个）",
+        "占位符：" + "、".join("{%s}" % k for k in digest["placeholders"]),
+        "章节结构（缩进表示层级，[] 内为该节需填充的占位符，<> 为该节插入的表格）：",
+    ]
+    for s in digest["sections"]:
+        line = "  " * max(s["level"] - 1, 0) + s["heading"]
+        if s["placeholders"]:
+            line += " [" + ", ".join(s["placeholders"]) + "]"
+        for caption in s["captions"]:
+            line += f" <{caption}>"
+        lines.append(line)
+    lines.append("表格：")
+    for t in digest["tables"]:
+        rows = "｜".join(
+            r["label"] + (f"[{', '.join(r['placeholders'])}]" if r["placeholders"] else "")
+            for r in t["rows"]
+        )
+        lines.append(f"  表{t['index'] + 1}（{t['section']}，{t['size'][0]}行×{t['size'][1]}列）：{rows}")
+    return "\n".join(lines)
+
+
+@tool
+def read_template_digest(path: str = None) -> str:
+    """
+    读取报告模板的结构摘要：全部占位符、章节标题层级（含各节占位符）与表格结构。
+    用于确定需要填充哪些 data 字段，代替读取整篇模板原文。
+
+    参数:
+        path: 模板 docx 路径；未提供或不存在时使用当前任务的模板路径（默认取环境变量 TEMPLATE_REPORT_PATH）
+    返回:
+        紧凑的模板摘要文本
+    """
+    if not path or not os.path.exists(path):
+        path = current_job().template_path
+    if not path or not os.path.exists(path):
+        raise FileNotFoundError("模板文件不存在！请检查环境变量TEMPLATE_REPORT_PATH是否设置（模板路径）")
+    return format_template_digest(load_template_digest(path))
+
+
+TEMPLATE_DIGEST_TOOLS = [read_template_digest]
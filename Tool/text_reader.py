@@ -0,0 +1,109 @@
+import codecs
+import mmap
+import os
+import re
+import threading
+
+from chardet.universaldetector import UniversalDetector
+
+# 超过该大小的文本文件通过 mmap 读取解码，避免先整体读入 bytes 再复制一份
+MMAP_THRESHOLD = 1 << 20
+# 编码检测最多送入 chardet 的字节数：几十 KB 中文文本已足以确定编码，不再扫描整个文件
+DETECT_MAX_BYTES = 64 << 10
+DETECT_CHUNK = 16 << 10
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# GB2312/GBK 检测结果统一按超集 GB18030 解码，避免前缀里没出现的生僻字在后文解码失败
+_SUPERSETS = {"gb2312": "gb18030", "gbk": "gb18030", "ascii": "utf-8"}
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+# (绝对路径, 文件大小, mtime_ns) -> 编码；文件未变时不再重复检测
+_encoding_cache = {}
+_lock = threading.Lock()
+
+
+def _open_buffer(f, size):
+    """大文件返回 mmap，小文件返回 bytes；空文件无法 mmap"""
+    if size >= MMAP_THRESHOLD:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return f.read()
+
+
+def _first_non_ascii(buf):
+    """按块用 bytes.isascii() 跳过 ASCII 区段（比正则逐字节扫描快得多），再在命中块内定位"""
+    for offset in range(0, len(buf), MMAP_THRESHOLD):
+        block = buf[offset:offset + MMAP_THRESHOLD]
+        if not block.isascii():
+            return offset + _NON_ASCII.search(block).start()
+    return None
+
+
+def _detect(buf) -> str:
+    for bom, encoding in _BOMS:
+        if buf[:len(bom)] == bom:
+            return encoding
+    # 纯 ASCII 前缀对判断没有帮助：从第一个非 ASCII 字节开始检测（该位置必为字符边界）
+    start = _first_non_ascii(buf)
+    if start is None:
+        return "utf-8"
+    sample = buf[start:start + DETECT_CHUNK * 4]
+    try:
+        # final=False：样本末尾被截断的多字节字符不算错误
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    detector = UniversalDetector()
+    end = min(len(buf), start + DETECT_MAX_BYTES)
+    for offset in range(start, end, DETECT_CHUNK):
+        detector.feed(buf[offset:min(offset + DETECT_CHUNK, end)])
+        if detector.done:
+            break
+    detector.close()
+    encoding = (detector.result.get("encoding") or "utf-8").lower()
+    return _SUPERSETS.get(encoding, encoding)
+
+
+def detect_encoding(path: str) -> str:
+    """检测文本文件编码（BOM → UTF-8 快速校验 → chardet 增量检测），按文件指纹缓存"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        encoding = _encoding_cache.get(key)
+    if encoding is not None:
+        return encoding
+    with open(path, "rb") as f:
+        buf = _open_buffer(f, stat.st_size)
+        try:
+            encoding = _detect(buf)
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+    with _lock:
+        _encoding_cache[key] = encoding
+    return encoding
+
+
+def read_text_file(path: str) -> str:
+    """
+    按检测到的编码读取整个文本文件；大文件经 mmap 直接解码
+    解码失败时回落到 UTF-8 容错模式（与 read_text_auto 原行为一致）
+    """
+    encoding = detect_encoding(path)
+    with open(path, "rb") as f:
+        buf = _open_buffer(f, os.fstat(f.fileno()).st_size)
+        try:
+            try:
+                return str(buf, encoding)
+            except (UnicodeDecodeError, LookupError):
+                print(f"警告：使用UTF-8容错模式解码，可能丢失部分特殊字符（原始编码：{encoding}）")
+                return str(buf, "utf-8", "ignore")
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
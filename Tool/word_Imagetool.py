@@ -1,13 +1,41 @@
+import io
 import os
 from docx import Document
 from docx.shared import Cm
 from docx.oxml.ns import qn
 from langchain.tools import tool
+from pipeline.report_run import current_run
 try:
     from PIL import Image
 except Exception:
     Image = None
 
+# 照片目录索引缓存：目录 -> (各级目录的 mtime_ns, {小写文件名: 路径})
+_catalog_cache = {}
+
+
+def photo_catalog(static_dir: str) -> dict:
+    """
+    照片目录的文件名索引（常驻进程内复用）；目录及子目录的 mtime 均未变时直接返回缓存，
+    增删文件会改变所在目录的 mtime，触发重建。同名文件取 os.walk 遍历顺序中的第一个。
+    """
+    root_dir = os.path.abspath(static_dir)
+    cached = _catalog_cache.get(root_dir)
+    if cached is not None:
+        try:
+            if all(os.stat(d).st_mtime_ns == m for d, m in cached[0].items()):
+                return cached[1]
+        except OSError:
+            pass
+    mtimes, index = {}, {}
+    for root, _, files in os.walk(root_dir):
+        mtimes[root] = os.stat(root).st_mtime_ns
+        for file in files:
+            index.setdefault(file.lower(), os.path.join(root, file))
+    if mtimes:  # 目录不存在时不缓存
+        _catalog_cache[root_dir] = (mtimes, index)
+    return index
+
 
 class ImageInserter:
     """
@@ -17,10 +45,13 @@ class ImageInserter:
         2. 匹配成功打印日志；
         3. 匹配不到不替换；
         4. 图片宽度统一 5cm；
+    images 为预先渲染好的图片（原图绝对路径 -> JPEG 字节串，见 tool_1.refer_tool.render_report_image），
+    命中时直接从内存插入，不再读取/转换原图；未命中的仍按原图插入。
     """
 
-    def __init__(self, static_dir: str = "static"):
+    def __init__(self, static_dir: str = "static", images: dict = None):
         self.static_dir = static_dir
+        self.images = images or {}
         if not os.path.exists(self.static_dir):
             print(f"[警告] 静态资源目录不存在: {self.static_dir}")
 
@@ -37,12 +68,7 @@ class ImageInserter:
         """
         在 static 目录中查找文件名匹配的图片。
         """
-        for root, _, files in os.walk(self.static_dir):
-            for file in files:
-                if file.lower() == filename.lower():
-                    full_path = os.path.join(root, file)
-                    return full_path
-        return None
+        return photo_catalog(self.static_dir).get(filename.lower())
 
     def _convert_image_safe(self, img_path: str, out_dir: str) -> str:
         if Image is None:
@@ -98,8 +124,9 @@ class ImageInserter:
                         # 插入图片（宽度统一为 5cm），不合法图片进行安全转换
                         paragraph = cell.paragraphs[0]
                         run = paragraph.add_run()
+                        rendered = self.images.get(os.path.abspath(img_path))
                         try:
-                            run.add_picture(img_path, width=Cm(5))
+                            run.add_picture(io.BytesIO(rendered) if rendered else img_path, width=Cm(5))
                         except Exception:
                             safe_img = self._convert_image_safe(img_path, os.path.join(self.static_dir, "_converted"))
                             run.add_picture(safe_img, width=Cm(5))
@@ -125,6 +152,16 @@ class ImageInserter:
             return alt
 
 
+def insert_images(template_path: str, output_path: str, static_dir: str = "static", images: dict = None) -> str:
+    """插图并将产物登记到当前报告运行（如有）；images 见 ImageInserter"""
+    inserter = ImageInserter(static_dir=static_dir, images=images)
+    result = inserter.replace_image_fields(template_path, output_path)
+    run = current_run()
+    if run is not None and result and os.path.exists(result):
+        run.mark_done("images", result)
+    return result
+
+
 # ========= 将工具封装为 LangChain Tool========= #
 
 @tool
@@ -140,5 +177,4 @@ def insert_images_to_docx(template_path: str, output_path: str, static_dir: str
     返回：
         输出文件路径
     """
-    inserter = ImageInserter(static_dir=static_dir)
-    return inserter.replace_image_fields(template_path, output_path)
+    return insert_images(template_path, output_path, static_dir)
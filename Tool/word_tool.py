@@ -7,6 +7,12 @@ from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from datetime import datetime
 import os
+import re
+
+from Tool.narrative_tool import fill_narrative
+from pipeline.report_run import current_run
+from pipeline.job_context import current_job
+from Tool.env_config import load_env
 
 try:
     from langchain.tools import tool
@@ -17,32 +23,8 @@ except Exception:
         return _wrap
 
 
-def load_env_file():
-    """手动加载.env文件"""
-    env_path = os.path.join(os.getcwd(), ".env")
-    if not os.path.exists(env_path):
-        # 尝试项目根目录
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        env_path = os.path.join(project_root, ".env")
-    
-    if os.path.exists(env_path):
-        print(f"加载环境变量文件: {env_path}")
-        with open(env_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        # 移除引号
-                        if value.startswith(('"', "'")) and value.endswith(('"', "'")):
-                            value = value[1:-1]
-                        os.environ[key.strip()] = value.strip()
-    else:
-        print("未找到.env文件，将使用系统环境变量")
-
-
-# 加载环境变量
-load_env_file()
+# 加载环境变量（各模块共用，进程内只解析一次）
+load_env()
 
 # -------------------------- 关键配置：匹配模板的表格列宽（单位：Inches）--------------------------
 # 2列表格（开头汇总表、附录表）：左列（标题）1.2英寸，右列（内容）5.0英寸
@@ -178,6 +160,22 @@ def create_fixed_table(doc, rows, cols, col_widths_in_inches):
     return table
 
 
+def _split_summary(data: dict):
+    """
+    汇总表“检查结果”两栏的内容：优先使用 beam_pier_summary / support_summary；
+    只有合并的 defect_summary 时按“支座系统”拆成两段，无法拆分时整段放在梁体一栏
+    """
+    beam = data.get('beam_pier_summary')
+    support = data.get('support_summary')
+    if beam or support:
+        return beam or '', support or ''
+    summary = data.get('defect_summary', '') or ''
+    idx = summary.find('支座系统')
+    if idx <= 0:
+        return summary, ''
+    return summary[:idx].rstrip('；;，,。 \n'), summary[idx:]
+
+
 def add_summary_table(doc: Document, styles: dict, data: dict) -> None:
     """添加开头汇总表格（完全匹配模板：2列无边框、左列加粗居中、右列左对齐）"""
     # 2列n行无边框表格
@@ -186,7 +184,7 @@ def add_summary_table(doc: Document, styles: dict, data: dict) -> None:
     # 填充表格内容（无数据时显示空白，而非“未提供”）
     headers = ['工程名称', '检查内容', '检查结果', '检验结论', '建议']
     project_name = data.get('project_name', '')
-    defect_summary = data.get('defect_summary', '')
+    beam_summary, support_summary = _split_summary(data)
     main_findings = data.get('main_findings', '')
     suggestions = """对高优先级缺陷（如螺栓松脱或缺失、防滑块顶死、垫石破损）立即安排维修或加固。
 对中优先级缺陷（如混凝土裂缝、麻面、涂装漆破损）制定定期维修和巡检计划，防止进一步恶化。
@@ -195,7 +193,7 @@ def add_summary_table(doc: Document, styles: dict, data: dict) -> None:
     contents = [
         project_name,
         '桥梁常规检查',
-        f"1、 梁体、桥墩、墩台\n{defect_summary}\n\n\n2、 支座系统\n{defect_summary}",
+        f"1、 梁体、桥墩、墩台\n{beam_summary}\n\n\n2、 支座系统\n{support_summary}",
         main_findings,
         suggestions
     ]
@@ -733,6 +731,75 @@ def _fill_table_by_keyword(doc: Document, styles: dict, keyword: str, dict_rows)
         _fill_table_body(table, styles, _rows_from_dicts(dict_rows))
 
 
+PLACEHOLDER_RE = re.compile(r"\{([A-Za-z0-9_]+)\}")
+# 模板 3.3 各小节复用 {defect_list}，按所在小节改用更具体的字段（字段存在时）
+SECTION_FIELD_OVERRIDES = {
+    '梁体、桥墩、墩台': {'defect_list': 'beam_pier_defect_list'},
+    '支座系统': {'defect_list': 'support_defect_list'},
+    '总体分析': {'defect_list': 'total_defect_list'},
+}
+# 汇总表“检查结果”单元格内，按小标题把 {defect_summary} 换成对应类别的概括
+SUMMARY_SLOT_OVERRIDES = {
+    '梁体、桥墩、墩台': {'defect_summary': 'beam_pier_summary'},
+    '支座系统': {'defect_summary': 'support_summary'},
+}
+
+
+def _replace_placeholders_in_paragraph(para, values: dict) -> None:
+    """替换段落中的 {key} 占位符（占位符常被拆成多个 run，替换后文本并入首个 run 以保留其格式）"""
+    text = para.text
+    if '{' not in text:
+        return
+    new_text = PLACEHOLDER_RE.sub(lambda m: str(values[m.group(1)]) if m.group(1) in values else m.group(0), text)
+    if new_text == text:
+        return
+    runs = para.runs
+    if not runs:
+        para.text = new_text
+        return
+    runs[0].text = new_text
+    for run in runs[1:]:
+        run.text = ''
+
+
+def _apply_text_placeholders(doc: Document, data: dict) -> None:
+    """将 data 中的字段写入模板正文与表格中的 {key} 占位符（{excel_filtered_table} 由表格逻辑单独处理）"""
+    values = {k: v for k, v in data.items() if isinstance(v, (str, int, float)) and k != 'excel_filtered_table'}
+    in_analysis = False
+    overrides = {}
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        if text.startswith('3.3'):
+            in_analysis = True
+            overrides = {}
+            for title, mapping in SECTION_FIELD_OVERRIDES.items():
+                if title in text:
+                    overrides = {k: v for k, v in mapping.items() if data.get(v)}
+        elif text.startswith('附录'):
+            in_analysis = False
+            overrides = {}
+        scoped = dict(values)
+        if in_analysis:
+            for key, field in overrides.items():
+                scoped[key] = data[field]
+        _replace_placeholders_in_paragraph(para, scoped)
+    beam_summary, support_summary = _split_summary(data)
+    slot_values = {'beam_pier_summary': beam_summary, 'support_summary': support_summary}
+    seen = set()
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                if id(cell._tc) in seen:
+                    continue
+                seen.add(id(cell._tc))
+                scoped = values
+                for para in cell.paragraphs:
+                    mapping = SUMMARY_SLOT_OVERRIDES.get(para.text.strip())
+                    if mapping is not None:
+                        scoped = dict(values, **{k: slot_values[v] for k, v in mapping.items()})
+                    _replace_placeholders_in_paragraph(para, scoped)
+
+
 def generate_bridge_report(data: dict, filename: str = None, template_path: str = None) -> str:
     """
     自动生成桥梁支座检查报告 Word 文档（核心函数）
@@ -772,6 +839,7 @@ def generate_bridge_report(data: dict, filename: str = None, template_path: str
     # 处理模板或新建文档
     if template_path and os.path.exists(template_path):
         _apply_excel_placeholders(doc, styles, data)
+        _apply_text_placeholders(doc, data)
         _fill_template_tables(doc, styles, data)
         t31 = data.get('table31')
         t32 = data.get('table32')
@@ -811,16 +879,26 @@ def create_complete_report(output_path: str, data: dict, template_path: str = No
     工具：生成完整的桥梁报告 docx
     :param output_path: 报告保存路径
     :param data: 报告数据字典
-    :param template_path: 模板路径（可选）
+    :param template_path: 模板路径（可选，默认使用当前任务的模板）
     :return: 生成的绝对路径
     """
+    run = current_run()
+    job = current_job()
+    template_path = template_path or job.template_path
     try:
         eft = data.get('excel_filtered_table')
         t31 = data.get('table31')
         t32 = data.get('table32')
-        if not eft or (isinstance(eft, str) and not eft.strip()):
+        if run is not None and run.is_done("ingest") and not (t31 and t32):
+            # 断点运行：直接使用 ingest 阶段保存的缺陷表，不再重读 Excel
+            tables = run.load_json("ingest")
+            data['table31'] = t31 = tables.get('table31', [])
+            data['table32'] = t32 = tables.get('table32', [])
+            if not eft or (isinstance(eft, str) and not eft.strip()):
+                data['excel_filtered_table'] = "\n".join(list(t31) + list(t32))
+        elif not eft or (isinstance(eft, str) and not eft.strip()):
             from Tool.excel_reader_tool import read_filtered_excel_tables
-            tables = read_filtered_excel_tables.invoke({'file_path': os.environ.get('REFER_FILE_OUT_PATH')})
+            tables = read_filtered_excel_tables.invoke({'file_path': job.excel_path})
             t31 = tables.get('table31', [])
             t32 = tables.get('table32', [])
             data['excel_filtered_table'] = "\n".join(list(t31) + list(t32))
@@ -828,12 +906,20 @@ def create_complete_report(output_path: str, data: dict, template_path: str = No
             data['table32'] = t32
         elif (not t31) or (not t32):
             from Tool.excel_reader_tool import read_filtered_excel_tables
-            tables = read_filtered_excel_tables.invoke({'file_path': os.environ.get('REFER_FILE_OUT_PATH')})
+            tables = read_filtered_excel_tables.invoke({'file_path': job.excel_path})
             data['table31'] = tables.get('table31', [])
             data['table32'] = tables.get('table32', [])
     except Exception:
         pass
-    return generate_bridge_report(data, output_path, template_path)
+    # 叙述字段：缺失或为空的由规则生成器补全（NARRATIVE_MODE=rule 时全部使用规则结果），无需调用大模型
+    fill_narrative(data, data.get('narrative_mode') or job.narrative_mode)
+    if run is None:
+        return generate_bridge_report(data, output_path, template_path)
+    # 断点运行：叙述 data 与未插图报告分别登记为 narrative / report 阶段产物
+    run.save_json("narrative", data)
+    result = generate_bridge_report(data, output_path, template_path)
+    run.mark_done("report", result)
+    return result
 
 
 # 导出给 agent 使用
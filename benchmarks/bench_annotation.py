@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+红框标注基准：在合成的 4K 照片（3840×2160，含 N 个红色矩形框）上对比
+“逐框重新加载字体 + 每个标注一次 numpy↔PIL 转换”（原实现）与
+“进程内字体缓存 + 每张图一次 PIL 会话”（tool_1.refer_tool._annotate）的吞吐，
+并逐像素核对两者输出一致。
+
+用法：
+    python benchmarks/bench_annotation.py                       # 默认 4 张、每张 20 个框
+    python benchmarks/bench_annotation.py --images 8 --boxes 40 --font font/SimHei.ttf
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import tool_1.refer_tool as refer_tool
+
+WIDTH, HEIGHT = 3840, 2160
+
+
+def make_frame(path: str, boxes: int, seed: int):
+    """合成 4K 现场照片：低饱和度纹理背景 + boxes 个纯红矩形框（BGR 0,0,255，线宽 8）"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(60, 180, size=(HEIGHT // 8, WIDTH // 8, 3), dtype=np.uint8)
+    img = cv2.resize(small, (WIDTH, HEIGHT), interpolation=cv2.INTER_LINEAR)
+    img = cv2.GaussianBlur(img, (5, 5), 0)
+    for _ in range(boxes):
+        w, h = int(rng.integers(120, 600)), int(rng.integers(120, 600))
+        x, y = int(rng.integers(0, WIDTH - w)), int(rng.integers(60, HEIGHT - h))
+        cv2.rectangle(img, (x, y), (x + w, y + h), (0, 0, 255), 8)
+    refer_tool.imwrite_unicode(path, img)
+
+
+def legacy_draw_chinese_text(image, text, position, font_size, color):
+    """原实现：每次调用都重新加载字体，并整图转换 numpy→PIL→numpy"""
+    pil_img = Image.fromarray(image)
+    draw = ImageDraw.Draw(pil_img)
+    font = ImageFont.truetype(refer_tool.FONT_PATH, font_size)
+    bbox = draw.textbbox(position, text, font=font)
+    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    x, y = position
+    padding = 6
+    bg_x1 = max(x - padding, 0)
+    bg_y1 = max(y - padding, 0)
+    bg_x2 = min(x + text_width + padding, image.shape[1])
+    bg_y2 = min(y + text_height + padding, image.shape[0])
+    draw.rectangle([bg_x1, bg_y1, bg_x2, bg_y2], fill=color)
+    draw.text((x, y), text, font=font, fill=(255, 255, 255))
+    return np.array(pil_img)
+
+
+def legacy_annotate(image_path, output_path, min_area=1200):
+    img = refer_tool.imread_unicode(image_path)
+    text_to_draw = f"{refer_tool.extract_defect_name(image_path)} 0.95"
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, np.array([0, 150, 180]), np.array([8, 255, 255])) | \
+        cv2.inRange(hsv, np.array([172, 150, 180]), np.array([179, 255, 255]))
+    kernel = np.ones((3, 3), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for cnt in contours:
+        x, y, w, h = cv2.boundingRect(cnt)
+        if w * h < min_area:
+            continue
+        img = legacy_draw_chinese_text(img, text_to_draw, (x, y - 40 if y > 40 else y), 35, (255, 0, 0))
+    refer_tool.imwrite_unicode(output_path, img)
+    return output_path
+
+
+def run(fn, frames, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    outputs = []
+    start = time.perf_counter()
+    for frame in frames:
+        out = os.path.join(out_dir, os.path.basename(frame))
+        fn(frame, out)
+        outputs.append(out)
+    return time.perf_counter() - start, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="4K 红框标注吞吐基准")
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--boxes", type=int, default=20)
+    parser.add_argument("--font", default=refer_tool.FONT_PATH, help="标注字体（默认 font/SimHei.ttf）")
+    parser.add_argument("--keep", action="store_true", help="保留合成图片与输出目录")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.font):
+        sys.exit(f"字体不存在: {args.font}（用 --font 指定 ttf 路径）")
+    refer_tool.FONT_PATH = args.font
+
+    work = tempfile.mkdtemp(prefix="bench_annotation_")
+    try:
+        frames = []
+        for i in range(args.images):
+            path = os.path.join(work, "src", f"HC-{i:02d}-大里程侧右侧螺栓锈蚀.jpg")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            make_frame(path, args.boxes, seed=i)
+            frames.append(path)
+
+        # 预热：首次解码、字体加载不计入
+        refer_tool._annotate(frames[0], os.path.join(work, "warmup.jpg"))
+
+        legacy_time, legacy_out = run(legacy_annotate, frames, os.path.join(work, "legacy"))
+        cached_time, cached_out = run(refer_tool._annotate, frames, os.path.join(work, "cached"))
+
+        identical = all(
+            np.array_equal(refer_tool.imread_unicode(a), refer_tool.imread_unicode(b))
+            for a, b in zip(legacy_out, cached_out)
+        )
+        n = len(frames)
+        print(f"{n} 张 {WIDTH}x{HEIGHT} 图片，每张 {args.boxes} 个红框")
+        print(f"  原实现（逐框加载字体/转换）: {legacy_time / n * 1000:8.1f} ms/张  {n / legacy_time:6.2f} 张/s")
+        print(f"  字体缓存 + 单次 PIL 会话   : {cached_time / n * 1000:8.1f} ms/张  {n / cached_time:6.2f} 张/s")
+        print(f"  加速比 {legacy_time / cached_time:.2f}x，输出逐像素一致: {'是' if identical else '否'}")
+        if not identical:
+            sys.exit(1)
+    finally:
+        if args.keep:
+            print(f"工作目录: {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
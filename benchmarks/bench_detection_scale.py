@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+缩小分辨率红框检测基准：对比 detect_red_boxes 在 1/2/4/8 倍缩小下的检测耗时，
+并以全分辨率检测结果为基准核对精度（按 IoU 匹配的召回率、精确率与最大角点误差）。
+
+样本为 --photos 目录下的现场照片，以及合成的 4K 帧（见 bench_annotation.make_frame）。
+--check 中的倍数（默认 2，即 4K 照片在 auto 模式下的取值）召回率或精确率低于 --min-recall 时
+以非零状态退出；4/8 倍只报告，用于观察速度与精度的取舍。
+
+用法：
+    python benchmarks/bench_detection_scale.py
+    python benchmarks/bench_detection_scale.py --photos static --synthetic 4 --scales 2,4,8 --check 2,4 --min-recall 0.9
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from bench_annotation import make_frame
+from tool_1.refer_tool import detect_red_boxes, imread_unicode, IMAGE_EXTS
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def match(reference, boxes, threshold):
+    """贪心 IoU 匹配，返回 (匹配数, 最大角点误差 px)"""
+    unused = list(boxes)
+    matched, max_error = 0, 0
+    for ref in sorted(reference, key=lambda b: -b[2] * b[3]):
+        best = max(unused, key=lambda b: iou(ref, b), default=None)
+        if best is None or iou(ref, best) < threshold:
+            continue
+        unused.remove(best)
+        matched += 1
+        corners = [abs(ref[0] - best[0]), abs(ref[1] - best[1]),
+                   abs(ref[0] + ref[2] - best[0] - best[2]), abs(ref[1] + ref[3] - best[1] - best[3])]
+        max_error = max(max_error, *corners)
+    return matched, max_error
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缩小分辨率红框检测的速度与精度")
+    parser.add_argument("--photos", default=os.path.join(ROOT, "static"))
+    parser.add_argument("--synthetic", type=int, default=2, help="额外合成的 4K 帧数量")
+    parser.add_argument("--boxes", type=int, default=12)
+    parser.add_argument("--scales", default="2,4,8")
+    parser.add_argument("--check", default="2", help="需达到精度阈值的倍数")
+    parser.add_argument("--min-area", type=int, default=1200)
+    parser.add_argument("--iou", type=float, default=0.8)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    check = [int(s) for s in args.check.split(",") if s.strip()]
+    scales = sorted(set(int(s) for s in args.scales.split(",") if s.strip()) | set(check))
+
+    paths = sorted(p for p in glob.glob(os.path.join(args.photos, "*")) if p.lower().endswith(IMAGE_EXTS))
+    tmp = tempfile.mkdtemp(prefix="bench_detect_")
+    for i in range(args.synthetic):
+        path = os.path.join(tmp, f"synthetic-{i}.jpg")
+        make_frame(path, args.boxes, seed=100 + i)
+        paths.append(path)
+    if not paths:
+        sys.exit("没有可用的样本图片")
+
+    totals = {s: {"time": 0.0, "matched": 0, "found": 0, "error": 0} for s in [1] + scales}
+    reference_total = 0
+    for path in paths:
+        img = imread_unicode(path)
+        if img is None:
+            continue
+        full_time, reference = timed(lambda: detect_red_boxes(img, args.min_area, 1), args.repeat)
+        totals[1]["time"] += full_time
+        reference_total += len(reference)
+        line = [f"{os.path.basename(path)[:28]:<30}{img.shape[1]}x{img.shape[0]}  全分辨率 {len(reference)} 框 {full_time * 1000:6.1f}ms"]
+        for scale in scales:
+            t, boxes = timed(lambda: detect_red_boxes(img, args.min_area, scale), args.repeat)
+            matched, error = match(reference, boxes, args.iou)
+            stats = totals[scale]
+            stats["time"] += t
+            stats["matched"] += matched
+            stats["found"] += len(boxes)
+            stats["error"] = max(stats["error"], error)
+            line.append(f"1/{scale}: {matched}/{len(reference)}({len(boxes)}) {t * 1000:5.1f}ms")
+        print("  ".join(line))
+
+    print()
+    print(f"{'倍数':<6}{'检测耗时':>10}{'加速比':>8}{'召回率':>8}{'精确率':>8}{'最大角点误差':>12}")
+    failed = False
+    base = totals[1]["time"]
+    print(f"{'1':<6}{base * 1000:>8.1f}ms{1.0:>7.2f}x{1.0:>8.3f}{1.0:>8.3f}{0:>10}px")
+    for scale in scales:
+        stats = totals[scale]
+        recall = stats["matched"] / reference_total if reference_total else 1.0
+        precision = stats["matched"] / stats["found"] if stats["found"] else 1.0
+        print(f"{scale:<6}{stats['time'] * 1000:>8.1f}ms{base / stats['time']:>7.2f}x"
+              f"{recall:>8.3f}{precision:>8.3f}{stats['error']:>10}px")
+        if scale in check and (recall < args.min_recall or precision < args.min_recall):
+            failed = True
+    if failed:
+        print(f"\n倍数 {args.check} 中存在召回率或精确率低于 {args.min_recall} 的情况")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
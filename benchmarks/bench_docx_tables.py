@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+表格提取基准：在合成的宽表（含横向 gridSpan 与纵向 vMerge 合并）上对比
+    原实现：python-docx row.cells（每行重算网格，合并单元格重复返回）→ markdown
+    直接遍历 w:tr/w:tc：Tool.docx_stream.table_rows（合并单元格只输出一次）→ markdown
+的耗时，并核对 fill_merged=True 时与 row.cells 的文本逐格一致、默认模式下合并内容不再重复。
+
+用法：
+    python benchmarks/bench_docx_tables.py                     # 默认 300 行 × 12 列
+    python benchmarks/bench_docx_tables.py --rows 1000 --cols 20
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from docx import Document
+
+from Tool.docx_stream import rows_to_markdown, table_rows
+
+
+def make_table(path, rows, cols):
+    """汇总表式的宽表：每 5 行纵向合并“桥墩”列，每行末 3 列横向合并为“备注”"""
+    doc = Document()
+    table = doc.add_table(rows=rows, cols=cols)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"HC-{r:03d}-{c:02d} 螺栓锈蚀"
+    for start in range(1, rows, 5):
+        table.cell(start, 0).merge(table.cell(min(start + 4, rows - 1), 0))
+    for r in range(rows):
+        table.cell(r, cols - 3).merge(table.cell(r, cols - 1))
+    doc.save(path)
+
+
+def timed(fn, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="docx 宽表/合并表提取基准")
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--cols", type=int, default=12)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_docx_tables_")
+    try:
+        path = os.path.join(work, "table.docx")
+        make_table(path, args.rows, args.cols)
+        table = Document(path).tables[0]
+
+        legacy_rows, legacy_time = timed(lambda: [[c.text for c in row.cells] for row in table.rows])
+        legacy_md = rows_to_markdown(legacy_rows)
+        direct_rows, direct_time = timed(lambda: table_rows(table._tbl))
+        direct_md = rows_to_markdown(direct_rows)
+
+        filled_same = table_rows(table._tbl, fill_merged=True) == legacy_rows
+        print(f"{args.rows} 行 × {args.cols} 列（每 5 行纵向合并首列，每行末 3 列横向合并）")
+        print(f"  row.cells          : {legacy_time * 1000:8.1f} ms  markdown {len(legacy_md) / 1024:7.1f} KB")
+        print(f"  直接遍历 w:tr/w:tc : {direct_time * 1000:8.1f} ms  markdown {len(direct_md) / 1024:7.1f} KB")
+        print(f"  加速比 {legacy_time / direct_time:.1f}x，fill_merged 与 row.cells 一致: {'是' if filled_same else '否'}")
+        if not filled_same:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+插图阶段基准：对比
+    原流程：_annotate 解码/标注/写出中间文件 → ImageInserter 按文件插入原尺寸图片
+    融合流程：render_report_image 解码一次 → 标注 → 缩小到显示宽度 → 内存 JPEG → ImageInserter 直接插入字节
+的单进程耗时、中间文件数与生成的 docx 体积。
+
+测试文档为一个表格，每个单元格写一张照片的文件名（与报告模板的图片字段一致）。
+
+用法：
+    python benchmarks/bench_image_stage.py                          # 默认 4 张合成 4K 照片
+    python benchmarks/bench_image_stage.py --photos static --font font/SimHei.ttf
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from docx import Document
+
+from bench_annotation import make_frame
+import tool_1.refer_tool as refer_tool
+from Tool.word_Imagetool import ImageInserter
+
+
+def make_template(path, photos):
+    doc = Document()
+    table = doc.add_table(rows=len(photos), cols=1)
+    for row, photo in zip(table.rows, photos):
+        row.cells[0].text = os.path.basename(photo)
+    doc.save(path)
+
+
+def legacy(photos, template, work):
+    annotated = os.path.join(work, "annotated")
+    os.makedirs(annotated, exist_ok=True)
+    for photo in photos:
+        refer_tool._annotate(photo, os.path.join(annotated, os.path.basename(photo)))
+    return ImageInserter(static_dir=annotated).replace_image_fields(template, os.path.join(work, "legacy.docx"))
+
+
+def fused(photos, template, work):
+    images = {os.path.abspath(p): refer_tool.render_report_image(p) for p in photos}
+    photo_dir = os.path.dirname(photos[0])
+    return ImageInserter(static_dir=photo_dir, images=images).replace_image_fields(
+        template, os.path.join(work, "fused.docx"))
+
+
+def count_files(path):
+    return sum(len(files) for _, _, files in os.walk(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="融合插图阶段基准")
+    parser.add_argument("--photos", default=None, help="照片目录（默认合成 4K 照片）")
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--boxes", type=int, default=12)
+    parser.add_argument("--font", default=refer_tool.FONT_PATH, help="标注字体（默认 font/SimHei.ttf）")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.font):
+        sys.exit(f"字体不存在: {args.font}（用 --font 指定 ttf 路径）")
+    refer_tool.FONT_PATH = args.font
+
+    work = tempfile.mkdtemp(prefix="bench_image_stage_")
+    try:
+        if args.photos:
+            photos = sorted(p for p in glob.glob(os.path.join(args.photos, "*"))
+                            if p.lower().endswith(refer_tool.IMAGE_EXTS))
+        else:
+            photos = []
+            for i in range(args.images):
+                path = os.path.join(work, "src", f"HC-{i:02d}-大里程侧右侧螺栓锈蚀.jpg")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                make_frame(path, args.boxes, seed=i)
+                photos.append(path)
+        if not photos:
+            sys.exit("没有可用的照片")
+        template = os.path.join(work, "template.docx")
+        make_template(template, photos)
+
+        # 预热：字体加载、模块导入不计入
+        refer_tool.render_report_image(photos[0])
+
+        results = {}
+        for name, fn in (("原流程", legacy), ("融合流程", fused)):
+            stage_dir = os.path.join(work, name)
+            os.makedirs(stage_dir)
+            start = time.perf_counter()
+            out = fn(photos, template, stage_dir)
+            elapsed = time.perf_counter() - start
+            # 中间文件 = 阶段目录中除输出 docx 之外的文件
+            results[name] = (elapsed, os.path.getsize(out), count_files(stage_dir) - 1)
+
+        n = len(photos)
+        print(f"{n} 张照片")
+        for name, (elapsed, size, files) in results.items():
+            print(f"  {name:<6}: {elapsed / n * 1000:8.1f} ms/张  docx {size / 1024 / 1024:7.2f} MB  中间文件 {files} 个")
+        (legacy_time, legacy_size, _), (fused_time, fused_size, _) = results.values()
+        print(f"  加速比 {legacy_time / fused_time:.2f}x，docx 缩小到 {fused_size / legacy_size:.1%}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+冷启动导入耗时基准：在全新的 Python 子进程中逐个导入工具/智能体模块，测量导入耗时，
+并检查导入后是否意外加载了应延迟导入的重型依赖（cv2、pandas、langchain agents 等）。
+
+任一模块超出预算或加载了禁止的依赖时以非零状态退出，可直接用作 CI 检查。
+
+用法：
+    python benchmarks/bench_import_time.py                 # 默认预算 1.5 秒/模块
+    python benchmarks/bench_import_time.py --budget 1.0 --repeat 5
+    python benchmarks/bench_import_time.py --top 10        # 同时列出最耗时的 10 个导入（-X importtime）
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+AGENT_SCRIPT = os.path.join(ROOT, "Agent", "01-桥梁支座检查报告agent.py")
+
+# 模块 -> 导入后不应出现在 sys.modules 中的依赖（由 Tool.lazy_import 延迟到首次使用）
+TARGETS = {
+    "Tool.word_tool": ["cv2", "pandas", "langchain.agents"],
+    "Tool.excel_reader_tool": ["cv2", "pandas"],
+    "Tool.word_Imagetool": ["cv2", "pandas"],
+    "tool_1.refer_tool": ["cv2", "pandas"],
+    "tool_1.handle_fault_tool": ["cv2", "pandas"],
+    AGENT_SCRIPT: ["cv2", "pandas", "langchain.agents", "openai"],
+}
+
+PROBE = r"""
+import importlib, importlib.util, json, sys, time
+target, forbidden = sys.argv[1], json.loads(sys.argv[2])
+start = time.perf_counter()
+if target.endswith(".py"):
+    spec = importlib.util.spec_from_file_location("bench_target", target)
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+else:
+    importlib.import_module(target)
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in forbidden if m in sys.modules]}))
+"""
+
+
+def _label(target: str) -> str:
+    return os.path.relpath(target, ROOT) if target.endswith(".py") else target
+
+
+def _parse_importtime(stderr: str, top: int):
+    """解析 -X importtime 输出，返回累计耗时最高的导入 [(模块, 毫秒)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            rows.append((name.rstrip(), int(cumulative) / 1000.0))
+        except ValueError:
+            continue
+    # 只看顶层导入（缩进最少），避免同一依赖树重复计入
+    top_level = [(n.strip(), ms) for n, ms in rows if len(n) - len(n.lstrip()) <= 1]
+    return sorted(top_level, key=lambda x: -x[1])[:top]
+
+
+def measure(target: str, forbidden, repeat: int = 3, top: int = 0) -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    times, loaded, heaviest = [], [], []
+    for i in range(repeat):
+        args = [sys.executable]
+        if top and i == 0:
+            args += ["-X", "importtime"]
+        args += ["-c", PROBE, target, json.dumps(forbidden)]
+        proc = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True, encoding="utf-8")
+        if proc.returncode != 0:
+            raise RuntimeError(f"导入 {_label(target)} 失败:\n{proc.stderr[-2000:]}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        times.append(result["elapsed"])
+        loaded = result["loaded"]
+        if top and i == 0:
+            heaviest = _parse_importtime(proc.stderr, top)
+    return {"target": _label(target), "best": min(times), "times": times, "loaded": loaded, "heaviest": heaviest}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工具/智能体模块冷启动导入耗时基准")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET", "1.5")),
+                        help="每个模块的导入耗时上限（秒，取多次中的最小值比较）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=0, help="列出最耗时的 N 个顶层导入")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'模块':<40}{'最小耗时':>10}  结果")
+    for target, forbidden in TARGETS.items():
+        r = measure(target, forbidden, repeat=args.repeat, top=args.top)
+        problems = []
+        if r["best"] > args.budget:
+            problems.append(f"超出预算 {args.budget:g}s")
+        if r["loaded"]:
+            problems.append("提前加载了 " + ", ".join(r["loaded"]))
+        print(f"{r['target']:<40}{r['best']:>9.3f}s  {'；'.join(problems) or 'OK'}")
+        for name, ms in r["heaviest"]:
+            print(f"    {ms:>8.1f} ms  {name}")
+        if problems:
+            failures.append(r["target"])
+
+    if failures:
+        print(f"\n{len(failures)} 个模块未通过: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
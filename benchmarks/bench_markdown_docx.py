@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+markdown -> docx 写入基准：在合成的报告文本（章节标题、段落、注释与大表格）上对比
+    原实现：逐段 add_paragraph、逐行 table.add_row().cells、逐格 cell.text 赋值（表头按原意写入）
+    Tool.markdown_docx.build_docx：整篇解析一次，批量拼接 XML 后一次挂到正文
+的耗时，按行数递增观察每行耗时是否保持平稳，并用 Tool.docx_stream 读回两份文档核对内容一致。
+
+用法：
+    python benchmarks/bench_markdown_docx.py                        # 默认 1000/2500/5000/10000 行
+    python benchmarks/bench_markdown_docx.py --lines 2000 20000
+    python benchmarks/bench_markdown_docx.py --single-table     # 整篇只有一张大表（汇总表场景）
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from Tool.docx_stream import iter_docx_blocks
+from Tool.markdown_docx import build_docx
+
+TABLE_HEADER = "|桥墩|构件|部位|缺陷类型|数量|备注|\n|---|---|---|---|---|---|"
+TABLE_ROW = "|{pier}#墩|HC-{i:04d}|大里程侧右侧|螺栓锈蚀<br/>垫石破损|{n}处|建议定期巡检|"
+
+
+def make_markdown(lines, single_table=False):
+    """每 50 行一个章节：标题 + 说明段落 + 注释 + 45 行表格；single_table=True 时整篇为一张 lines 行的表格"""
+    if single_table:
+        rows = "\n".join(TABLE_ROW.format(pier=i // 5, i=i, n=i % 7) for i in range(lines))
+        return f"{TABLE_HEADER}\n{rows}"
+    blocks, count, section = [], 0, 0
+    while count < lines:
+        section += 1
+        rows = "\n".join(TABLE_ROW.format(pier=section, i=count + k, n=k % 7) for k in range(45))
+        blocks += [
+            f"{1 + section % 3}.{section} 第 {section} 联支座检查结果",
+            f"本联共检查支座 45 个，发现病害 {section % 9} 处。<br/>详见下表。",
+            f"{TABLE_HEADER}\n{rows}",
+            "注：数量为现场实测值。",
+        ]
+        count += 50
+    return "\n\n".join(blocks)
+
+
+def legacy_build(content):
+    """原 save_to_docx 的构建过程（仅修正表头循环变量被覆盖的问题，使其可运行）"""
+    doc = Document()
+    style = doc.styles["Normal"]
+    style.font.name = "Times New Roman"
+    style.font.element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
+    for block in content.split("\n\n"):
+        block = block.strip()
+        if not block:
+            doc.add_paragraph("")
+            continue
+        if "|" in block and "---" in block:
+            table_rows = [row.strip() for row in block.split("\n") if row.strip()]
+            if len(table_rows) >= 2:
+                header_texts = [cell.strip() for cell in table_rows[0].strip("|").split("|")]
+                col_count = len(header_texts)
+                table = doc.add_table(rows=1, cols=col_count)
+                table.style = "Table Grid"
+                header_cells = table.rows[0].cells
+                for idx, cell_text in enumerate(header_texts):
+                    header_cells[idx].text = cell_text.replace("<br/>", "\n")
+                for row in table_rows[1:]:
+                    if "---" in row:
+                        continue
+                    row_cells = [cell.strip() for cell in row.strip("|").split("|")]
+                    row_cells = row_cells + [""] * (col_count - len(row_cells))
+                    table_row = table.add_row().cells
+                    for idx, cell_text in enumerate(row_cells):
+                        table_row[idx].text = cell_text.replace("<br/>", "\n")
+                doc.add_paragraph("")
+                continue
+        para_text = block.replace("<br/>", "\n")
+        para = doc.add_paragraph(para_text)
+        if para_text.startswith(("1.", "2.", "3.")):
+            para.paragraph_format.left_indent = 0
+            para.runs[0].font.bold = True
+        elif para_text.startswith(("（*", "注：")):
+            para.paragraph_format.left_indent = 20
+    return doc
+
+
+def timed(fn, content, path):
+    start = time.perf_counter()
+    fn(content).save(path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="markdown 转 docx 写入基准")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 2500, 5000, 10000])
+    parser.add_argument("--single-table", action="store_true", help="整篇只有一张大表")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_markdown_docx_")
+    ok = True
+    try:
+        print(f"{'行数':>8}{'原实现':>10}{'每行':>10}{'批量构建':>10}{'每行':>10}{'加速比':>8}")
+        for lines in args.lines:
+            content = make_markdown(lines, args.single_table)
+            legacy_path = os.path.join(work, f"legacy_{lines}.docx")
+            built_path = os.path.join(work, f"built_{lines}.docx")
+            legacy_time = timed(legacy_build, content, legacy_path)
+            built_time = timed(build_docx, content, built_path)
+            same = list(iter_docx_blocks(legacy_path)) == list(iter_docx_blocks(built_path))
+            ok = ok and same
+            print(f"{lines:>8}{legacy_time:>9.2f}s{legacy_time / lines * 1e6:>8.0f}us"
+                  f"{built_time:>9.2f}s{built_time / lines * 1e6:>8.0f}us{legacy_time / built_time:>7.1f}x"
+                  f"{'' if same else '  内容不一致'}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+模型路由基准：在样例数据（static/总结.xlsx）上对比“按任务路由”与“统一大模型 + high”两种配置的延迟与质量。
+
+质量指标为数量一致性：输出中出现的“缺陷名称（N处）”与规则统计（Tool/narrative_tool）的去重计数一致的比例。
+
+用法：
+    python benchmarks/bench_model_routing.py              # 实际调用方舟接口（需 ARK_API_KEY）
+    python benchmarks/bench_model_routing.py --dry-run    # 只打印路由决策与输入规模
+    python benchmarks/bench_model_routing.py --repeat 3 --excel static/总结.xlsx
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from Model.model_router import ModelRouter
+from Tool.env_config import load_env
+from Tool.narrative_tool import build_narrative, count_defects, _by_priority
+
+COUNT_RE = re.compile(r"([^\s，,、；;：:（(）)]+?)\s*[（(]\s*(\d+)\s*处\s*[）)]")
+
+
+def load_tables(excel_path):
+    os.environ["REFER_FILE_OUT_PATH"] = excel_path
+    from Tool.excel_reader_tool import read_filtered_excel_tables
+    tables = read_filtered_excel_tables.invoke({})
+    return tables["table31"], tables["table32"]
+
+
+def build_tasks(table31, table32):
+    """基准任务：字段抽取（小模型任务）与成因分析（大模型任务）"""
+    rows = "\n".join(["桥墩,构件,部位,缺陷类型,现场照片"] + list(table31) + list(table32))
+    narrative = build_narrative(table31, table32)
+    return {
+        "extract": [
+            {"role": "system", "content": "你是桥梁检测数据整理助手，只输出 JSON，不输出解释。"},
+            {"role": "user", "content": (
+                "下表每行是一处缺陷（同一桥墩、部位、缺陷类型只计一次，缺陷类型末尾的编号不计入名称）。"
+                "请统计每种缺陷的处数，输出 JSON 对象 {缺陷名称: 处数}：\n" + rows
+            )},
+        ],
+        "analysis": [
+            {"role": "system", "content": "你是桥梁工程检测报告撰写工程师，不得改变任何统计数字。"},
+            {"role": "user", "content": (
+                "根据以下缺陷统计，撰写“缺陷情况与成因总结”一段，每种缺陷以“缺陷名称（N处）”格式标注数量，"
+                "并说明推测成因（标注为非统计结论）：\n" + narrative["defect_list"]
+            )},
+        ],
+    }
+
+
+def number_consistency(text, truth: dict) -> float:
+    """输出中提及的“缺陷（N处）”里，数量与规则统计一致的比例；extract 任务先按 JSON 解析"""
+    mentions = []
+    match = re.search(r"\{.*\}", text, re.S)
+    if match:
+        try:
+            mentions = [(str(k), int(v)) for k, v in json.loads(match.group(0)).items()]
+        except (ValueError, TypeError):
+            mentions = []
+    if not mentions:
+        mentions = [(name, int(n)) for name, n in COUNT_RE.findall(text)]
+    checked = correct = 0
+    for name, n in mentions:
+        # 优先精确匹配，否则取最长的后缀匹配（“防落梁块螺栓锈蚀”→“螺栓锈蚀”，而非更短的名称）
+        key = name if name in truth else max((k for k in truth if name.endswith(k)), key=len, default=None)
+        if key is None:
+            continue
+        checked += 1
+        correct += int(truth[key] == n)
+    return correct / checked if checked else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型路由延迟/质量基准")
+    parser.add_argument("--excel", default=os.path.join(ROOT, "static", "总结.xlsx"))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    table31, table32 = load_tables(args.excel)
+    truth, _ = _by_priority(count_defects(table31, table32))
+    tasks = build_tasks(table31, table32)
+
+    load_env()  # MODEL_NAME / MODEL_NAME_SMALL / MODEL_NAME_LARGE 来自 .env，需在构造路由前加载
+    routed = ModelRouter.from_env()
+    large = routed.models["large"]
+    baseline = ModelRouter(small_model=large, large_model=large,
+                           routes={task: ("large", "high") for task in tasks})
+
+    print(f"样例数据: {args.excel}（表3.1 {len(table31)} 行，表3.2 {len(table32)} 行，缺陷 {len(truth)} 种）")
+    for task, messages in tasks.items():
+        for name, router in (("routed", routed), ("baseline", baseline)):
+            r = router.route(task, messages)
+            print(f"  {task:<9}{name:<9} model={r.model} effort={r.reasoning_effort} input≈{r.input_tokens} tokens")
+    if args.dry_run:
+        return
+
+    from Model.mychat_doubao import MyChatModel
+    models = {"routed": MyChatModel(router=routed), "baseline": MyChatModel(router=baseline)}
+
+    print(f"\n{'任务':<10}{'配置':<10}{'模型/推理强度':<36}{'平均延迟(s)':>12}{'数量一致性':>12}")
+    for task, messages in tasks.items():
+        for name, chat in models.items():
+            latencies, scores = [], []
+            result = {}
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = chat.chat(messages, task=task)
+                latencies.append(time.perf_counter() - start)
+                scores.append(number_consistency(result["full_content"], truth))
+            label = f"{result['model']}/{result['reasoning_effort']}"
+            print(f"{task:<10}{name:<10}{label:<36}{sum(latencies) / len(latencies):>12.2f}"
+                  f"{sum(scores) / len(scores):>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
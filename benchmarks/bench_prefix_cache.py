@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+前缀缓存基准：模拟 agent 多轮迭代（系统提示词 + 模板摘要 + 缺陷表为静态前缀，每轮追加工具输出），
+对比“无缓存”“LocalPrefixCache”“ArkContextCache（本地替身服务）”三种配置的首 token 延迟与命中率。
+
+替身服务按未命中缓存的输入 token 数模拟预填充耗时：普通调用每轮都处理完整消息；
+经 /context/chat/completions 引用已登记的 context_id 时只处理动态部分。
+LocalPrefixCache 仍发送完整消息（首 token 延迟不变），只在本地登记前缀并统计 hit_rate / token_hit_rate。
+
+用法：
+    python benchmarks/bench_prefix_cache.py
+    python benchmarks/bench_prefix_cache.py --iterations 8 --jobs 4 --ms-per-1k 50
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from Model.prefix_cache import ArkContextCache, LocalPrefixCache
+from Model.tokens import estimate_tokens
+from Tool.excel_reader_tool import read_filtered_tables
+from Tool.template_digest import format_template_digest, load_template_digest
+
+MODEL = "doubao-stand-in"
+
+
+class _Completions:
+    def __init__(self, server):
+        self._server = server
+
+    def create(self, **payload):
+        return self._server.complete(payload["messages"], cached=0)
+
+
+class _Chat:
+    def __init__(self, server):
+        self.completions = _Completions(server)
+
+
+class StandInArk:
+    """方舟接口替身：chat.completions.create 与上下文缓存的 client.post 两种调用形式"""
+
+    def __init__(self, base_latency: float, sec_per_token: float):
+        self.base_latency = base_latency
+        self.sec_per_token = sec_per_token
+        self.chat = _Chat(self)
+        self.contexts = {}  # context_id -> 前缀 token 数
+        self.registrations = 0
+        self._lock = threading.Lock()
+
+    def _prefill(self, tokens: int):
+        time.sleep(self.base_latency + tokens * self.sec_per_token)
+
+    def complete(self, messages, cached: int):
+        tokens = estimate_tokens(messages)
+        self._prefill(tokens)
+        return {"choices": [{"message": {"role": "assistant", "content": "ok"}}],
+                "usage": {"prompt_tokens": cached + tokens, "prompt_tokens_details": {"cached_tokens": cached}}}
+
+    def post(self, path, body=None, cast_to=None, options=None, stream=False, stream_cls=None):
+        if path == "/context/create":
+            tokens = estimate_tokens(body["messages"])
+            self._prefill(tokens)
+            context_id = f"ctx-{uuid.uuid4().hex[:8]}"
+            with self._lock:
+                self.contexts[context_id] = tokens
+                self.registrations += 1
+            return {"id": context_id}
+        if path == "/context/chat/completions":
+            return self.complete(body["messages"], cached=self.contexts[body["context_id"]])
+        raise ValueError(f"未知接口：{path}")
+
+
+def build_prefix(excel_path, template_path):
+    """静态前缀：与 agent 每轮重发的内容相同（系统提示词、模板摘要、缺陷表）"""
+    tables = read_filtered_tables(excel_path)
+    rows = "\n".join(["桥梁,构件,部位,缺陷类型,现场照片"] + list(tables["table31"]) + list(tables["table32"]))
+    return [
+        {"role": "system", "content": "你是桥梁支座检查报告撰写助手，按工具调用流程读取数据、统计缺陷并生成报告。"},
+        {"role": "system", "content": "【报告模板】\n" + format_template_digest(load_template_digest(template_path))},
+        {"role": "system", "content": "【缺陷表】\n" + rows},
+    ]
+
+
+def run_agent(create, prefix, iterations, step_tokens):
+    """一次 agent 任务：每轮在静态前缀后追加上一轮的工具输出，返回每轮的首 token 延迟"""
+    scratchpad = [{"role": "user", "content": "请生成桥梁支座检查报告。"}]
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        create(model=MODEL, messages=prefix + scratchpad)
+        latencies.append(time.perf_counter() - start)
+        scratchpad.append({"role": "assistant", "content": f"调用工具 step_{i}"})
+        scratchpad.append({"role": "user", "content": f"工具输出 {i}：" + "缺陷" * step_tokens})
+    return latencies
+
+
+def run_config(create, prefix, args):
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        runs = list(pool.map(lambda _: run_agent(create, prefix, args.iterations, args.step_tokens),
+                             range(args.jobs)))
+    first = sum(r[0] for r in runs) / len(runs)
+    later = sum(sum(r[1:]) for r in runs) / max(1, sum(len(r) - 1 for r in runs))
+    return first, later
+
+
+def main():
+    parser = argparse.ArgumentParser(description="前缀缓存命中率与首 token 延迟基准")
+    parser.add_argument("--excel", default=os.path.join(ROOT, "static", "总结.xlsx"))
+    parser.add_argument("--template", default=os.path.join(ROOT, "static", "报告模板.docx"))
+    parser.add_argument("--iterations", type=int, default=6, help="每个 agent 任务的迭代轮数")
+    parser.add_argument("--jobs", type=int, default=3, help="共用同一缓存的并发任务数")
+    parser.add_argument("--step-tokens", type=int, default=60, help="每轮追加的工具输出长度")
+    parser.add_argument("--ms-per-1k", type=float, default=40.0, help="替身服务每 1k 输入 token 的预填充耗时")
+    args = parser.parse_args()
+
+    prefix = build_prefix(args.excel, args.template)
+    calls = args.iterations * args.jobs
+    print(f"静态前缀约 {estimate_tokens(prefix)} tokens；{args.jobs} 个并发任务 × {args.iterations} 轮，"
+          f"替身服务预填充 {args.ms_per_1k:g}ms/1k tokens")
+    print(f"\n{'配置':<28}{'首轮延迟(s)':>12}{'后续轮平均(s)':>14}{'hit_rate':>10}{'token_hit_rate':>16}")
+
+    server = StandInArk(0.01, args.ms_per_1k / 1000 / 1000)
+    first, later = run_config(server.chat.completions.create, prefix, args)
+    print(f"{'无缓存':<28}{first:>12.3f}{later:>14.3f}{'-':>10}{'-':>16}")
+
+    local = LocalPrefixCache()
+    first, later = run_config(local.wrap(server.chat.completions).create, prefix, args)
+    local_metrics = local.metrics()
+    print(f"{'LocalPrefixCache':<28}{first:>12.3f}{later:>14.3f}"
+          f"{local_metrics['hit_rate']:>10.1%}{local_metrics['token_hit_rate']:>16.1%}")
+
+    import openai.types.chat  # noqa: F401  ArkContextCache 首次发送时导入，提前导入以免计入首轮延迟
+    ark_server = StandInArk(0.01, args.ms_per_1k / 1000 / 1000)
+    ark = ArkContextCache(ark_server)
+    ark_first, ark_later = run_config(ark.wrap(ark_server.chat.completions).create, prefix, args)
+    ark_metrics = ark.metrics()
+    print(f"{'ArkContextCache（替身服务）':<28}{ark_first:>12.3f}{ark_later:>14.3f}"
+          f"{ark_metrics['hit_rate']:>10.1%}{ark_metrics['token_hit_rate']:>16.1%}")
+
+    print(f"\nLocalPrefixCache.metrics(): {local_metrics}")
+    print(f"ArkContextCache.metrics():  {ark_metrics}（服务端登记 {ark_server.registrations} 次）")
+
+    # 同一前缀在并发任务间只登记一次，其余调用全部命中
+    expected = (calls - 1) / calls
+    ok = (abs(local_metrics["hit_rate"] - expected) < 1e-9 and abs(ark_metrics["hit_rate"] - expected) < 1e-9
+          and ark_server.registrations == 1 and local_metrics["entries"] == 1 and ark_later < later)
+    print(f"前缀只登记一次、命中率 {expected:.1%}、后续轮首 token 延迟下降: {'是' if ok else '否'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+txt 读取基准：生成 UTF-8 / GB18030 / UTF-16(BOM) / 长 ASCII 前缀 + GBK 的大日志文件，对比
+    原实现：整文件读入 → chardet.detect(全部字节) → decode
+    Tool.text_reader.read_text_file：BOM / UTF-8 快速校验 / 前缀增量检测 + mmap 解码 + 指纹缓存
+的耗时，并核对解码结果与写入内容一致。原实现的耗时取决于 chardet 版本（5.x 为纯 Python，对整个文件检测
+可达数十秒；7.x 自身会提前结束），因此同时打印所用版本。
+
+用法：
+    python benchmarks/bench_text_read.py                   # 默认 50MB
+    python benchmarks/bench_text_read.py --mb 5 --skip-legacy
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import chardet
+
+import Tool.text_reader as text_reader
+
+LINE = "2024-05-01 10:00:{:02d} HC-{:02d}-大里程侧右侧螺栓锈蚀 3处，支座垫石破损 1处，建议定期巡检。\n"
+ASCII_LINE = "2024-05-01 10:00:{:02d} INFO inspection pipeline step ok, frames=1200\n"
+
+
+def make_text(mb, ascii_prefix=False):
+    lines, size, i = [], 0, 0
+    target = mb * 1024 * 1024
+    while size < target:
+        line = (ASCII_LINE if ascii_prefix and size < target * 0.9 else LINE).format(i % 60, i % 100)
+        lines.append(line)
+        size += len(line.encode("utf-8"))
+        i += 1
+    return "".join(lines)
+
+
+def legacy_read(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    encoding = chardet.detect(raw)["encoding"] or "utf-8"
+    try:
+        return raw.decode(encoding)
+    except UnicodeDecodeError:
+        return raw.decode("utf-8", errors="ignore")
+
+
+def timed(fn, path):
+    start = time.perf_counter()
+    result = fn(path)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大文本文件编码检测与读取基准")
+    parser.add_argument("--mb", type=int, default=50)
+    parser.add_argument("--skip-legacy", action="store_true", help="不测量原实现（旧版 chardet 下非常慢）")
+    args = parser.parse_args()
+
+    cases = [
+        ("utf-8", "utf-8", False),
+        ("gb18030", "gb18030", False),
+        ("utf-16", "utf-16", False),
+        ("ascii 前缀 + gbk", "gbk", True),
+    ]
+    work = tempfile.mkdtemp(prefix="bench_text_read_")
+    ok = True
+    try:
+        print(f"{args.mb}MB 文本，chardet {chardet.__version__}")
+        print(f"{'文件':<18}{'检测编码':>10}{'首次':>9}{'缓存后':>9}{'原实现':>9}")
+        for name, encoding, ascii_prefix in cases:
+            text = make_text(args.mb, ascii_prefix)
+            path = os.path.join(work, f"{args.mb}mb.txt")
+            with open(path, "w", encoding=encoding, newline="") as f:
+                f.write(text)
+            text_reader._encoding_cache.clear()
+            first, first_time = timed(text_reader.read_text_file, path)
+            second, second_time = timed(text_reader.read_text_file, path)
+            legacy_time = None if args.skip_legacy else timed(legacy_read, path)[1]
+            same = first == text and second == text
+            ok = ok and same
+            print(f"{name:<18}{text_reader.detect_encoding(path):>10}{first_time:>8.2f}s{second_time:>8.2f}s"
+                  f"{'-' if legacy_time is None else f'{legacy_time:.2f}s':>9}"
+                  f"{'' if same else '  内容不一致'}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+方舟文件批量上传基准：在本地启动一个替身上传服务（模拟网络延迟与偶发 503），对比
+    原实现：逐个 requests.post(files=...)，每次新建连接、整文件读入内存
+    ArkFileUploader.upload_many：连接池 + 有限并发 + 流式请求体 + 内容哈希去重
+的耗时，并验证重复运行时全部命中本地台账、不再上传。
+
+用法：
+    python benchmarks/bench_upload.py                      # 默认 12 个 2MB 文件（含 2 个重复内容）
+    python benchmarks/bench_upload.py --files 40 --latency 0.2 --workers 8 --fail-every 7
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import requests
+
+from tool_1.url import ArkFileUploader
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """替身上传接口：读完请求体后按内容哈希返回 URL；每 fail_every 个请求返回一次 503"""
+    latency = 0.1
+    fail_every = 0
+    counter = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.counter += 1
+            fail = cls.fail_every and cls.counter % cls.fail_every == 0
+        length = int(self.headers.get("Content-Length", 0))
+        digest = hashlib.sha256()
+        remaining = length
+        while remaining:
+            block = self.rfile.read(min(remaining, 1024 * 1024))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+        time.sleep(cls.latency)
+        if fail:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"data": {"url": f"https://stand-in/{digest.hexdigest()[:16]}"}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_upload(url, paths):
+    """原实现：每个文件单独 requests.post，无连接复用、无重试、无去重"""
+    failed = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            response = requests.post(url, headers={"Authorization": "Bearer test"}, files={"file": f})
+        failed += response.status_code != 200
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="方舟文件批量上传基准（本地替身服务）")
+    parser.add_argument("--files", type=int, default=12)
+    parser.add_argument("--size", type=int, default=2, help="单个文件大小（MB）")
+    parser.add_argument("--duplicates", type=int, default=2, help="其中内容重复的文件数")
+    parser.add_argument("--latency", type=float, default=0.1, help="替身服务每个请求的处理延迟（秒）")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--fail-every", type=int, default=5, help="每 N 个请求返回一次 503（0 为不注入）")
+    args = parser.parse_args()
+
+    StandInHandler.latency = args.latency
+    StandInHandler.fail_every = args.fail_every
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v3/files"
+
+    work = tempfile.mkdtemp(prefix="bench_upload_")
+    try:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(work, "files", f"HC-{i:02d}.jpg")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            seed = i if i >= args.duplicates else args.files + 1  # 前 duplicates 个文件内容相同
+            with open(path, "wb") as f:
+                f.write(hashlib.sha256(str(seed).encode()).digest() * (args.size * 1024 * 1024 // 32))
+            paths.append(path)
+
+        start = time.perf_counter()
+        legacy_failed = legacy_upload(url, paths)
+        legacy_time = time.perf_counter() - start
+
+        uploader = ArkFileUploader(upload_url=url, api_key="test", ledger_path=os.path.join(work, "ledger.json"),
+                                   max_workers=args.workers, backoff=0.05)
+        first = uploader.upload_many(os.path.join(work, "files"))
+        second = ArkFileUploader(upload_url=url, api_key="test", ledger_path=os.path.join(work, "ledger.json"),
+                                 max_workers=args.workers).upload_many(paths)
+
+        print(f"{args.files} 个 {args.size}MB 文件（{args.duplicates} 个内容重复），服务延迟 {args.latency:g}s，"
+              f"每 {args.fail_every or '∞'} 个请求一次 503")
+        print(f"  原实现（逐个上传）: {legacy_time:6.2f}s  失败 {legacy_failed} 个")
+        print(f"  upload_many 首次   : {first['elapsed']:6.2f}s  上传 {len(first['uploaded'])} 个，"
+              f"去重 {len(first['reused'])} 个，失败 {len(first['failed'])} 个")
+        print(f"  upload_many 重复运行: {second['elapsed']:6.2f}s  上传 {len(second['uploaded'])} 个，"
+              f"台账命中 {len(second['reused'])} 个")
+        ok = not first["failed"] and not second["uploaded"] and first["urls"] == second["urls"]
+        print(f"  加速比 {legacy_time / first['elapsed']:.2f}x，重复运行零上传且 URL 一致: {'是' if ok else '否'}")
+        if not ok:
+            sys.exit(1)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
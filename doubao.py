@@ -2,8 +2,9 @@
 import os
 from openai import OpenAI
 from dotenv import load_dotenv
-import chardet
 from docx import Document
+from Model.model_router import ModelRouter
+from Tool.text_reader import read_text_file
 
 # =============================
 # 环境变量
@@ -33,16 +34,8 @@ def read_text_auto(path):
         doc = Document(path)
         return "\n".join(p.text for p in doc.paragraphs)
 
-    # 其他格式按文本读取
-    with open(path, "rb") as f:
-        raw = f.read()
-
-    encoding = chardet.detect(raw)["encoding"] or "utf-8"
-
-    try:
-        return raw.decode(encoding)
-    except:
-        return raw.decode("utf-8", errors="ignore")
+    # 其他格式按文本读取（前缀编码检测，大文件经 mmap 读取）
+    return read_text_file(path)
 
 
 # ============================================================
@@ -207,25 +200,29 @@ template_text = read_text_auto(os.environ.get("TEMPLATE_REPORT_PATH"))
 
 
 # ============================================================
-# 调用模型（流式）
+# 调用模型（流式）：模型与推理强度按任务类型和输入规模路由
 # ============================================================
+messages = [
+    {"role": "system", "content": prompt_system},
+    {
+        "role": "user",
+        "content": (
+            "请根据以下数据，生成完整的桥梁支座检测报告：\n\n"
+            "【统计报告】\n"
+            f"{raw_report_text}\n\n"
+            "【报告模板】\n"
+            f"{template_text}"
+        )
+    }
+]
+route = ModelRouter.from_env().route("report", messages)
+print(f"使用模型: {route.model}（reasoning_effort={route.reasoning_effort}，输入约 {route.input_tokens} tokens）")
+
 stream = client.chat.completions.create(
-    model=os.environ.get("MODEL_NAME"),
-    messages=[
-        {"role": "system", "content": prompt_system},
-        {
-            "role": "user",
-            "content": (
-                "请根据以下数据，生成完整的桥梁支座检测报告：\n\n"
-                "【统计报告】\n"
-                f"{raw_report_text}\n\n"
-                "【报告模板】\n"
-                f"{template_text}"
-            )
-        }
-    ],
+    model=route.model,
+    messages=messages,
     stream=True,
-    reasoning_effort="medium"
+    reasoning_effort=route.reasoning_effort
 )
 
 reasoning_content = ""
@@ -47,9 +47,9 @@ def generate_component(row):
         return f"{base}#{component_name}"
 
 # ===== 主程序 =====
-def process_excel():
-    input_file = r"F:\厦门轨道3号线和4号线桥梁支座缺陷\缺陷汇总表.xlsx"
-    output_file = r"F:\总结.xlsx"
+def process_excel(input_file=None, output_file=None):
+    input_file = input_file or r"F:\厦门轨道3号线和4号线桥梁支座缺陷\缺陷汇总表.xlsx"
+    output_file = output_file or r"F:\总结.xlsx"
 
     xls = pd.ExcelFile(input_file)
     writer = pd.ExcelWriter(output_file, engine='openpyxl')
@@ -74,6 +74,7 @@ def process_excel():
 
     writer.close()
     print(f"✅ 处理完成，输出文件：{output_file}")
+    return output_file
 
 # ===== 程序入口 =====
 if __name__ == "__main__":
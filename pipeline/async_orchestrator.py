@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+重叠执行的报告流水线（asyncio）：
+
+    ┌ 读取 Excel → 规则叙述 → 大模型润色（各字段并发请求）┐
+    │                                                   ├→ 生成 docx → 插图
+    └ 照片标注（进程池并行）────────────────────────────┘
+
+Excel 解析、照片预处理与大模型叙述在最终组装前互不依赖，
+端到端耗时趋近于最长分支，而不是各步骤之和。
+
+用法：
+    python pipeline/async_orchestrator.py --excel static/总结.xlsx --photos static --workdir build
+    python pipeline/async_orchestrator.py --no-llm      # 叙述全部用规则生成
+    python pipeline/async_orchestrator.py --deadline 60  # 60 秒内交付，预算不足时自动降级
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from Tool.excel_reader_tool import read_filtered_tables
+from Tool.narrative_tool import build_narrative, counts_preserved
+from pipeline.deadline import DeadlineBudget
+from pipeline.job_context import current_job
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+# 交给大模型润色的叙述字段 -> 路由任务类型（成因分析用大模型，其余用小模型）
+POLISH_FIELDS = {
+    "defect_causes": "analysis",
+    "main_findings": "summary",
+    "suggestions": "summary",
+    "defect_distribution_and_solutions": "summary",
+}
+
+POLISH_PROMPT = (
+    "你是桥梁工程检测报告撰写工程师。请将下面这段由程序统计生成的报告内容改写得更专业、通顺，"
+    "要求：不得增删或改动任何缺陷名称与数量（每个“N处”必须原样保留），不得虚构缺陷或成因，"
+    "不使用 Markdown，只输出改写后的正文。\n\n{text}"
+)
+
+
+def _render_one(src: str, min_area: int, max_side: int = None, annotate: bool = True) -> bytes:
+    """
+    进程池任务：解码 → 标注 → 缩小到报告显示尺寸 → 编码 JPEG，返回字节串（模块级函数，便于在子进程中序列化调用）
+    max_side 指定时缩小解码（最长边不低于 max_side），面积阈值按比例缩放
+    """
+    from tool_1.refer_tool import render_report_image
+    return render_report_image(src, min_area, annotate=annotate, max_side=max_side)
+
+
+def _list_photos(photo_dir: str):
+    photos = []
+    for root, dirs, files in os.walk(photo_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("_"))
+        photos.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTS))
+    return photos
+
+
+class AsyncReportPipeline:
+    """
+    asyncio 编排：Excel/叙述分支与照片分支并发执行，只在 docx 组装处汇合。
+
+    - 照片标注在 ProcessPoolExecutor 中并行（CPU 密集），结果按报告显示尺寸编码为内存中的 JPEG 直接插入 docx；
+    - 大模型请求在统计结果可用后立即发出，各字段并发（阻塞调用放到线程中执行）；
+    - 润色结果若改动了统计数量则丢弃，回落到规则文本；
+    - 传入 deadline 时按剩余预算降级：规则叙述代替大模型、降低图片分辨率、跳过标注；
+    - 传入 pool 时复用外部进程池（常驻服务），progress 回调接收各阶段完成事件。
+    """
+
+    def __init__(self, workdir: str = "build", use_llm: bool = True, annotate: bool = True,
+                 min_area: int = 1200, max_workers: int = None, chat_model=None,
+                 deadline: DeadlineBudget = None, llm_estimate: float = 30.0, image_cost: float = 0.4,
+                 assemble_estimate: float = 3.0, low_res_side: int = 1280, pool=None, progress=None):
+        self.workdir = os.path.abspath(workdir)
+        self.use_llm = use_llm
+        self.annotate = annotate
+        self.min_area = min_area
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._chat_model = chat_model
+        # 截止时间预算及各阶段的预计耗时（秒），用于判断是否需要降级
+        self.deadline = deadline or DeadlineBudget()
+        self.llm_estimate = llm_estimate
+        self.image_cost = image_cost  # 单张照片全分辨率标注的耗时
+        self.assemble_estimate = assemble_estimate
+        self.low_res_side = low_res_side
+        self.pool = pool
+        self.progress = progress
+        self.timings = {}
+        self.narrative_source = {}
+
+    def _emit(self, event: str, **info):
+        if self.progress is not None:
+            self.progress(dict(info, event=event))
+
+    @property
+    def chat_model(self):
+        if self._chat_model is None:
+            from Model.mychat_doubao import MyChatModel
+            self._chat_model = MyChatModel()
+        return self._chat_model
+
+    # ---------------------
+    # 分支一：Excel → 叙述
+    # ---------------------
+    def _polish(self, field: str, text: str, timeout: float = None) -> str:
+        messages = [{"role": "user", "content": POLISH_PROMPT.format(text=text)}]
+        result = self.chat_model.chat(messages, task=POLISH_FIELDS[field], timeout=timeout)
+        return result["full_content"].strip()
+
+    async def _narrative_branch(self, excel: str, data: dict) -> dict:
+        start = time.perf_counter()
+        tables = await asyncio.to_thread(read_filtered_tables, excel)
+        self.timings["ingest"] = time.perf_counter() - start
+        self._emit("ingest", rows=len(tables["table31"]) + len(tables["table32"]))
+
+        data = dict(data)
+        data["table31"], data["table32"] = tables["table31"], tables["table32"]
+        data["excel_filtered_table"] = "\n".join(list(tables["table31"]) + list(tables["table32"]))
+        narrative = build_narrative(tables["table31"], tables["table32"], data.get("project_name"))
+        data.update(narrative)
+        self.narrative_source = {field: "rule" for field in POLISH_FIELDS}
+
+        use_llm = self.use_llm
+        if use_llm and not self.deadline.fits(self.llm_estimate, reserve=self.assemble_estimate):
+            self.deadline.degrade("rule_narrative", f"剩余预算不足以完成大模型润色（预计 {self.llm_estimate:g}s）")
+            use_llm = False
+        if use_llm:
+            llm_start = time.perf_counter()
+            timeout = self.deadline.remaining() - self.assemble_estimate if self.deadline.enabled else None
+            timeout = max(timeout, 0) if timeout is not None else None
+            # 剩余预算同时作为 HTTP 超时传给客户端，超出预算的请求在客户端侧自行结束
+            http_timeout = max(timeout, 1.0) if timeout is not None else None
+            # 专用线程池：task.cancel() 无法中断已在执行的线程，asyncio.run 退出时会等待默认线程池，
+            # 因此不用 asyncio.to_thread；超出预算后 shutdown(wait=False) 直接返回，不等待未完成的请求
+            executor = ThreadPoolExecutor(max_workers=len(POLISH_FIELDS), thread_name_prefix="polish")
+            loop = asyncio.get_running_loop()
+            try:
+                tasks = {loop.run_in_executor(executor, functools.partial(
+                    contextvars.copy_context().run, self._polish, f, narrative[f], http_timeout)): f
+                    for f in POLISH_FIELDS}
+                # 超出预算仍未返回的字段直接使用规则文本（后台线程的结果被丢弃）
+                done, pending = await asyncio.wait(tasks, timeout=timeout)
+                for task in pending:
+                    task.cancel()
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+            if pending:
+                self.deadline.degrade("rule_narrative", f"{len(pending)} 个字段的大模型响应超出剩余预算")
+            for task in done:
+                field = tasks[task]
+                polished = task.exception() or task.result()
+                if isinstance(polished, Exception):
+                    print(f"[WARN] {field} 润色失败，使用规则文本: {polished}")
+                elif polished and counts_preserved(narrative[field], polished):
+                    data[field] = polished
+                    self.narrative_source[field] = "llm"
+                else:
+                    print(f"[WARN] {field} 润色结果改动了统计数量，使用规则文本")
+            self.timings["llm"] = time.perf_counter() - llm_start
+        data["narrative_mode"] = "fill"
+        self.timings["narrative_branch"] = time.perf_counter() - start
+        self._emit("narrative", sources=dict(self.narrative_source))
+        return data
+
+    # ---------------------
+    # 分支二：照片预处理
+    # ---------------------
+    async def _image_branch(self, photo_dir: str, pool) -> dict:
+        """返回 {原图绝对路径: JPEG 字节串}；标注失败或被跳过的照片不在其中，插图时回落到原图"""
+        start = time.perf_counter()
+        if not photo_dir or not self.annotate:
+            self.timings["image_branch"] = 0.0
+            return {}
+        photos = _list_photos(photo_dir)
+        full_estimate = len(photos) * self.image_cost / self.max_workers
+        max_side = None
+        if not self.deadline.fits(full_estimate, reserve=self.assemble_estimate):
+            # 缩小后标注的耗时约为全分辨率的三分之一
+            if self.deadline.fits(full_estimate * 0.35, reserve=self.assemble_estimate):
+                self.deadline.degrade("low_resolution", f"照片缩小到最长边 {self.low_res_side}px 后标注")
+                max_side = self.low_res_side
+            else:
+                self.deadline.degrade("skip_annotation", "剩余预算不足以标注照片，直接插入原图")
+                self.timings["image_branch"] = time.perf_counter() - start
+                return {}
+        loop = asyncio.get_running_loop()
+        jobs = [loop.run_in_executor(pool, _render_one, photo, self.min_area, max_side) for photo in photos]
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        images = {os.path.abspath(p): r for p, r in zip(photos, results) if not isinstance(r, Exception)}
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            print(f"[WARN] {len(failed)} 张照片标注失败（插入原图），首个错误: {failed[0]}")
+        self.timings["image_branch"] = time.perf_counter() - start
+        self._emit("images", photos=len(results), failed=len(failed))
+        return images
+
+    # ---------------------
+    # 汇合：docx 组装
+    # ---------------------
+    async def run(self, excel: str, template: str, photo_dir: str = None, data: dict = None) -> dict:
+        os.makedirs(self.workdir, exist_ok=True)
+        # 本任务的路径通过 JobContext 传给工具函数，同一进程内可并发运行多个流水线
+        job = current_job().replace(excel_path=excel, template_path=template, static_dir=photo_dir,
+                                    output_dir=self.workdir)
+        with job.activate():
+            return await self._run(excel, template, photo_dir, data)
+
+    async def _run(self, excel, template, photo_dir, data):
+        from Tool.word_tool import create_complete_report
+        from Tool.word_Imagetool import insert_images
+
+        start = time.perf_counter()
+        owned = self.pool is None
+        with (ProcessPoolExecutor(max_workers=self.max_workers) if owned else nullcontext(self.pool)) as pool:
+            image_task = asyncio.create_task(self._image_branch(photo_dir, pool))
+            data = await self._narrative_branch(excel, data or {})
+
+            # 叙述就绪即可生成未插图的 docx，此时照片分支可能仍在进行
+            assemble_start = time.perf_counter()
+            report_path = os.path.join(self.workdir, "桥梁支座检查报告.docx")
+            report_path = await asyncio.to_thread(create_complete_report.invoke, {
+                "output_path": report_path, "data": data, "template_path": template,
+            })
+            self._emit("report", path=report_path)
+            images = await image_task
+
+        final_path = report_path
+        if photo_dir:
+            final_path = await asyncio.to_thread(
+                insert_images, report_path, os.path.join(self.workdir, "桥梁支座检查报告_插图.docx"),
+                photo_dir, images)
+        self.timings["assemble"] = time.perf_counter() - assemble_start
+        self.timings["total"] = time.perf_counter() - start
+        self._emit("final", path=final_path)
+        result = {"report": report_path, "final": final_path, "timings": dict(self.timings),
+                  "narrative_source": dict(self.narrative_source)}
+        if self.deadline.enabled:
+            result["metadata"] = self.deadline.write_metadata(final_path, extra={
+                "narrative_source": result["narrative_source"], "timings": result["timings"]})
+            result["degradations"] = [d["name"] for d in self.deadline.degradations]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发生成桥梁支座检查报告")
+    parser.add_argument("--workdir", default="build")
+    parser.add_argument("--excel", default=os.getenv("REFER_FILE_OUT_PATH"))
+    parser.add_argument("--photos", default=os.getenv("STATIC_DIR"))
+    parser.add_argument("--template", default=os.getenv("TEMPLATE_REPORT_PATH"))
+    parser.add_argument("--project-name", default="厦门轨道后溪站-车辆段")
+    parser.add_argument("--no-llm", action="store_true")
+    parser.add_argument("--no-annotate", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--deadline", type=float, default=None, help="墙钟截止时间（秒），预算不足时自动降级")
+    args = parser.parse_args()
+
+    pipeline = AsyncReportPipeline(args.workdir, use_llm=not args.no_llm, annotate=not args.no_annotate,
+                                   max_workers=args.workers, deadline=DeadlineBudget(args.deadline))
+    result = asyncio.run(pipeline.run(args.excel, args.template, args.photos, {"project_name": args.project_name}))
+    t = result["timings"]
+    print(f"最终报告: {result['final']}")
+    print(f"叙述分支 {t.get('narrative_branch', 0):.2f}s（其中大模型 {t.get('llm', 0):.2f}s），"
+          f"照片分支 {t.get('image_branch', 0):.2f}s，组装 {t.get('assemble', 0):.2f}s，总计 {t['total']:.2f}s")
+    if result.get("degradations"):
+        print(f"已降级: {'、'.join(result['degradations'])}（详见 {result['metadata']}）")
+
+
+if __name__ == "__main__":
+    main()
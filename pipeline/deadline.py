@@ -0,0 +1,67 @@
+import json
+import math
+import time
+
+
+class DeadlineBudget:
+    """
+    报告生成的墙钟截止时间预算。
+
+    各阶段开始前用 fits(预计耗时) 判断剩余时间是否充足；不足时由调用方降级
+    （规则叙述代替大模型、降低图片分辨率、跳过标注），并通过 degrade() 记录，
+    最终写入输出元数据，便于事后区分“完整报告”与“降级报告”。
+    """
+
+    def __init__(self, seconds: float = None, safety: float = 1.2):
+        self.seconds = seconds
+        self.safety = safety  # 预计耗时的放大系数，留出余量
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.degradations = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.seconds is not None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        if not self.enabled:
+            return math.inf
+        return self.seconds - self.elapsed()
+
+    def fits(self, estimate: float, reserve: float = 0.0) -> bool:
+        """预计耗时（含放大系数）加上需为后续阶段预留的时间是否在剩余预算内"""
+        return estimate * self.safety + reserve <= self.remaining()
+
+    def degrade(self, name: str, reason: str):
+        self.degradations.append({"name": name, "reason": reason, "at": round(self.elapsed(), 3)})
+        print(f"[Deadline] 降级：{name}（{reason}，剩余 {self.remaining():.1f}s）")
+
+    def metadata(self) -> dict:
+        return {
+            "deadline_seconds": self.seconds,
+            "started_at": self.started_at,
+            "elapsed": round(self.elapsed(), 3),
+            "met": (not self.enabled) or self.remaining() >= 0,
+            "degradations": list(self.degradations),
+        }
+
+    def write_metadata(self, docx_path: str, extra: dict = None) -> str:
+        """
+        写入输出元数据：与 docx 同名的 .json 旁路文件，并在 docx 文档属性（备注）中标注已应用的降级
+        返回: 旁路文件路径
+        """
+        meta = self.metadata()
+        meta.update(extra or {})
+        sidecar = docx_path + ".json"
+        with open(sidecar, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        if self.degradations:
+            from docx import Document
+            doc = Document(docx_path)
+            names = "、".join(d["name"] for d in self.degradations)
+            doc.core_properties.comments = f"截止时间 {self.seconds:g}s 内生成，已降级：{names}"
+            doc.save(docx_path)
+        return sidecar
@@ -0,0 +1,94 @@
+import contextvars
+import os
+from contextlib import contextmanager
+
+_active_job = contextvars.ContextVar("active_report_job", default=None)
+
+
+class JobContext:
+    """
+    一次报告任务的路径与设置。
+
+    工具函数通过 current_job() 读取，而不是直接读进程级的 os.environ，
+    同一进程内并发的多个任务各自 activate() 自己的上下文，互不干扰。
+    contextvars 随 asyncio 任务与 asyncio.to_thread 传递；
+    直接提交到线程池的函数需用 contextvars.copy_context().run 包装。
+
+    参数:
+        excel_path: 格式化后的缺陷五列表（REFER_FILE_OUT_PATH）
+        raw_excel_path: 原始缺陷汇总表（REFER_FILE_PATH / RAW_REPORT_PATH）
+        raw_report_path: 缺陷统计报告文本（RAW_REPORT_PATH，generate_bridge_report 的输入）
+        template_path: 报告模板（TEMPLATE_REPORT_PATH）
+        static_dir: 现场照片目录（STATIC_DIR）
+        output_dir: 报告输出目录
+        narrative_mode: 叙述字段生成方式 fill / rule / off（NARRATIVE_MODE）
+        settings: 其余任务级设置
+    """
+
+    FIELDS = ("excel_path", "raw_excel_path", "raw_report_path", "template_path", "static_dir", "output_dir",
+              "narrative_mode")
+
+    def __init__(self, excel_path: str = None, raw_excel_path: str = None, template_path: str = None,
+                 static_dir: str = "static", output_dir: str = ".", narrative_mode: str = "fill",
+                 settings: dict = None, raw_report_path: str = None):
+        self.excel_path = excel_path
+        self.raw_excel_path = raw_excel_path
+        self.raw_report_path = raw_report_path
+        self.template_path = template_path
+        self.static_dir = static_dir
+        self.output_dir = output_dir
+        self.narrative_mode = narrative_mode
+        self.settings = dict(settings or {})
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """从环境变量（.env）构造，overrides 中非 None 的值优先"""
+        job = cls(
+            excel_path=os.getenv("REFER_FILE_OUT_PATH"),
+            raw_excel_path=os.getenv("REFER_FILE_PATH") or os.getenv("RAW_REPORT_PATH"),
+            raw_report_path=os.getenv("RAW_REPORT_PATH"),
+            template_path=os.getenv("TEMPLATE_REPORT_PATH"),
+            static_dir=os.getenv("STATIC_DIR") or "static",
+            output_dir=os.getenv("REPORT_OUTPUT_DIR") or ".",
+            narrative_mode=os.getenv("NARRATIVE_MODE") or "fill",
+        )
+        return job.replace(**overrides)
+
+    def replace(self, **overrides):
+        """复制一份并覆盖指定字段（值为 None 的字段保持不变）"""
+        values = {name: getattr(self, name) for name in self.FIELDS}
+        settings = dict(self.settings)
+        for key, value in overrides.items():
+            if value is None:
+                continue
+            if key == "settings":
+                settings.update(value)
+            elif key in values:
+                values[key] = value
+            else:
+                raise TypeError(f"JobContext 不支持的字段: {key}")
+        return JobContext(settings=settings, **values)
+
+    def output_path(self, filename: str) -> str:
+        return os.path.abspath(os.path.join(self.output_dir, filename))
+
+    def as_dict(self) -> dict:
+        return dict({name: getattr(self, name) for name in self.FIELDS}, settings=dict(self.settings))
+
+    @contextmanager
+    def activate(self):
+        """在此上下文中调用的工具使用本任务的路径与设置"""
+        token = _active_job.set(self)
+        try:
+            yield self
+        finally:
+            _active_job.reset(token)
+
+    def __repr__(self):
+        return f"JobContext({self.as_dict()})"
+
+
+def current_job() -> JobContext:
+    """当前上下文中激活的任务；未激活时按环境变量构造（兼容原有单任务用法）"""
+    job = _active_job.get()
+    return job if job is not None else JobContext.from_env()
@@ -0,0 +1,155 @@
+import contextvars
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+# 报告流水线的阶段（按执行顺序）及各阶段产物文件名
+STAGES = ["ingest", "narrative", "report", "images"]
+STAGE_OUTPUTS = {
+    "ingest": "defects.json",          # 规范化的缺陷五列表（table31 / table32）
+    "narrative": "narrative.json",     # 叙述字段 data 字典（大模型或规则生成）
+    "report": "report.docx",           # 未插图的报告
+    "images": "report_插图.docx",       # 插图后的最终报告
+}
+
+_active_run = contextvars.ContextVar("active_report_run", default=None)
+
+
+def current_run():
+    """当前上下文中激活的运行（未激活时为 None），供工具函数登记阶段产物"""
+    return _active_run.get()
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ReportRun:
+    """
+    一次报告生成的检查点目录。
+
+    每个阶段完成后把产物写入运行目录并登记到 manifest.json；
+    --resume 时从第一个未完成（或产物丢失/被改动）的阶段继续，已完成阶段直接读取产物，
+    避免图片插入或保存失败后重跑前面的大模型调用。
+    """
+
+    def __init__(self, run_dir: str):
+        self.run_dir = os.path.abspath(run_dir)
+        self.manifest_path = os.path.join(self.run_dir, "manifest.json")
+        os.makedirs(self.run_dir, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"run_id": os.path.basename(self.run_dir), "created": time.time(), "stages": {}}
+            self._save()
+
+    @staticmethod
+    def root_dir(root: str = None) -> str:
+        return os.path.abspath(root or os.getenv("REPORT_RUNS_DIR") or "runs")
+
+    @classmethod
+    def create(cls, root: str = None, run_id: str = None):
+        """
+        新建运行目录。指定 run_id 时沿用该目录；否则以秒级时间戳命名，
+        同一秒内已有运行时依次追加 -01、-02… 后缀（exist_ok=False 原子占用目录，多进程并发也不会共用）
+        """
+        root = cls.root_dir(root)
+        if run_id:
+            return cls(os.path.join(root, run_id))
+        os.makedirs(root, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        for n in range(1000):
+            run_dir = os.path.join(root, f"{stamp}-{n:02d}" if n else stamp)
+            try:
+                os.makedirs(run_dir, exist_ok=False)
+            except FileExistsError:
+                continue
+            return cls(run_dir)
+        raise RuntimeError(f"无法在 {root} 下创建运行目录：{stamp} 的后缀已用尽")
+
+    @classmethod
+    def latest(cls, root: str = None):
+        """最近一次运行（按目录名排序），不存在时返回 None"""
+        root = cls.root_dir(root)
+        if not os.path.isdir(root):
+            return None
+        runs = sorted(d for d in os.listdir(root) if os.path.exists(os.path.join(root, d, "manifest.json")))
+        return cls(os.path.join(root, runs[-1])) if runs else None
+
+    def _save(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    # ---------------------
+    # 阶段状态
+    # ---------------------
+    def path(self, stage: str) -> str:
+        """阶段产物在运行目录中的路径"""
+        return os.path.join(self.run_dir, STAGE_OUTPUTS[stage])
+
+    def is_done(self, stage: str) -> bool:
+        """阶段已登记完成，且产物仍存在、内容未被改动"""
+        entry = self.manifest["stages"].get(stage)
+        if not entry or entry.get("status") != "done":
+            return False
+        path = os.path.join(self.run_dir, entry["output"])
+        return os.path.exists(path) and _sha256(path) == entry.get("sha256")
+
+    def first_incomplete(self):
+        for stage in STAGES:
+            if not self.is_done(stage):
+                return stage
+        return None
+
+    def mark_done(self, stage: str, path: str = None) -> str:
+        """登记阶段完成；path 不在运行目录时复制进来。返回运行目录中的产物路径"""
+        target = self.path(stage)
+        if path and os.path.abspath(path) != target:
+            shutil.copyfile(path, target)
+        self.manifest["stages"][stage] = {
+            "status": "done",
+            "output": os.path.basename(target),
+            "sha256": _sha256(target),
+            "finished": time.time(),
+        }
+        # 上游阶段重做后，下游产物作废
+        for later in STAGES[STAGES.index(stage) + 1:]:
+            self.manifest["stages"].pop(later, None)
+        self._save()
+        return target
+
+    def mark_failed(self, stage: str, error: Exception):
+        self.manifest["stages"][stage] = {"status": "failed", "error": f"{type(error).__name__}: {error}",
+                                          "finished": time.time()}
+        self._save()
+
+    # ---------------------
+    # 产物读写
+    # ---------------------
+    def save_json(self, stage: str, obj) -> str:
+        with open(self.path(stage), "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2, default=str)
+        return self.mark_done(stage)
+
+    def load_json(self, stage: str):
+        with open(self.path(stage), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @contextmanager
+    def activate(self):
+        """在此上下文中调用的工具（create_complete_report、insert_images_to_docx）会把产物登记到本运行"""
+        token = _active_run.set(self)
+        try:
+            yield self
+        finally:
+            _active_run.reset(token)
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+内容寻址的阶段 DAG：像 make 一样只重建输入发生变化的阶段。
+
+每个阶段声明输入文件、输出文件和参数；指纹 = 输入文件内容哈希 + 参数 + 阶段版本。
+指纹未变且输出仍是上次生成的内容时跳过；上游重建后输出内容变化，下游指纹随之变化而重建。
+文件哈希按 (路径, 大小, mtime_ns) 缓存在状态文件中，未改动的照片不重复读取。
+
+用法：
+    python pipeline/stage_dag.py --raw-excel static/城场站-双过村轨道桥梁支座缺陷汇总表.xlsx --photos static --workdir build
+    python pipeline/stage_dag.py --excel static/总结.xlsx --photos static --workdir build --dry-run
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from pipeline.job_context import current_job
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+class Stage:
+    """
+    DAG 中的一个阶段
+    参数:
+        name: 阶段名（唯一）
+        fn: 执行函数，fn(stage) 负责写出全部 outputs
+        inputs: 输入文件路径列表（可以是其他阶段的输出）
+        outputs: 输出文件路径列表
+        params: 影响输出的参数（参与指纹计算）
+        version: 阶段实现版本，修改处理逻辑时递增以强制重建
+    """
+
+    def __init__(self, name, fn, inputs=(), outputs=(), params=None, version="1"):
+        self.name = name
+        self.fn = fn
+        self.inputs = [os.path.abspath(p) for p in inputs]
+        self.outputs = [os.path.abspath(p) for p in outputs]
+        self.params = params or {}
+        self.version = version
+
+
+class StageDAG:
+    def __init__(self, state_path: str):
+        self.state_path = os.path.abspath(state_path)
+        self.stages = {}
+        self._state = {"stages": {}, "files": {}}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def add(self, stage: Stage) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError(f"阶段重名: {stage.name}")
+        self.stages[stage.name] = stage
+        return stage
+
+    # ---------------------
+    # 哈希与指纹
+    # ---------------------
+    def file_hash(self, path: str):
+        """文件内容哈希（按大小与修改时间缓存）；文件不存在返回 None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        cached = self._state["files"].get(path)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self._state["files"][path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def fingerprint(self, stage: Stage) -> str:
+        missing = [p for p in stage.inputs if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"阶段 {stage.name} 的输入不存在: {missing[0]}")
+        payload = {
+            "version": stage.version,
+            "params": stage.params,
+            "inputs": [[p, self.file_hash(p)] for p in stage.inputs],
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def is_up_to_date(self, stage: Stage) -> bool:
+        record = self._state["stages"].get(stage.name)
+        if not record or record.get("fingerprint") != self.fingerprint(stage):
+            return False
+        # 输出被删除或被外部改动时也需重建
+        return all(self.file_hash(p) == record["outputs"].get(p) for p in stage.outputs)
+
+    # ---------------------
+    # 拓扑排序与执行
+    # ---------------------
+    def order(self, targets=None):
+        """按依赖（输入文件由哪个阶段产出）拓扑排序；targets 指定时只包含其上游"""
+        producer = {out: s.name for s in self.stages.values() for out in s.outputs}
+        deps = {name: {producer[p] for p in s.inputs if p in producer} for name, s in self.stages.items()}
+        ordered, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段存在循环依赖: {name}")
+            visiting.add(name)
+            for dep in sorted(deps[name]):
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(self.stages[name])
+
+        for name in (targets or self.stages):
+            visit(name)
+        return ordered
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.state_path)
+
+    def run(self, targets=None, force=False, dry_run=False) -> dict:
+        """
+        执行 DAG，返回 {"built": [...], "skipped": [...], "timings": {阶段: 秒}}
+        force=True 时忽略指纹全部重建；dry_run=True 时只报告需要重建的阶段
+        """
+        report = {"built": [], "skipped": [], "timings": {}}
+        for stage in self.order(targets):
+            if not force and self.is_up_to_date(stage):
+                report["skipped"].append(stage.name)
+                continue
+            if dry_run:
+                report["built"].append(stage.name)
+                continue
+            start = time.perf_counter()
+            for out in stage.outputs:
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+            stage.fn(stage)
+            missing = [p for p in stage.outputs if not os.path.exists(p)]
+            if missing:
+                raise RuntimeError(f"阶段 {stage.name} 未生成输出: {missing[0]}")
+            self._state["stages"][stage.name] = {
+                "fingerprint": self.fingerprint(stage),
+                "outputs": {p: self.file_hash(p) for p in stage.outputs},
+                "finished": time.time(),
+            }
+            # 每个阶段完成即落盘，中途失败时已完成的阶段不必重做
+            self._save_state()
+            report["built"].append(stage.name)
+            report["timings"][stage.name] = time.perf_counter() - start
+        if not dry_run:
+            self._save_state()
+        return report
+
+
+# ============================================================
+# 报告工作流：格式化 Excel → 统计文本 → 逐张标注照片 → 生成 docx → 插图
+# ============================================================
+def _format_excel(stage):
+    from handle_fault import process_excel
+    process_excel(stage.inputs[0], stage.outputs[0])
+
+
+def _stats_text(stage):
+    from baogao import generate_report
+    generate_report(stage.inputs[0], stage.outputs[0])
+
+
+def _annotate_photo(stage):
+    from tool_1.refer_tool import _annotate
+    _annotate(stage.inputs[0], stage.outputs[0], stage.params["min_area"])
+
+
+def _build_report(stage):
+    from Tool.excel_reader_tool import read_filtered_tables
+    from Tool.word_tool import create_complete_report
+    tables = read_filtered_tables(stage.inputs[0])
+    data = dict(stage.params["data"])
+    data["table31"] = tables["table31"]
+    data["table32"] = tables["table32"]
+    data["excel_filtered_table"] = "\n".join(list(tables["table31"]) + list(tables["table32"]))
+    data["narrative_mode"] = "rule"
+    create_complete_report.invoke({
+        "output_path": stage.outputs[0],
+        "data": data,
+        "template_path": stage.inputs[1],
+    })
+
+
+def _insert_images(stage):
+    from Tool.word_Imagetool import insert_images_to_docx
+    insert_images_to_docx.invoke({
+        "template_path": stage.inputs[0],
+        "output_path": stage.outputs[0],
+        "static_dir": stage.params["photo_dir"],
+    })
+
+
+def _list_photos(photo_dir: str, exclude=()):
+    exclude = [os.path.abspath(e) for e in exclude]
+    photos = []
+    for root, dirs, files in os.walk(photo_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) not in exclude
+                         and not d.startswith("_"))
+        for fname in sorted(files):
+            if fname.lower().endswith(IMAGE_EXTS):
+                photos.append(os.path.join(root, fname))
+    return photos
+
+
+def build_report_dag(workdir, excel=None, raw_excel=None, photo_dir=None, template=None,
+                     data=None, annotate=True, min_area=1200) -> StageDAG:
+    """
+    构建报告工作流 DAG
+    参数:
+        workdir: 中间产物与状态文件目录
+        excel: 已格式化的五列表（不提供时由 raw_excel 经 handle_fault 生成）
+        raw_excel: 原始缺陷汇总表
+        photo_dir: 现场照片目录（逐张建立标注阶段）
+        template: 报告模板（不提供时取当前任务的模板，即 TEMPLATE_REPORT_PATH）
+        data: 报告基本信息（project_name 等），叙述字段由规则生成
+        annotate: False 时跳过标注，直接用原始照片插图
+    """
+    workdir = os.path.abspath(workdir)
+    dag = StageDAG(os.path.join(workdir, ".stage_state.json"))
+
+    if raw_excel:
+        excel = os.path.join(workdir, "总结.xlsx")
+        dag.add(Stage("format", _format_excel, inputs=[raw_excel], outputs=[excel]))
+    if not excel:
+        raise ValueError("需要提供 excel（五列表）或 raw_excel（原始缺陷汇总表）")
+    template = template or current_job().template_path
+    if not template or not os.path.exists(template):
+        raise ValueError(f"需要提供存在的报告模板 template（--template 或 TEMPLATE_REPORT_PATH），当前为：{template}")
+
+    dag.add(Stage("stats", _stats_text, inputs=[excel], outputs=[os.path.join(workdir, "缺陷统计报告.txt")]))
+    dag.add(Stage("report", _build_report, inputs=[excel, template],
+                  outputs=[os.path.join(workdir, "桥梁支座检查报告.docx")], params={"data": data or {}}))
+
+    if photo_dir:
+        annotated_dir = os.path.join(workdir, "annotated")
+        photo_outputs = []
+        for photo in _list_photos(photo_dir, exclude=[workdir]):
+            rel = os.path.relpath(photo, photo_dir)
+            if annotate:
+                out = os.path.join(annotated_dir, rel)
+                dag.add(Stage(f"annotate:{rel}", _annotate_photo, inputs=[photo], outputs=[out],
+                              params={"min_area": min_area}))
+                photo_outputs.append(out)
+            else:
+                photo_outputs.append(photo)
+        dag.add(Stage("images", _insert_images,
+                      inputs=[os.path.join(workdir, "桥梁支座检查报告.docx")] + photo_outputs,
+                      outputs=[os.path.join(workdir, "桥梁支座检查报告_插图.docx")],
+                      params={"photo_dir": annotated_dir if annotate else os.path.abspath(photo_dir)}))
+    return dag
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量构建桥梁支座检查报告（只重建输入变化的阶段）")
+    parser.add_argument("--workdir", default="build")
+    parser.add_argument("--excel", default=os.getenv("REFER_FILE_OUT_PATH"))
+    parser.add_argument("--raw-excel", default=None)
+    parser.add_argument("--photos", default=os.getenv("STATIC_DIR"))
+    parser.add_argument("--template", default=os.getenv("TEMPLATE_REPORT_PATH"))
+    parser.add_argument("--project-name", default="厦门轨道后溪站-车辆段")
+    parser.add_argument("--no-annotate", action="store_true")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    dag = build_report_dag(args.workdir, excel=args.excel, raw_excel=args.raw_excel, photo_dir=args.photos,
+                           template=args.template, data={"project_name": args.project_name},
+                           annotate=not args.no_annotate)
+    report = dag.run(force=args.force, dry_run=args.dry_run)
+    print(f"{'需重建' if args.dry_run else '已重建'} {len(report['built'])} 个阶段，跳过 {len(report['skipped'])} 个")
+    for name in report["built"]:
+        timing = report["timings"].get(name)
+        print(f"  {name}" + (f"  {timing:.2f}s" if timing is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+常驻报告生成服务：进程启动时一次性完成导入与预热，之后每份报告只做真正的工作。
+
+预热内容：langchain / pandas / openpyxl / python-docx / cv2 导入与 .env 加载、模板摘要、
+照片目录索引、标注进程池（子进程内的字体等缓存随之常驻）、大模型客户端（HTTP 连接池）
+以及可选的智能体执行器。
+
+接口（本地 HTTP，JSON）：
+    POST /jobs                 提交任务，返回 {"id", "status"}；并发数与排队数受限，排队已满时返回 503
+    GET  /jobs/<id>            任务状态与结果（已结束的任务保留 job_ttl 秒、至多 max_finished_jobs 个，之后返回 404）
+    GET  /jobs/<id>/events     进度流（NDJSON，每行一个事件，任务结束后关闭连接）
+    GET  /health               预热状态、运行中/排队任务数
+
+任务参数（均可省略，缺省取 .env）：
+    excel, template, photos, project_name, mode ("pipeline" | "agent"), use_llm, annotate,
+    insert_images, deadline（秒）
+
+用法：
+    python pipeline/worker_service.py --port 8765 --concurrency 2
+    curl -X POST localhost:8765/jobs -d '{"project_name": "厦门轨道后溪站-车辆段", "use_llm": false}'
+    curl -N localhost:8765/jobs/<id>/events
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from pipeline.deadline import DeadlineBudget
+from pipeline.job_context import JobContext
+
+AGENT_SCRIPT = os.path.join(ROOT, "Agent", "01-桥梁支座检查报告agent.py")
+
+
+def _warm_child() -> int:
+    """在标注子进程中预先导入 cv2 / PIL 等依赖"""
+    import tool_1.refer_tool as refer_tool
+    bool(refer_tool.cv2) and bool(refer_tool.Image)  # 模块内为延迟导入，这里触发真正的导入
+    return os.getpid()
+
+
+class ReportJob:
+    """一个报告任务：参数、状态与进度事件（事件列表只追加，供多个订阅者回放）"""
+
+    def __init__(self, params: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished_at = None
+        self.events = []
+        self._cond = threading.Condition()
+        self.emit({"event": "queued"})
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, event: dict):
+        event = dict(event, job=self.id, t=round(time.time() - self.created, 3))
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def finish(self, status: str, result=None, error: str = None):
+        self.status, self.result, self.error = status, result, error
+        self.finished_at = time.time()
+        self.emit({"event": status, "result": result, "error": error})
+
+    def stream(self, timeout: float = 15.0):
+        """逐个产出事件；任务结束且事件发送完毕后停止。等待超过 timeout 时产出 None（心跳）"""
+        index = 0
+        while True:
+            with self._cond:
+                if index >= len(self.events) and not self.finished:
+                    self._cond.wait(timeout)
+                pending = self.events[index:]
+                done = self.finished
+            if not pending and not done:
+                yield None
+            for event in pending:
+                yield event
+            index += len(pending)
+            if done and index >= len(self.events):
+                return
+
+    def summary(self) -> dict:
+        return {"id": self.id, "status": self.status, "params": self.params,
+                "result": self.result, "error": self.error, "events": len(self.events)}
+
+
+class ReportWorker:
+    """
+    常驻报告工作进程
+    参数:
+        jobs_dir: 任务输出目录（每个任务一个子目录）
+        concurrency: 同时执行的任务数
+        max_queue: 排队任务上限（超出时拒绝）
+        annotate_workers: 标注进程池大小（所有任务共享）
+        warm_llm: 启动时即创建大模型客户端
+        warm_agent: 启动时即构建智能体执行器（mode=agent 的任务使用）
+        job_ttl: 已结束任务（及其事件记录）在内存中保留的秒数
+        max_finished_jobs: 内存中最多保留的已结束任务数（超出时先移除最早结束的）
+    """
+
+    def __init__(self, jobs_dir: str = "jobs", concurrency: int = 2, max_queue: int = 16,
+                 annotate_workers: int = None, warm_llm: bool = False, warm_agent: bool = False,
+                 job_ttl: float = 3600.0, max_finished_jobs: int = 200):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.job_ttl = job_ttl
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}
+        self.warm_state = {}
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="report-job")
+        self.annotate_workers = annotate_workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=self.annotate_workers)
+        self._lock = threading.Lock()
+        self._agent_lock = threading.Lock()  # 智能体执行器的 scratchpad 有状态，agent 任务串行执行
+        self._chat_model = None
+        self._agent_module = None
+        self._agent_executor = None
+        self.warm(warm_llm=warm_llm, warm_agent=warm_agent)
+
+    # ---------------------
+    # 预热
+    # ---------------------
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+            self.warm_state[name] = round(time.perf_counter() - start, 3)
+        except Exception as e:
+            self.warm_state[name] = f"failed: {type(e).__name__}: {e}"
+            print(f"[WARN] 预热 {name} 失败: {e}")
+
+    def warm(self, warm_llm: bool = False, warm_agent: bool = False):
+        job = JobContext.from_env()
+
+        def imports():
+            import cv2  # noqa: F401
+            import pandas  # noqa: F401
+            import Tool.word_tool  # noqa: F401  （同时加载 .env）
+            import Tool.word_Imagetool  # noqa: F401
+            import Tool.excel_reader_tool  # noqa: F401
+            import pipeline.async_orchestrator  # noqa: F401
+
+        def template():
+            from Tool.template_digest import load_template_digest
+            if job.template_path and os.path.exists(job.template_path):
+                load_template_digest(job.template_path)
+
+        def photos():
+            from Tool.word_Imagetool import photo_catalog
+            if job.static_dir and os.path.isdir(job.static_dir):
+                photo_catalog(job.static_dir)
+
+        def pool():
+            # 提前拉起子进程并导入标注依赖
+            futures = [self._pool.submit(_warm_child) for _ in range(self.annotate_workers)]
+            for f in futures:
+                f.result()
+
+        self._timed("imports", imports)
+        self._timed("template", template)
+        self._timed("photo_catalog", photos)
+        self._timed("annotate_pool", pool)
+        if warm_llm or warm_agent:
+            self._timed("chat_model", lambda: self.chat_model)
+        if warm_agent:
+            self._timed("agent", lambda: self.agent_executor)
+
+    @property
+    def chat_model(self):
+        with self._lock:
+            if self._chat_model is None:
+                from Model.mychat_doubao import MyChatModel
+                self._chat_model = MyChatModel()
+            return self._chat_model
+
+    @property
+    def agent_module(self):
+        # 智能体脚本文件名含中文与连字符，按路径加载
+        with self._lock:
+            if self._agent_module is None:
+                spec = importlib.util.spec_from_file_location("wukong_report_agent", AGENT_SCRIPT)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self._agent_module = module
+            return self._agent_module
+
+    @property
+    def agent_executor(self):
+        module = self.agent_module
+        with self._lock:
+            if self._agent_executor is None:
+                self._agent_executor = module.build_agent_executor()
+            return self._agent_executor
+
+    # ---------------------
+    # 任务
+    # ---------------------
+    def _evict_finished(self):
+        """移除超过保留时间或超出保留数量的已结束任务（调用方持有 self._lock；输出文件保留在 jobs_dir）"""
+        now = time.time()
+        finished = sorted((j for j in self.jobs.values() if j.finished), key=lambda j: j.finished_at)
+        expired = [j for j in finished if now - j.finished_at > self.job_ttl]
+        kept = [j for j in finished if now - j.finished_at <= self.job_ttl]
+        expired += kept[:max(0, len(kept) - self.max_finished_jobs)]
+        for job in expired:
+            del self.jobs[job.id]
+
+    def submit(self, params: dict) -> ReportJob:
+        with self._lock:
+            self._evict_finished()
+            waiting = sum(1 for j in self.jobs.values() if j.status == "queued")
+            if waiting >= self.max_queue:
+                raise OverflowError(f"排队任务已满（{self.max_queue}）")
+            job = ReportJob(params)
+            self.jobs[job.id] = job
+        self._executor.submit(self._run_job, job)
+        return job
+
+    def _job_context(self, job: ReportJob, job_dir: str) -> JobContext:
+        p = job.params
+        return JobContext.from_env(excel_path=p.get("excel"), template_path=p.get("template"),
+                                   static_dir=p.get("photos"), output_dir=job_dir)
+
+    def _run_job(self, job: ReportJob):
+        job.status = "running"
+        job.emit({"event": "started"})
+        job_dir = os.path.join(self.jobs_dir, job.id)
+        os.makedirs(job_dir, exist_ok=True)
+        try:
+            ctx = self._job_context(job, job_dir)
+            if job.params.get("mode", "pipeline") == "agent":
+                result = self._run_agent(job, ctx, job_dir)
+            else:
+                result = self._run_pipeline(job, ctx, job_dir)
+            job.finish("done", result=result)
+        except Exception as e:
+            traceback.print_exc()
+            job.finish("failed", error=f"{type(e).__name__}: {e}")
+
+    def _run_pipeline(self, job: ReportJob, ctx: JobContext, job_dir: str) -> dict:
+        from pipeline.async_orchestrator import AsyncReportPipeline
+        p = job.params
+        use_llm = bool(p.get("use_llm", True))
+        pipeline = AsyncReportPipeline(
+            job_dir, use_llm=use_llm, annotate=bool(p.get("annotate", True)),
+            chat_model=self.chat_model if use_llm else None, pool=self._pool, progress=job.emit,
+            deadline=DeadlineBudget(p.get("deadline")),
+        )
+        data = {"project_name": p.get("project_name") or "厦门轨道后溪站-车辆段"}
+        photos = ctx.static_dir if p.get("insert_images", True) else None
+        result = asyncio.run(pipeline.run(ctx.excel_path, ctx.template_path, photos, data))
+        return {k: v for k, v in result.items() if k in ("final", "timings", "narrative_source", "degradations")}
+
+    def _run_agent(self, job: ReportJob, ctx: JobContext, job_dir: str) -> dict:
+        p = job.params
+        executor = self.agent_executor
+        # 执行器常驻复用：scratchpad 保存的完整工具输出按任务清空，不跨任务累积或串用
+        scratchpad = getattr(executor, "trim_intermediate_steps", None)
+        reset = getattr(scratchpad, "reset", None)
+        with self._agent_lock, ctx.activate():
+            job.emit({"event": "agent"})
+            if reset:
+                reset()
+            try:
+                final = self.agent_module.run_report_pipeline(
+                    use_llm=bool(p.get("use_llm", True)), insert_images=bool(p.get("insert_images", True)),
+                    run_dir=os.path.join(job_dir, "run"), agent_executor=executor,
+                )
+            finally:
+                if reset:
+                    reset()
+        return {"final": final}
+
+    def health(self) -> dict:
+        with self._lock:
+            self._evict_finished()
+        counts = {}
+        for job in list(self.jobs.values()):
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"warm": self.warm_state, "jobs": counts, "concurrency": self.concurrency,
+                "max_queue": self.max_queue, "job_ttl": self.job_ttl, "max_finished_jobs": self.max_finished_jobs}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    worker: ReportWorker = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job(self, job_id: str):
+        job = self.worker.jobs.get(job_id)
+        if job is None:
+            self._json(404, {"error": f"任务不存在: {job_id}"})
+        return job
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        if parts == ["health"]:
+            return self._json(200, self.worker.health())
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job is not None:
+                self._json(200, job.summary())
+            return
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self._job(parts[1])
+            if job is None:
+                return
+            # 不设 Content-Length，逐行写出，任务结束后关闭连接
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            try:
+                for event in job.stream():
+                    line = json.dumps(event or {"event": "heartbeat"}, ensure_ascii=False, default=str)
+                    self.wfile.write(line.encode("utf-8") + b"\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+        self._json(404, {"error": "未知路径"})
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0].rstrip("/") != "/jobs":
+            return self._json(404, {"error": "未知路径"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("任务参数必须是 JSON 对象")
+        except ValueError as e:
+            return self._json(400, {"error": f"请求体解析失败: {e}"})
+        try:
+            job = self.worker.submit(params)
+        except OverflowError as e:
+            return self._json(503, {"error": str(e)})
+        self._json(202, {"id": job.id, "status": job.status})
+
+
+def serve(worker: ReportWorker, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    handler = type("ReportWorkerHandler", (_Handler,), {"worker": worker})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻桥梁支座检查报告生成服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--jobs-dir", default="jobs")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--annotate-workers", type=int, default=None)
+    parser.add_argument("--warm-llm", action="store_true", help="启动时创建大模型客户端")
+    parser.add_argument("--warm-agent", action="store_true", help="启动时构建智能体执行器")
+    parser.add_argument("--job-ttl", type=float, default=3600.0, help="已结束任务在内存中保留的秒数")
+    parser.add_argument("--max-finished-jobs", type=int, default=200, help="内存中最多保留的已结束任务数")
+    args = parser.parse_args()
+
+    worker = ReportWorker(args.jobs_dir, concurrency=args.concurrency, max_queue=args.max_queue,
+                          annotate_workers=args.annotate_workers, warm_llm=args.warm_llm,
+                          warm_agent=args.warm_agent, job_ttl=args.job_ttl,
+                          max_finished_jobs=args.max_finished_jobs)
+    print(f"预热完成: {worker.warm_state}")
+    server = serve(worker, args.host, args.port)
+    print(f"报告服务已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        worker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
@@ -17,35 +18,52 @@ def imwrite_unicode(path, img):
 
 
 # ---------------- 绘制中文文本函数 ----------------
-def draw_chinese_text(image, text, position, font_size, color):
+@lru_cache(maxsize=32)
+def load_font(font_size):
+    """按字号缓存字体，整个进程只解析一次 ttf"""
+    font_path = os.path.join("font", "SimHei.ttf")  # 确保有 SimHei.ttf
+    return ImageFont.truetype(font_path, font_size)
+
+
+def draw_chinese_labels(image, labels):
+    """
+    一次性绘制一张图上的全部标注：numpy→PIL、PIL→numpy 各只转换一次
+    labels: [(text, (x, y), font_size, color), ...]
+    """
+    if not labels:
+        return image
     pil_img = Image.fromarray(image)
     draw = ImageDraw.Draw(pil_img)
-    font_path = os.path.join("font", "SimHei.ttf")  # 确保有 SimHei.ttf
-    font = ImageFont.truetype(font_path, font_size)
 
-    try:
-        bbox = draw.textbbox(position, text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-    except AttributeError:
-        text_width, text_height = draw.textsize(text, font=font)
+    for text, position, font_size, color in labels:
+        font = load_font(font_size)
+        try:
+            bbox = draw.textbbox(position, text, font=font)
+            text_width = bbox[2] - bbox[0]
+            text_height = bbox[3] - bbox[1]
+        except AttributeError:
+            text_width, text_height = draw.textsize(text, font=font)
 
-    x, y = position
-    padding = 6
-    bg_x1 = max(x - padding, 0)
-    bg_y1 = max(y - padding, 0)
-    bg_x2 = min(x + text_width + padding, image.shape[1])
-    bg_y2 = min(y + text_height + padding, image.shape[0])
+        x, y = position
+        padding = 6
+        bg_x1 = max(x - padding, 0)
+        bg_y1 = max(y - padding, 0)
+        bg_x2 = min(x + text_width + padding, image.shape[1])
+        bg_y2 = min(y + text_height + padding, image.shape[0])
 
-    # 绘制背景色（红色背景）
-    draw.rectangle([bg_x1, bg_y1, bg_x2, bg_y2], fill=color)
+        # 绘制背景色（红色背景）
+        draw.rectangle([bg_x1, bg_y1, bg_x2, bg_y2], fill=color)
 
-    # 绘制白色文字
-    draw.text((x, y), text, font=font, fill=(255, 255, 255))
+        # 绘制白色文字
+        draw.text((x, y), text, font=font, fill=(255, 255, 255))
 
     return np.array(pil_img)
 
 
+def draw_chinese_text(image, text, position, font_size, color):
+    return draw_chinese_labels(image, [(text, position, font_size, color)])
+
+
 # ---------------- 提取缺陷名 ----------------
 def extract_defect_name(filename):
     """
@@ -96,15 +114,17 @@ def annotate_image(image_path, output_path, min_area=1200):
 
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
+    labels = []
     for cnt in contours:
         x, y, w, h = cv2.boundingRect(cnt)
         area = w * h
         if area < min_area:  # 忽略太小的红色矩形
             continue
 
-        # 绘制缺陷名（矩形上方）
-        img = draw_chinese_text(img, text_to_draw, (x, y - 40 if y > 40 else y), 35, (255, 0, 0))
+        # 缺陷名标注在矩形上方，全部收集后一次绘制
+        labels.append((text_to_draw, (x, y - 40 if y > 40 else y), 35, (255, 0, 0)))
 
+    img = draw_chinese_labels(img, labels)
     imwrite_unicode(output_path, img)
     print(f"✅ 已处理并保存: {output_path}")
 
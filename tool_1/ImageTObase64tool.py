@@ -1,19 +1,25 @@
 import base64
 import os
-from typing import Optional, Dict
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List
 from PIL import Image
 from io import BytesIO
 
+# 直接运行本脚本时也能导入项目根目录下的 Tool 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Tool.env_config import load_env
+
 # 加载环境变量（如果使用.env文件）
-if os.path.exists('.env'):
-    try:
-        with open('.env', 'r', encoding='utf-8') as f:
-            for line in f:
-                if '=' in line and not line.strip().startswith('#'):
-                    key, value = line.strip().split('=', 1)
-                    os.environ[key.strip()] = value.strip().strip('"').strip('\'')
-    except Exception as e:
-        print(f"警告：加载.env文件失败：{str(e)}")
+load_env()
+
+# 已编码的 data URL 缓存：(绝对路径, mtime_ns, 文件大小, 编码参数) -> "mime;base64,..."
+# 同一张照片在多次核验请求中重复出现时不再重新解码/压缩/编码；按最近使用淘汰
+PAYLOAD_CACHE_SIZE = int(os.getenv("IMAGE_PAYLOAD_CACHE_SIZE", "256"))
+_payload_cache = OrderedDict()
+_payload_lock = threading.Lock()
 
 
 class ImageToBase64Tool:
@@ -25,11 +31,24 @@ class ImageToBase64Tool:
         self,
         compress: bool = True,
         max_width: int = 1280,
-        quality: int = 85
+        quality: int = 85,
+        roi: bool = False,
+        roi_padding: float = 0.3,
+        roi_min_side: int = 448,
+        roi_min_area: int = 1200
     ):
+        """
+        roi=True 时只发送红框所在区域：复用 refer_tool 的红框检测，取全部红框的外接矩形，
+        四周各扩展 roi_padding × 外接矩形边长的上下文，且边长不小于 roi_min_side；
+        未检测到红框时回落到整张照片。
+        """
         self.compress = compress
         self.max_width = max_width
         self.quality = quality
+        self.roi = roi
+        self.roi_padding = roi_padding
+        self.roi_min_side = roi_min_side
+        self.roi_min_area = roi_min_area
 
         self.supported_formats = {
             "jpg": "image/jpeg",
@@ -43,10 +62,7 @@ class ImageToBase64Tool:
     # 获取 MIME 类型
     # ---------------------
     def _get_image_mime_type(self, image_path: str) -> str:
-        print(f"调试信息 - 处理路径: {image_path}")
-
         file_ext = os.path.splitext(image_path)[-1].lower().lstrip(".")
-        print(f"调试信息 - splitext获取的扩展名: '{file_ext}'")
 
         filename = os.path.basename(image_path).lower()
         detected_ext = None
@@ -54,13 +70,10 @@ class ImageToBase64Tool:
         for ext in sorted(self.supported_formats.keys(), key=len, reverse=True):
             if filename.endswith("." + ext):
                 detected_ext = ext
-                print(f"调试信息 - 从文件名检测到扩展名: '{detected_ext}'")
                 break
 
         final_ext = detected_ext if detected_ext else file_ext
 
-        print(f"调试信息 - 最终确定的扩展名: '{final_ext}'")
-
         if not final_ext:
             raise ValueError(f"unknown file extension: {image_path}")
 
@@ -80,6 +93,11 @@ class ImageToBase64Tool:
         """
         with Image.open(BytesIO(image_bytes)) as img:
 
+            # JPEG 解码时直接按 1/2、1/4、1/8 缩小（不小于目标尺寸），避免先解出整张 4K 图
+            width, height = img.size
+            if width > self.max_width:
+                img.draft("RGB", (self.max_width, int(height * self.max_width / width)))
+
             # 修复：从 BytesIO 打开时 img.format 可能为 None，因此不再依赖它
             if img.mode not in ("RGB", "RGBA"):
                 img = img.convert("RGB")
@@ -102,23 +120,96 @@ class ImageToBase64Tool:
             else:
                 save_format = "JPEG"  # 默认降级为 JPEG，防止未知格式崩溃
 
+            if save_format == "JPEG" and img.mode == "RGBA":
+                img = img.convert("RGB")
+
+            # 不再使用 optimize=True：多一遍霍夫曼表优化，体积只小几个百分点
             img.save(
                 output,
                 format=save_format,
-                quality=self.quality,
-                optimize=True
+                quality=self.quality
             )
 
             return output.getvalue()
 
+    # ---------------------
+    # 红框区域裁剪（ROI）
+    # ---------------------
+    def roi_box(self, img):
+        """
+        img: 已解码的 BGR 图像（numpy 数组）
+        返回待裁剪区域 (left, top, right, bottom)；未检测到红框时返回 None
+        """
+        from tool_1.refer_tool import detect_red_boxes, _resolve_detect_scale
+
+        boxes = detect_red_boxes(img, self.roi_min_area, _resolve_detect_scale(img, None))
+        if not boxes:
+            return None
+        height, width = img.shape[:2]
+        left = min(x for x, y, w, h in boxes)
+        top = min(y for x, y, w, h in boxes)
+        right = max(x + w for x, y, w, h in boxes)
+        bottom = max(y + h for x, y, w, h in boxes)
+        pad = int(max(right - left, bottom - top) * self.roi_padding)
+        left, top, right, bottom = left - pad, top - pad, right + pad, bottom + pad
+        # 保证最小边长，给模型留出足够的上下文
+        for lo, hi, limit in ((0, 2, width), (1, 3, height)):
+            box = [left, top, right, bottom]
+            grow = max(0, min(self.roi_min_side, limit) - (box[hi] - box[lo]))
+            box[lo] -= grow // 2
+            box[hi] += grow - grow // 2
+            # 平移回图内，再裁到边界
+            shift = max(0, -box[lo]) - max(0, box[hi] - limit)
+            box[lo], box[hi] = max(0, box[lo] + shift), min(limit, box[hi] + shift)
+            left, top, right, bottom = box
+        return left, top, right, bottom
+
+    def _crop_roi(self, image_path: str) -> Optional[bytes]:
+        """按红框区域裁剪并编码为 JPEG（只解码一次）；未检测到红框时返回 None"""
+        from tool_1.refer_tool import cv2, imread_unicode
+
+        img = imread_unicode(image_path)
+        if img is None:
+            raise IOError(f"读取图片失败：{image_path}")
+        box = self.roi_box(img)
+        if box is None:
+            return None
+        left, top, right, bottom = box
+        ok, buf = cv2.imencode(".jpg", img[top:bottom, left:right], [cv2.IMWRITE_JPEG_QUALITY, 95])
+        if not ok:
+            raise IOError(f"裁剪区域编码失败：{image_path}")
+        return buf.tobytes()
+
     # ---------------------
     # 转 Base64
     # ---------------------
-    def image_to_base64(self, image_path: str) -> str:
+    def _cache_key(self, image_path: str):
+        stat = os.stat(image_path)
+        params = (self.compress, self.max_width, self.quality,
+                  self.roi and (self.roi_padding, self.roi_min_side, self.roi_min_area))
+        return os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, params
 
+    def image_to_base64(self, image_path: str) -> str:
+        """返回 "mime;base64,..."；同一文件（路径、mtime、大小不变）且参数相同时直接复用缓存"""
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"图片文件不存在：{image_path}")
 
+        key = self._cache_key(image_path)
+        with _payload_lock:
+            cached = _payload_cache.get(key)
+            if cached is not None:
+                _payload_cache.move_to_end(key)
+                return cached
+
+        payload = self._encode(image_path)
+        with _payload_lock:
+            _payload_cache[key] = payload
+            while len(_payload_cache) > PAYLOAD_CACHE_SIZE:
+                _payload_cache.popitem(last=False)
+        return payload
+
+    def _encode(self, image_path: str) -> str:
+
         try:
             with open(image_path, "rb") as f:
                 image_bytes = f.read()
@@ -127,11 +218,16 @@ class ImageToBase64Tool:
 
         # 获取扩展名用于压缩功能
         ext = os.path.splitext(image_path)[-1].lower().lstrip(".")
+        mime_type = self._get_image_mime_type(image_path)
+
+        if self.roi:
+            cropped = self._crop_roi(image_path)
+            if cropped is not None:
+                image_bytes, ext, mime_type = cropped, "jpg", "image/jpeg"
 
         if self.compress:
             image_bytes = self._compress_image(image_bytes, ext)
 
-        mime_type = self._get_image_mime_type(image_path)
         base64_str = base64.b64encode(image_bytes).decode("utf-8")
 
         return f"{mime_type};base64,{base64_str}"
@@ -148,6 +244,26 @@ class ImageToBase64Tool:
             }
         }
 
+    def get_api_image_params(self, image_paths: List[str], max_workers: int = None) -> List[Dict[str, Dict[str, str]]]:
+        """
+        批量转换，结果与 image_paths 顺序一致；未命中缓存的图片在线程池中并发解码/压缩
+        （PIL 的解码与编码会释放 GIL）
+        """
+        if len(image_paths) <= 1:
+            return [self.get_api_image_param(p) for p in image_paths]
+        max_workers = max_workers or min(len(image_paths), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(self.get_api_image_param, image_paths))
+
+    def build_message(self, image_paths: List[str], text: str, max_workers: int = None) -> Dict:
+        """
+        组装一条多模态用户消息：多张图片 + 一段文字，一次请求核验多张照片
+        返回: {"role": "user", "content": [图片..., {"type": "text", "text": text}]}
+        """
+        content = self.get_api_image_params(image_paths, max_workers=max_workers)
+        content.append({"type": "text", "text": text})
+        return {"role": "user", "content": content}
+
 
 # ----------------------------------------------------------
 # 示例执行
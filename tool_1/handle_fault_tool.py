@@ -1,7 +1,9 @@
 import os
 import re
-import pandas as pd
 from Tool.documentRead_tool import read_text_auto
+from Tool.env_config import load_env
+from Tool.lazy_import import lazy_import
+from pipeline.job_context import current_job
 try:
     from langchain.tools import tool
 except Exception:
@@ -10,23 +12,9 @@ except Exception:
             return f
         return _wrap
 
-def load_env_file():
-    """加载.env文件环境变量"""
-    env_path = os.path.join(os.getcwd(), ".env")
-    if not os.path.exists(env_path):
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        env_path = os.path.join(project_root, ".env")
-    if os.path.exists(env_path):
-        with open(env_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    if value.startswith(("\"", "'")) and value.endswith(("\"", "'")):
-                        value = value[1:-1]
-                    os.environ[key.strip()] = value.strip()
-
-load_env_file()
+pd = lazy_import("pandas")
+
+load_env()
 
 def get_base_number(pier_code):
     """提取桥墩编号中的数字部分作为基础编号"""
@@ -127,16 +115,16 @@ def read_and_format_defects(input_file: str = None) -> dict:
     读取并格式化缺陷汇总表：合并所有Sheet，按【桥墩+部位+缺陷类型】去重，输出两类表格数据。
 
     参数:
-        input_file: 缺陷汇总Excel路径；未提供时自动使用.env的RAW_REPORT_PATH。
+        input_file: 缺陷汇总Excel路径；未提供时使用当前任务（默认 .env）的原始缺陷汇总表。
 
     返回:
         字典：{"beam_pier_defects": [...], "support_system_defects": [...]}，
         每条记录包含pier/component/position/defect_type/photo五字段，符合表3.1.1和3.2.1格式要求。
     """
-    # 自动获取文件路径（优先input_file，其次.env）
+    # 自动获取文件路径（优先input_file，其次当前任务配置）
     fpath = input_file
     if not fpath or not os.path.exists(fpath):
-        fpath = os.getenv("REFER_FILE_PATH") or os.getenv("RAW_REPORT_PATH")
+        fpath = current_job().raw_excel_path
     if not fpath or not os.path.exists(fpath):
         raise FileNotFoundError("未找到缺陷汇总表，请检查路径或.env配置")
     
@@ -157,7 +145,7 @@ def export_formatted_excel(input_file: str = None, output_file: str = None) -> s
     导出标准化缺陷表：将去重后的五列表（桥墩、构件、部位、缺陷类型、现场照片）导出到Excel。
 
     参数:
-        input_file: 缺陷汇总Excel路径；未提供时使用.env的RAW_REPORT_PATH。
+        input_file: 缺陷汇总Excel路径；未提供时使用当前任务（默认 .env）的原始缺陷汇总表。
         output_file: 输出Excel路径；未提供时默认“缺陷汇总_格式化.xlsx”。
 
     返回:
@@ -165,12 +153,12 @@ def export_formatted_excel(input_file: str = None, output_file: str = None) -> s
     """
     fpath = input_file
     if not fpath or not os.path.exists(fpath):
-        fpath = os.getenv("REFER_FILE_PATH") or os.getenv("RAW_REPORT_PATH")
+        fpath = current_job().raw_excel_path
     if not fpath or not os.path.exists(fpath):
         raise FileNotFoundError("未找到缺陷汇总表，请检查路径或.env配置")
     
     # 处理输出路径
-    out_path = output_file or os.getenv("REFER_FILE_OUT_PATH")
+    out_path = output_file or current_job().excel_path
     xls = pd.ExcelFile(fpath)
     try:
         with pd.ExcelWriter(out_path, engine='openpyxl') as writer:
@@ -1,16 +1,18 @@
+import hashlib
+import json
 import os
-try:
-    import cv2
-    import numpy as np
-except Exception:
-    cv2 = None
-    np = None
-try:
-    from PIL import Image, ImageDraw, ImageFont
-except Exception:
-    Image = None
-    ImageDraw = None
-    ImageFont = None
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from Tool.env_config import load_env
+from Tool.lazy_import import lazy_import
+
+# cv2 / numpy / PIL 首次使用时才导入；bool(模块) 为 False 表示依赖未安装
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
 try:
     from langchain.tools import tool
 except Exception:
@@ -19,28 +21,13 @@ except Exception:
             return f
         return _wrap
 
-def load_env_file():
-    env_path = os.path.join(os.getcwd(), ".env")
-    if not os.path.exists(env_path):
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        env_path = os.path.join(project_root, ".env")
-    if os.path.exists(env_path):
-        with open(env_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    if value.startswith(("\"", "'")) and value.endswith(("\"", "'")):
-                        value = value[1:-1]
-                    os.environ[key.strip()] = value.strip()
-
-load_env_file()
+load_env()
 
 def imread_unicode(path):
-    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR) if cv2 is not None and np is not None else None
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR) if cv2 and np else None
 
 def imwrite_unicode(path, img):
-    if cv2 is None:
+    if not cv2:
         return False
     ext = os.path.splitext(path)[1]
     success, buf = cv2.imencode(ext, img)
@@ -48,29 +35,45 @@ def imwrite_unicode(path, img):
         buf.tofile(path)
     return bool(success)
 
-def draw_chinese_text(image, text, position, font_size, color):
+FONT_PATH = os.path.join("font", "SimHei.ttf")
+
+@lru_cache(maxsize=32)
+def _load_font(font_size, font_path):
+    """进程内按 (字号, 路径) 缓存字体，避免每个标注都重新解析 ttf"""
+    return ImageFont.truetype(font_path, font_size)
+
+def draw_labels(image, labels, font_path=None):
+    """
+    在一次 PIL 会话中绘制一张图的全部标注（numpy→PIL、PIL→numpy 各转换一次）
+    labels: [(text, (x, y), font_size, color), ...]，按顺序绘制，后画的覆盖先画的
+    """
+    if not labels:
+        return image
+    font_path = font_path or FONT_PATH
     pil_img = Image.fromarray(image)
     draw = ImageDraw.Draw(pil_img)
-    font_path = os.path.join("font", "SimHei.ttf")
-    font = ImageFont.truetype(font_path, font_size)
-    try:
-        bbox = draw.textbbox(position, text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-    except Exception:
-        w, h = draw.textsize(text, font=font)
-        text_width = w
-        text_height = h
-    x, y = position
+    height, width = image.shape[:2]
     padding = 6
-    bg_x1 = max(x - padding, 0)
-    bg_y1 = max(y - padding, 0)
-    bg_x2 = min(x + text_width + padding, image.shape[1])
-    bg_y2 = min(y + text_height + padding, image.shape[0])
-    draw.rectangle([bg_x1, bg_y1, bg_x2, bg_y2], fill=color)
-    draw.text((x, y), text, font=font, fill=(255, 255, 255))
+    for text, position, font_size, color in labels:
+        font = _load_font(font_size, font_path)
+        try:
+            bbox = draw.textbbox(position, text, font=font)
+            text_width = bbox[2] - bbox[0]
+            text_height = bbox[3] - bbox[1]
+        except Exception:
+            text_width, text_height = draw.textsize(text, font=font)
+        x, y = position
+        bg_x1 = max(x - padding, 0)
+        bg_y1 = max(y - padding, 0)
+        bg_x2 = min(x + text_width + padding, width)
+        bg_y2 = min(y + text_height + padding, height)
+        draw.rectangle([bg_x1, bg_y1, bg_x2, bg_y2], fill=color)
+        draw.text((x, y), text, font=font, fill=(255, 255, 255))
     return np.array(pil_img)
 
+def draw_chinese_text(image, text, position, font_size, color):
+    return draw_labels(image, [(text, position, font_size, color)])
+
 def extract_defect_name(filename):
     basename = os.path.splitext(os.path.basename(filename))[0]
     parts = basename.split("-")
@@ -82,16 +85,39 @@ def extract_defect_name(filename):
         return full_desc
     return basename
 
-def _annotate(image_path, output_path, min_area=1200):
-    if cv2 is None or np is None or Image is None:
-        raise RuntimeError("依赖缺失: 请安装 opencv-python pillow numpy")
-    img = imread_unicode(image_path)
-    if img is None:
-        raise FileNotFoundError(f"无法读取图片: {image_path}")
-    defect_name = extract_defect_name(image_path)
-    confidence = 0.95
-    text_to_draw = f"{defect_name} {confidence:.2f}"
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+DETECT_SCALES = (1, 2, 4, 8)
+# auto 模式的最低工作分辨率（长边）：4K 照片取 2 倍；4/8 倍时相距不足 ~10px 的两个框会被合并
+AUTO_DETECT_MIN_SIDE = 1920
+
+def _resolve_detect_scale(img, detect_scale):
+    """
+    检测缩放倍数：1 为全分辨率；"auto" 时取使工作分辨率长边不低于 AUTO_DETECT_MIN_SIDE 的最大倍数
+    未指定时读取环境变量 ANNOTATE_DETECT_SCALE（默认 1，与原行为一致）
+    """
+    if detect_scale is None:
+        detect_scale = os.getenv("ANNOTATE_DETECT_SCALE") or 1
+    if str(detect_scale).lower() == "auto":
+        long_side = max(img.shape[:2])
+        return max([s for s in DETECT_SCALES if long_side // s >= AUTO_DETECT_MIN_SIDE] or [1])
+    detect_scale = int(detect_scale)
+    if detect_scale not in DETECT_SCALES:
+        raise ValueError(f"detect_scale 只支持 {DETECT_SCALES} 或 auto")
+    return detect_scale
+
+def detect_red_boxes(img, min_area=1200, detect_scale=1):
+    """
+    检测图中的红色矩形框，返回全分辨率坐标 [(x, y, w, h), ...]
+    detect_scale > 1 时先区域平均缩小到 1/detect_scale 再做 HSV 阈值、形态学与轮廓检测，
+    框坐标按倍数映射回原图（面积阈值仍按全分辨率计算）
+    """
+    work = img
+    # 逐级 2× INTER_AREA 缩小：结果等同于一次 1/detect_scale 区域平均，但 OpenCV 对 2× 有快速路径
+    scale = 1
+    while scale < detect_scale:
+        height, width = work.shape[:2]
+        work = cv2.resize(work, (width // 2, height // 2), interpolation=cv2.INTER_AREA)
+        scale *= 2
+    hsv = cv2.cvtColor(work, cv2.COLOR_BGR2HSV)
     lower_red1 = np.array([0, 150, 180])
     upper_red1 = np.array([8, 255, 255])
     lower_red2 = np.array([172, 150, 180])
@@ -100,22 +126,83 @@ def _annotate(image_path, output_path, min_area=1200):
     mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
     mask = mask1 | mask2
     kernel = np.ones((3, 3), np.uint8)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+    # 缩小 4 倍以上时框线只剩 1~2px，开运算会把框线本身抹掉；INTER_AREA 的均值已压掉孤立噪点，故跳过
+    if detect_scale <= 2:
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+    # 闭运算在原图上可弥合约 4px 的断线；缩小后只做一次，避免相邻的两个框被连成一个
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2 if detect_scale == 1 else 1)
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
     for cnt in contours:
-        x, y, w, h = cv2.boundingRect(cnt)
+        x, y, w, h = (v * detect_scale for v in cv2.boundingRect(cnt))
         area = w * h
         if area < min_area:
             continue
-        img = draw_chinese_text(img, text_to_draw, (x, y - 40 if y > 40 else y), 35, (255, 0, 0))
+        boxes.append((x, y, w, h))
+    return boxes
+
+def annotate_array(img, image_path, min_area=1200, detect_scale=None):
+    """在已解码的图像上标注红框（缺陷名取自 image_path 的文件名），返回标注后的图像"""
+    defect_name = extract_defect_name(image_path)
+    confidence = 0.95
+    text_to_draw = f"{defect_name} {confidence:.2f}"
+    boxes = detect_red_boxes(img, min_area, _resolve_detect_scale(img, detect_scale))
+    labels = [(text_to_draw, (x, y - 40 if y > 40 else y), 35, (255, 0, 0)) for x, y, w, h in boxes]
+    return draw_labels(img, labels)
+
+def _read_image(image_path):
+    if not (cv2 and np and Image):
+        raise RuntimeError("依赖缺失: 请安装 opencv-python pillow numpy")
+    img = imread_unicode(image_path)
+    if img is None:
+        raise FileNotFoundError(f"无法读取图片: {image_path}")
+    return img
+
+def _annotate(image_path, output_path, min_area=1200, detect_scale=None):
+    img = annotate_array(_read_image(image_path), image_path, min_area, detect_scale)
     ok = imwrite_unicode(output_path, img)
     if not ok:
         raise RuntimeError("写入失败")
     return output_path
 
+# 报告中图片的显示宽度（word_Imagetool 统一 5cm）按约 300dpi 折算的像素宽度
+REPORT_IMAGE_WIDTH_PX = 600
+
+def render_report_image(image_path, min_area=1200, max_width=REPORT_IMAGE_WIDTH_PX, quality=85, annotate=True,
+                        detect_scale=None, max_side=None):
+    """
+    融合的图片阶段：解码一次 → 标注（可选）→ 缩小到报告显示宽度 → 在内存中编码为 JPEG，返回字节串，
+    可直接交给 ImageInserter 插入 docx，不再写出标注后的中间文件、也不再由插图环节重新解码/转换。
+    标注在原分辨率上完成，标签外观与 _annotate 输出的文件一致。
+    max_side 指定时按 IMREAD_REDUCED_* 缩小解码，使最长边不低于 max_side（面积阈值按比例缩放），用于截止时间降级。
+    """
+    if not (cv2 and np and Image):
+        raise RuntimeError("依赖缺失: 请安装 opencv-python pillow numpy")
+    data = np.fromfile(image_path, dtype=np.uint8)
+    flags = cv2.IMREAD_COLOR
+    factor = 1
+    if max_side:
+        # 只读文件头获取尺寸，选择能满足 max_side 的最大缩小倍数
+        with Image.open(image_path) as im:
+            long_side = max(im.size)
+        reduced = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+        factor = max([f for f in reduced if long_side // f >= max_side] or [1])
+        flags = reduced.get(factor, cv2.IMREAD_COLOR)
+    img = cv2.imdecode(data, flags)
+    if img is None:
+        raise FileNotFoundError(f"无法读取图片: {image_path}")
+    if annotate:
+        img = annotate_array(img, image_path, max(1, min_area // (factor * factor)), detect_scale)
+    height, width = img.shape[:2]
+    if max_width and width > max_width:
+        img = cv2.resize(img, (max_width, max(1, round(height * max_width / width))), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError(f"JPEG 编码失败: {image_path}")
+    return buf.tobytes()
+
 @tool
-def annotate_image_tool(image_path: str, output_path: str, min_area: int = 1200) -> str:
+def annotate_image_tool(image_path: str, output_path: str, min_area: int = 1200, detect_scale: str = None) -> str:
     """
     单图中文标注工具：在检测到的红色框附近叠加“缺陷名+置信度”中文标注，并保存到输出路径。
 
@@ -123,40 +210,150 @@ def annotate_image_tool(image_path: str, output_path: str, min_area: int = 1200)
         image_path: 输入图片路径（支持中文路径）。
         output_path: 输出图片保存路径（支持中文路径）。
         min_area: 红色矩形最小面积阈值，过滤噪点。
+        detect_scale: 检测缩放倍数 1/2/4/8 或 auto（在缩小图上检测红框，坐标映射回原图）。
 
     返回:
         输出图片的路径字符串。
     """
-    return _annotate(image_path, output_path, min_area)
+    return _annotate(image_path, output_path, min_area, detect_scale)
+
+# 标注实现版本：修改检测/绘制逻辑时递增，使批量标注清单中的旧输出失效
+ANNOTATE_VERSION = "2"
+MANIFEST_NAME = ".annotate_manifest.json"
+IMAGE_EXTS = (".jpg", ".png", ".jpeg")
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _annotate_timed(image_path, output_path, min_area, detect_scale=None):
+    """进程池任务：标注单张图片并返回耗时（秒）"""
+    start = time.perf_counter()
+    _annotate(image_path, output_path, min_area, detect_scale)
+    return time.perf_counter() - start
+
+def _load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def annotate_batch(input_root, output_root, min_area=1200, max_workers=None, max_in_flight=None, force=False,
+                   detect_scale=None):
+    """
+    并行、增量地批量标注 input_root 下的全部图片（保持目录结构输出到 output_root）
+    - 进程池并行，同时在途的图片数不超过 max_in_flight（默认 2×进程数），限制 4K 图片的内存占用；
+    - output_root 下的清单记录每张图的源文件哈希与参数，未变化且输出仍存在时跳过（force=True 时全部重做）；
+    - 单张失败只记录错误，不中断整批。
+    返回: {"processed": [...], "skipped": [...], "failed": [{"path", "error"}], "timings": {相对路径: 秒}, "elapsed": 秒}
+    """
+    if not os.path.exists(input_root):
+        raise FileNotFoundError(input_root)
+    start = time.perf_counter()
+    os.makedirs(output_root, exist_ok=True)
+    manifest_path = os.path.join(output_root, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    if detect_scale is None:
+        detect_scale = os.getenv("ANNOTATE_DETECT_SCALE") or 1
+    params = {"min_area": min_area, "detect_scale": str(detect_scale), "version": ANNOTATE_VERSION}
+    output_abs = os.path.abspath(output_root)
+
+    jobs, skipped = [], []
+    for root, dirs, files in os.walk(input_root):
+        # 输出目录位于输入目录内时不重复处理
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_abs)
+        for fname in sorted(files):
+            if not fname.lower().endswith(IMAGE_EXTS):
+                continue
+            in_path = os.path.join(root, fname)
+            rel = os.path.relpath(in_path, input_root)
+            out_path = os.path.join(output_root, rel)
+            st = os.stat(in_path)
+            entry = manifest.get(rel) or {}
+            # 大小与修改时间未变时沿用上次的哈希，不重复读取文件
+            if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+                digest = entry.get("source_sha256")
+            else:
+                digest = _file_sha256(in_path)
+            if (not force and entry.get("status") == "done" and entry.get("source_sha256") == digest
+                    and entry.get("params") == params and os.path.exists(out_path)):
+                skipped.append(rel)
+                continue
+            manifest[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "source_sha256": digest,
+                             "params": params, "status": "pending"}
+            jobs.append((rel, in_path, out_path))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or 2 * max_workers, 1)
+    processed, failed, timings = [], [], {}
+    try:
+        if jobs:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+                pending = {}
+                queue = iter(jobs)
+                while True:
+                    for rel, in_path, out_path in queue:
+                        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                        pending[pool.submit(_annotate_timed, in_path, out_path, min_area, detect_scale)] = rel
+                        if len(pending) >= max_in_flight:
+                            break
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        rel = pending.pop(future)
+                        try:
+                            timings[rel] = future.result()
+                            manifest[rel]["status"] = "done"
+                            processed.append(rel)
+                        except Exception as e:
+                            manifest[rel]["status"] = "failed"
+                            manifest[rel]["error"] = f"{type(e).__name__}: {e}"
+                            failed.append({"path": rel, "error": manifest[rel]["error"]})
+                            print(f"[WARN] 标注失败 {rel}: {e}")
+    finally:
+        _save_manifest(manifest_path, manifest)
+    return {"processed": processed, "skipped": skipped, "failed": failed, "timings": timings,
+            "elapsed": time.perf_counter() - start}
 
 @tool
-def process_all_images(input_root: str, output_root: str, min_area: int = 1200) -> str:
+def process_all_images(input_root: str, output_root: str, min_area: int = 1200, max_workers: int = None,
+                       force: bool = False, detect_scale: str = None) -> str:
     """
     批量中文标注工具：递归处理输入根目录下的所有图片，保持原目录结构到输出根目录。
+    多进程并行；源图片与参数未变化的图片直接跳过；单张失败不影响其余图片。
 
     参数:
         input_root: 输入图片根目录（支持中文路径）。
         output_root: 输出图片根目录（支持中文路径）。
         min_area: 红色矩形最小面积阈值，过滤噪点。
+        max_workers: 并行进程数，默认 CPU 核数。
+        force: 为 True 时忽略增量清单，全部重新标注。
+        detect_scale: 检测缩放倍数 1/2/4/8 或 auto，默认读取 ANNOTATE_DETECT_SCALE（1 为全分辨率）。
 
     返回:
-        处理统计信息字符串，例如“处理完成: 42 张”。
+        处理统计信息字符串，例如“处理完成: 42 张（跳过 10 张，失败 1 张）”。
     """
-    if not os.path.exists(input_root):
-        raise FileNotFoundError(input_root)
-    count = 0
-    for root, dirs, files in os.walk(input_root):
-        relative_path = os.path.relpath(root, input_root)
-        output_folder = os.path.join(output_root, relative_path)
-        os.makedirs(output_folder, exist_ok=True)
-        for fname in files:
-            lf = fname.lower()
-            if lf.endswith((".jpg", ".png", ".jpeg")):
-                in_path = os.path.join(root, fname)
-                out_path = os.path.join(output_folder, fname)
-                _annotate(in_path, out_path, min_area)
-                count += 1
-    return f"处理完成: {count} 张"
+    report = annotate_batch(input_root, output_root, min_area, max_workers=max_workers, force=force,
+                            detect_scale=detect_scale)
+    summary = (f"处理完成: {len(report['processed'])} 张（跳过 {len(report['skipped'])} 张，"
+               f"失败 {len(report['failed'])} 张，耗时 {report['elapsed']:.2f}s）")
+    if report["timings"]:
+        slowest = max(report["timings"].items(), key=lambda kv: kv[1])
+        summary += f"；单张平均 {sum(report['timings'].values()) / len(report['timings']):.2f}s，最慢 {slowest[0]} {slowest[1]:.2f}s"
+    for item in report["failed"]:
+        summary += f"\n失败: {item['path']}（{item['error']}）"
+    return summary
 
 class ReferHandler:
     @staticmethod
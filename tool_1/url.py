@@ -1,6 +1,15 @@
+import hashlib
+import json
+import mimetypes
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Union
+
 import requests
-from typing import Dict
+from requests.adapters import HTTPAdapter
 
 # 尝试导入dotenv库来加载.env文件
 try:
@@ -10,45 +19,238 @@ try:
 except ImportError:
     print("警告: dotenv库未安装，将尝试直接读取环境变量")
 
+# 火山方舟文件上传接口（默认值，可用 ARK_FILE_UPLOAD_URL 或构造参数覆盖，便于对接本地替身服务测试）
+DEFAULT_UPLOAD_URL = "https://ark.cn-beijing.volces.com/api/v3/files"
+# (上传地址, 内容哈希) -> URL 台账，重复运行时相同内容的文件不再上传
+DEFAULT_LEDGER_PATH = ".ark_upload_ledger.json"
+# 服务端未返回 expire_at 时，台账中的 URL 自上传起最多复用的秒数（ARK_UPLOAD_LEDGER_TTL）
+DEFAULT_LEDGER_TTL = 7 * 24 * 3600
+# 距过期不足该秒数的 URL 不再复用（避免交给模型后即失效）
+EXPIRY_MARGIN = 3600
+UPLOAD_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".pdf")
+# 可重试的状态码：限流与服务端错误
+RETRY_STATUS = (429, 500, 502, 503, 504)
+CHUNK_SIZE = 1024 * 1024
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class _MultipartFile:
+    """
+    单文件 multipart/form-data 请求体：边读边发，不把整个文件读入内存。
+    提供 __len__，requests 据此设置 Content-Length（不使用分块传输）。
+    """
+
+    def __init__(self, path: str, field: str = "file"):
+        self.path = path
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(path).replace('"', "%22")
+        mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self._head = (f"--{self.boundary}\r\n"
+                      f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                      f"Content-Type: {mime}\r\n\r\n").encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._size = os.path.getsize(path)
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return len(self._head) + self._size + len(self._tail)
+
+    def __iter__(self):
+        yield self._head
+        with open(self.path, "rb") as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                yield block
+        yield self._tail
+
+
 class ArkFileUploader:
     """
     火山方舟文件上传器
     上传任意文件到方舟文件仓库，返回在线可访问 URL：
     https://ark-file.volces.com/xxx
+
+    - 复用连接池（requests.Session），失败时对网络错误与 429/5xx 按指数退避重试；
+    - 按上传地址 + 文件内容 SHA-256 去重：已上传过且未过期的内容直接从本地台账返回 URL
+      （台账条目记录 upload_url 与 expire_at，换用其他上传地址或 URL 过期后重新上传）；
+    - upload_many 以有限并发批量上传目录或文件列表，文件以流式读取发送。
     """
 
-    def __init__(self):
+    def __init__(self, upload_url: str = None, api_key: str = None, ledger_path: str = None,
+                 max_workers: int = 4, retries: int = 3, backoff: float = 0.5, timeout: float = 60.0,
+                 ledger_ttl: float = None):
         # 从环境变量获取ARK_API_KEY
-        self.api_key = os.getenv("ARK_API_KEY")
+        self.api_key = api_key or os.getenv("ARK_API_KEY")
         if not self.api_key:
             raise ValueError("缺少 ARK_API_KEY 环境变量，请在.env文件中设置")
 
-        # 火山方舟文件上传接口（固定）
-        self.upload_url = "https://ark.cn-beijing.volces.com/api/v3/files"
+        self.upload_url = upload_url or os.getenv("ARK_FILE_UPLOAD_URL") or DEFAULT_UPLOAD_URL
+        self.ledger_path = ledger_path or os.getenv("ARK_UPLOAD_LEDGER") or DEFAULT_LEDGER_PATH
+        self.ledger_ttl = ledger_ttl if ledger_ttl is not None else float(
+            os.getenv("ARK_UPLOAD_LEDGER_TTL") or DEFAULT_LEDGER_TTL)
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
 
         self.headers = {
             "Authorization": f"Bearer {self.api_key}"
         }
 
+        # 连接池大小与并发数一致；重试在 _post 中自行处理（流式请求体无法由 urllib3 重放）
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers)
+
+        self._ledger_lock = threading.Lock()
+        self._ledger = self._load_ledger()
+
+    # ---------------------
+    # (上传地址, 哈希) -> URL 台账
+    # ---------------------
+    def _load_ledger(self) -> Dict[str, dict]:
+        try:
+            with open(self.ledger_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_ledger(self):
+        with self._ledger_lock:
+            snapshot = dict(self._ledger)
+        directory = os.path.dirname(os.path.abspath(self.ledger_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.ledger_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.ledger_path)
+
+    def _ledger_key(self, digest: str) -> str:
+        # 台账按上传地址隔离：指向本地替身服务时记录的 URL 不会被正式上传复用
+        return f"{self.upload_url}#{digest}"
+
+    def _usable(self, entry: dict, now: float) -> bool:
+        """条目属于当前上传地址，且未超过 expire_at（无 expire_at 时按 uploaded_at + ledger_ttl）"""
+        if entry.get("upload_url") != self.upload_url:
+            return False
+        expire_at = entry.get("expire_at") or (entry.get("uploaded_at", 0) + self.ledger_ttl)
+        return now < expire_at - EXPIRY_MARGIN
+
+    def _lookup(self, digest: str):
+        key = self._ledger_key(digest)
+        with self._ledger_lock:
+            entry = self._ledger.get(key)
+            if entry and not self._usable(entry, time.time()):
+                del self._ledger[key]  # 已过期：重新上传
+                entry = None
+        return entry["url"] if entry else None
+
+    def _record(self, digest: str, file_path: str, data: dict):
+        entry = {"url": data["url"], "upload_url": self.upload_url, "name": os.path.basename(file_path),
+                 "size": os.path.getsize(file_path), "uploaded_at": int(time.time())}
+        if data.get("expire_at"):
+            entry["expire_at"] = int(data["expire_at"])
+        with self._ledger_lock:
+            self._ledger[self._ledger_key(digest)] = entry
+
+    # ---------------------
+    # 上传
+    # ---------------------
+    def _post(self, file_path: str) -> dict:
+        """流式上传单个文件，返回响应中的 data（含 url，可能含 expire_at）；网络错误与 429/5xx 时重试"""
+        for attempt in range(self.retries + 1):
+            body = _MultipartFile(file_path)
+            try:
+                response = self.session.post(self.upload_url, data=body, timeout=self.timeout,
+                                             headers={"Content-Type": body.content_type})
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise RuntimeError(f"上传失败：{e}") from e
+            else:
+                if response.status_code == 200:
+                    # data.url 为多模态 API 直接可用的 URL
+                    return response.json()["data"]
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    raise RuntimeError(f"上传失败：{response.text}")
+            time.sleep(self.backoff * (2 ** attempt))
+
+    def _upload_one(self, file_path: str, digest: str = None):
+        """返回 (url, 是否复用台账)"""
+        digest = digest or _file_sha256(file_path)
+        url = self._lookup(digest)
+        if url:
+            return url, True
+        data = self._post(file_path)
+        self._record(digest, file_path, data)
+        return data["url"], False
+
     def upload(self, file_path: str) -> str:
         """
-        上传本地文件并返回公网可访问 URL
+        上传本地文件并返回公网可访问 URL（相同内容已上传到同一地址且 URL 未过期时直接返回台账中的 URL）
         """
 
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"文件不存在：{file_path}")
 
-        with open(file_path, "rb") as f:
-            files = {"file": f}
-            response = requests.post(self.upload_url, headers=self.headers, files=files)
+        url, reused = self._upload_one(file_path)
+        if not reused:
+            self._save_ledger()
+        return url
 
-        if response.status_code != 200:
-            raise RuntimeError(f"上传失败：{response.text}")
+    def upload_many(self, files: Union[str, Iterable[str]], max_workers: int = None) -> dict:
+        """
+        批量上传：files 为目录（递归收集 UPLOAD_EXTS 文件）或文件路径列表
+        同一批中内容相同的文件只上传一次；单个文件失败不影响其余文件。
+        返回: {"urls": {路径: URL}, "uploaded": [...], "reused": [...], "failed": {路径: 错误}, "elapsed": 秒}
+        """
+        start = time.perf_counter()
+        if isinstance(files, str):
+            paths = []
+            for root, dirs, names in os.walk(files):
+                dirs.sort()
+                paths.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(UPLOAD_EXTS))
+        else:
+            paths = list(files)
+
+        report = {"urls": {}, "uploaded": [], "reused": [], "failed": {}}
+        # 先按内容哈希分组，同一内容只上传一次
+        groups = {}
+        for path in paths:
+            try:
+                groups.setdefault(_file_sha256(path), []).append(path)
+            except OSError as e:
+                report["failed"][path] = str(e)
 
-        resp = response.json()
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as pool:
+            futures = {pool.submit(self._upload_one, group[0], digest): group for digest, group in groups.items()}
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    url, reused = future.result()
+                except Exception as e:
+                    for path in group:
+                        report["failed"][path] = str(e)
+                    continue
+                (report["reused"] if reused else report["uploaded"]).append(group[0])
+                report["reused"].extend(group[1:])
+                for path in group:
+                    report["urls"][path] = url
+        if report["uploaded"]:
+            self._save_ledger()
+        report["elapsed"] = time.perf_counter() - start
+        return report
 
-        # 返回 URL（多模态 API 直接可用）
-        return resp["data"]["url"]
 if __name__ == "__main__":
     uploader = ArkFileUploader()
 
@@ -58,7 +260,7 @@ if __name__ == "__main__":
         print("错误: 环境变量LOCAL_IMAGE_PATH未设置")
         print("请在.env文件中设置LOCAL_IMAGE_PATH变量，指定完整的图片路径")
         exit(1)
-    
+
     # 规范化路径，处理Windows路径分隔符问题
     file_path = os.path.normpath(file_path)
     print("上传中:", file_path)